@@ -2,21 +2,31 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score
+
+from modules import instrumentation
 
 # Streamlit setup
 st.set_page_config(page_title="AI Hospital RM — Fuzzy + CSP", layout="wide")
 st.title("🏥 AI-driven Hospital Resource Management System")
 
+# Timers and counters of this script run (shown in the performance panel at the bottom)
+collect_metrics = st.sidebar.checkbox("Collect performance metrics (timers and counters per run)",
+                                      value=instrumentation.enabled())
+instrumentation.enable(collect_metrics)
+perf_run = instrumentation.begin_run()
+
+# LLM summary options (shared by Steps 3-5)
+deterministic_summaries = st.sidebar.checkbox("Deterministic AI summaries (temperature 0, cached across restarts)", value=False)
+
 # Dataset path
 DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "hospital_patients_dataset.csv")
 DATA_PATH = os.path.abspath(DATA_PATH)
 
 @st.cache_data
 def load_data(path):
-    return pd.read_csv(path)
+    # compact dtypes (categoricals, float32 vitals) through the Parquet cache
+    from modules.ingest import read_table
+    return read_table(path)
 
 # Load dataset
 try:
@@ -25,6 +35,20 @@ except FileNotFoundError:
     st.error(f"Dataset not found at {DATA_PATH}. Please place hospital_patients_dataset.csv in the data/ folder.")
     st.stop()
 
+# Retrieval index over patient records and past summaries, used by the AI summaries
+use_retrieval = st.sidebar.checkbox("Add similar records and past summaries to AI prompts", value=True)
+
+@st.cache_resource
+def load_retrieval_index(path):
+    from modules.retrieval_index import RetrievalIndex
+    index = RetrievalIndex.load()
+    records = load_data(path)
+    if "patient_id" in records.columns and index.add_records(records):  # only patients not indexed yet
+        index.save()
+    return index
+
+retrieval_index = load_retrieval_index(DATA_PATH) if use_retrieval else None
+
 # Show basic info
 st.subheader("📊 Dataset Snapshot")
 st.write(f"Rows: {df.shape[0]} — Columns: {df.shape[1]}")
@@ -57,48 +81,54 @@ target = st.selectbox("Choose target column", options=["severity_category", "rec
 st.write("This will train a simple RandomForest model for demo purposes.")
 
 if st.button("Run baseline ML training"):
-    df2 = df.copy()
-    numeric_cols = df2.select_dtypes(include=[np.number]).columns.tolist()
-    if not numeric_cols:
-        st.error("No numeric columns found for training.")
+    from modules import severity_model
+    try:
+        with st.spinner("Training RandomForest on all cores..."):
+            model = severity_model.train_model(df, target=target)
+    except ValueError as e:
+        st.error(str(e))
     else:
-        X = df2[numeric_cols].fillna(0)
-        y = df2[target].astype(str).fillna("unknown")
-        from sklearn.preprocessing import LabelEncoder
-        le = LabelEncoder()
-        y_enc = le.fit_transform(y)
-        X_train, X_test, y_train, y_test = train_test_split(X, y_enc, test_size=0.2, random_state=42, stratify=y_enc)
-        clf = RandomForestClassifier(n_estimators=100, random_state=42)
-        clf.fit(X_train, y_train)
-        preds = clf.predict(X_test)
-        acc = accuracy_score(y_test, preds)
-        st.success(f"Baseline RandomForest accuracy: {acc:.3f}")
+        source = "loaded the saved model for this dataset" if model.cached else f"trained in {model.metrics['train_s']:.2f}s"
+        st.success(f"Baseline RandomForest accuracy: {model.metrics['accuracy']:.3f} ({source})")
         st.text("Classification Report:")
-        st.text(classification_report(y_test, preds, target_names=le.classes_))
+        st.text(model.metrics["report"])
 
 # ---------------------- Step 2 ----------------------
 st.markdown("---")
 st.markdown("## Step 2 — 🤖 Fuzzy Logic Triage System")
 
-import modules.fuzzy_triage as fuzzy_triage
+# pipeline itself is light: skfuzzy, scipy, python-constraint and the LLM SDK
+# are only imported by the step that needs them, and the compiled fuzzy
+# system is loaded from .cache/fuzzy_system once per process
+from modules import pipeline
+
+fuzzy_mode = st.radio("Inference engine", options=["exact", "lut", "surrogate"], horizontal=True,
+                      help="exact: vectorized rule evaluation. lut: compiled lookup table (faster, interpolated). "
+                           "surrogate: learned defuzzifier, error within 0.01 of exact, exact fallback near rule boundaries.")
+use_stage_cache = st.checkbox("Reuse severities scored in earlier sessions (only new or changed rows are scored)", value=True)
+
+@st.cache_resource
+def load_stage_cache():
+    from modules.stage_cache import StageCache
+    return StageCache()
 
-if "df_processed" not in st.session_state:
-    st.session_state["df_processed"] = df.copy()
+stage_cache = load_stage_cache() if use_stage_cache else None
 
 if st.button("Compute fuzzy severity scores"):
     with st.spinner("Running fuzzy inference..."):
-        system_ctrl = fuzzy_triage.build_fuzzy_system()
-        required_cols = ["heart_rate", "spo2", "temperature", "respiratory_rate"]
-        for c in required_cols:
-            if c not in df.columns:
-                st.error(f"Missing column: {c}")
-                st.stop()
-
-        df_proc = df.copy()
-        df_proc["fuzzy_severity"] = df_proc.apply(lambda row: fuzzy_triage.compute_severity(row, system_ctrl), axis=1)
+        try:
+            triage = pipeline.triage_stage(df, pipeline.PipelineConfig(fuzzy=fuzzy_mode, cache=stage_cache))
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        df_proc = triage.patients
         st.session_state["df_processed"] = df_proc
 
-    st.success("✅ Fuzzy severity scores computed!")
+    st.success(f"✅ Fuzzy severity scores computed in {triage.elapsed_s:.2f}s!")
+    if triage.cache_stats is not None:
+        stats = triage.cache_stats
+        st.caption(f"Stage cache: {stats['hit_rate']:.0%} hit rate ({stats['hits']} cached, "
+                   f"{stats['carried']} reused after a rule change, {stats['misses']} scored)")
     st.dataframe(df_proc[["patient_id", "heart_rate", "spo2", "temperature", "respiratory_rate", "fuzzy_severity"]].head(10))
     st.metric("Average Severity (0–1)", f"{df_proc['fuzzy_severity'].mean():.3f}")
     st.bar_chart(df_proc["fuzzy_severity"])
@@ -107,7 +137,18 @@ if st.button("Compute fuzzy severity scores"):
 st.markdown("---")
 st.markdown("## Step 3 — 🧭 A* Search for Bed Allocation")
 
-import modules.a_star_bed_allocation as bed_alloc
+WARD_MAP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "ward_map.txt"))
+
+@st.cache_resource
+def load_ward_map(path):
+    # one warmed copy (all distance fields computed) shared by every rerun and session
+    from modules.ward_map import WardMap
+    return WardMap.load(path).build_index()
+
+use_ward_map = st.checkbox("Route on the ward floor plan (data/ward_map.txt, respects bed type)", value=False)
+alloc_mode = st.radio("Assignment mode", options=["greedy", "optimal"], horizontal=True,
+                      help="greedy: severity order, nearest free bed. optimal: global min-cost matching of severity x distance.")
+compare_modes = st.checkbox("Compare greedy vs optimal (objective and solve time; solves both modes)", value=False)
 
 if st.button("Run A* Bed Allocation Optimization"):
     df_proc = st.session_state.get("df_processed", None)
@@ -115,50 +156,118 @@ if st.button("Run A* Bed Allocation Optimization"):
         st.warning("⚠️ Please run 'Compute fuzzy severity scores' first (Step 2).")
         st.stop()
 
-    if "patient_id" not in df_proc.columns:
-        df_proc["patient_id"] = range(1, len(df_proc) + 1)
-
     with st.spinner("Allocating beds using A* search..."):
-        patients_list = df_proc[["patient_id", "fuzzy_severity"]].to_dict(orient="records")
-        allocations = bed_alloc.allocate_beds(patients_list)
+        config = pipeline.PipelineConfig(ward_map=load_ward_map(WARD_MAP_PATH) if use_ward_map else None,
+                                         alloc_mode=alloc_mode, compare_modes=compare_modes,
+                                         deterministic=deterministic_summaries, index=retrieval_index,
+                                         cache=stage_cache)
+        allocation = pipeline.allocation_stage(df_proc, config)
+        allocations = allocation.allocations
 
     alloc_df = pd.DataFrame(allocations)
     alloc_df["Distance_Cost"] = pd.to_numeric(alloc_df["Distance_Cost"], errors="coerce")
 
     # Store in session state for RAG
     st.session_state["bed_allocations"] = allocations
-    st.session_state["total_patients"] = len(patients_list)
+    st.session_state["total_patients"] = allocation.total_patients
+
+    # Seed the live bed board with the same admissions (greedy order)
+    import modules.a_star_bed_allocation as bed_alloc
+    from modules.patient_store import PatientStore
+    allocator = bed_alloc.BedAllocator(ward_map=allocation.ward_map)
+    cols = [c for c in ["patient_id", "fuzzy_severity", "recommended_bed_type"] if c in df_proc.columns]
+    for p in PatientStore.from_frame(df_proc[cols]).top():
+        allocator.admit(p)
+    st.session_state["bed_allocator"] = allocator
 
     st.success("✅ Bed allocation complete!")
     st.dataframe(alloc_df)
+    if allocation.mode_report is not None:
+        st.write("Objective (Σ severity × distance, lower is better) and solve time per mode:")
+        st.dataframe(pd.DataFrame(allocation.mode_report).transpose())
     st.info("Each patient is assigned a bed based on severity using A* search optimization.")
     
     # AI Summary using RAG
     try:
-        from modules.rag_summarizer import summarize_results
         with st.spinner("🤖 Generating AI summary..."):
-            summary = summarize_results(allocation_data=allocations, total_patients=len(patients_list))
+            summary = pipeline.summary_stage(allocation=allocation, config=config).summaries["bed"]
         
         st.markdown("### 🤖 AI-Generated Summary (Simple English)")
         st.info(summary)
     except Exception as e:
         st.warning(f"AI summary not available: {str(e)}")
 
+allocator = st.session_state.get("bed_allocator")
+if allocator is not None:
+    with st.expander("🛏️ Live bed board (admissions, discharges, re-triage)"):
+        c1, c2 = st.columns(2)
+        with c1:
+            discharge_id = st.text_input("Patient ID to discharge")
+            if st.button("Discharge") and discharge_id:
+                if discharge_id in allocator.patients:
+                    moved = allocator.discharge(discharge_id)
+                    st.success(f"Discharged {discharge_id}" + (f" — bed given to {moved['Patient']}" if moved else ""))
+                else:
+                    st.warning(f"Unknown patient {discharge_id}")
+        with c2:
+            reprio_id = st.text_input("Patient ID to re-triage")
+            new_severity = st.slider("New severity", 0.0, 1.0, 0.5, 0.01)
+            if st.button("Update severity") and reprio_id:
+                if reprio_id in allocator.patients:
+                    allocator.reprioritize(reprio_id, new_severity)
+                else:
+                    st.warning(f"Unknown patient {reprio_id}")
+
+        snap = allocator.snapshot()
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Occupied beds", snap["occupied"])
+        m2.metric("Free beds", snap["free"])
+        m3.metric("Waiting", len(snap["waiting"]))
+        st.dataframe(pd.DataFrame(snap["allocations"]))
+        if snap["waiting"]:
+            st.write("Waiting for a bed:")
+            st.dataframe(pd.DataFrame(snap["waiting"]))
+
 # ---------------------- Step 4 ----------------------
 st.markdown("---")
 st.markdown("## Step 4 — 🕒 CSP-based Staff & Surgery Scheduling System")
 
+csp_engine = st.radio("Scheduling engine", options=["propagate", "portfolio", "reference"], horizontal=True,
+                      help="propagate: array-based forward checking, scales to hundreds of cases. "
+                           "portfolio: several solver configurations race on all CPU cores. reference: python-constraint.")
+CALENDAR_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "calendar"))
+use_calendar = st.checkbox("Use resource calendar (data/calendar/: surgeon shifts, room equipment, procedure durations)", value=False)
+
+@st.cache_resource
+def load_calendar(path):
+    from modules.resource_calendar import ResourceCalendar
+    return ResourceCalendar.load_dir(path)
+
+# default: as many of the most severe cases as the doctors, rooms and slots can hold
 import modules.csp_scheduler as csp
+df_proc = st.session_state.get("df_processed", df)
+schedule_calendar = load_calendar(CALENDAR_DIR) if use_calendar else None
+case_cols = [c for c in ("patient_id", "fuzzy_severity", "diagnosis") if c in df_proc.columns]
+if "fuzzy_severity" in case_cols:
+    from modules.patient_store import PatientStore
+    cases = PatientStore.from_frame(df_proc[case_cols])
+else:
+    cases = df_proc[case_cols].head(csp.case_capacity(calendar=schedule_calendar)).to_dict(orient="records")
+default_cases = csp.max_schedulable(cases, calendar=schedule_calendar)
+max_cases = st.number_input("Cases to schedule (most severe first)", min_value=1, max_value=max(len(df_proc), 1),
+                            value=min(max(default_cases, 1), max(len(df_proc), 1)), step=1)
 
 if st.button("Run CSP Scheduling Optimization"):
     with st.spinner("Solving scheduling constraints..."):
-        df_proc = st.session_state.get("df_processed", df)
-        patients = df_proc[["patient_id", "fuzzy_severity"]].to_dict(orient="records")
-
-        schedule = csp.build_schedule(patients)
+        config = pipeline.PipelineConfig(schedule_engine=csp_engine, max_cases=int(max_cases),
+                                         calendar=schedule_calendar,
+                                         deterministic=deterministic_summaries, index=retrieval_index)
+        scheduled = pipeline.schedule_stage(df_proc, config)
+        schedule = scheduled.schedule
 
     # Store in session state for RAG
     st.session_state["surgery_schedule"] = schedule
+    st.session_state["schedule_calendar"] = scheduled.calendar
 
     if schedule:
         st.success("✅ Schedule generated successfully!")
@@ -166,9 +275,8 @@ if st.button("Run CSP Scheduling Optimization"):
         
         # AI Summary using RAG
         try:
-            from modules.rag_summarizer import summarize_results
             with st.spinner("🤖 Generating AI summary..."):
-                summary = summarize_results(schedule_data=schedule)
+                summary = pipeline.summary_stage(schedule=scheduled, config=config).summaries["schedule"]
             
             st.markdown("### 🤖 AI-Generated Summary (Simple English)")
             st.info(summary)
@@ -177,6 +285,37 @@ if st.button("Run CSP Scheduling Optimization"):
     else:
         st.error("No feasible schedule found.")
 
+schedule = st.session_state.get("surgery_schedule")
+if schedule and "Error" not in schedule[0]:
+    with st.expander("🚑 Emergency case / cancellation (repairs the current schedule)"):
+        c1, c2 = st.columns(2)
+        with c1:
+            emergency_id = st.text_input("Emergency patient ID")
+            emergency_severity = st.slider("Emergency severity", 0.0, 1.0, 0.95, 0.01)
+            schedule_calendar = st.session_state.get("schedule_calendar")
+            # the diagnosis decides duration and the equipment the room needs
+            diagnoses = sorted(schedule_calendar.procedures) if schedule_calendar is not None else []
+            emergency_diagnosis = st.selectbox("Emergency diagnosis", ["(unknown)"] + diagnoses)
+        with c2:
+            cancel_id = st.text_input("Cancel patient ID")
+        if st.button("Repair schedule"):
+            changes = {}
+            if emergency_id:
+                emergency = {"patient_id": emergency_id, "fuzzy_severity": emergency_severity}
+                if emergency_diagnosis != "(unknown)":
+                    emergency["diagnosis"] = emergency_diagnosis
+                changes["add"] = [emergency]
+            if cancel_id:
+                changes["remove"] = [cancel_id]
+            schedule, diff = csp.reschedule(schedule, changes, calendar=schedule_calendar)
+            st.session_state["surgery_schedule"] = schedule
+            st.dataframe(pd.DataFrame(schedule))
+            if diff:
+                st.write("Changes:")
+                st.dataframe(pd.DataFrame(diff))
+            else:
+                st.info("No cases had to move.")
+
 # ---------------------- Step 5 ----------------------
 st.markdown("---")
 st.markdown("## Step 5 — 📊 Comprehensive AI Summary")
@@ -188,17 +327,69 @@ if st.button("🤖 Generate Complete AI Summary"):
     
     if allocations or schedule:
         try:
-            from modules.rag_summarizer import summarize_results
-            with st.spinner("🤖 Generating comprehensive AI summary..."):
-                summary = summarize_results(
-                    allocation_data=allocations,
-                    schedule_data=schedule,
-                    total_patients=total_patients
-                )
-            
-            st.markdown("### 📋 Complete System Summary")
-            st.success(summary)
+            from modules.rag_summarizer import AsyncRAGSummarizer, stream_summaries
+            # bed, schedule and combined summaries are requested concurrently and streamed as they arrive
+            titles = {"combined": "### 📋 Complete System Summary", "bed": "#### 🛏️ Bed Allocation",
+                      "schedule": "#### 🏥 Surgery Schedule"}
+            placeholders, streamed = {}, {}
+            for kind, title in titles.items():
+                st.markdown(title)
+                placeholders[kind] = st.empty()
+            summarizer = AsyncRAGSummarizer(deterministic=deterministic_summaries, index=retrieval_index)
+            for kind, delta, results in stream_summaries(allocations, schedule, total_patients, summarizer=summarizer):
+                if results is not None:
+                    for kind, text in results.items():
+                        placeholders[kind].success(text)
+                    break
+                streamed[kind] = streamed.get(kind, "") + delta
+                placeholders[kind].markdown(streamed[kind] + "▌")
+            if retrieval_index is not None:
+                retrieval_index.save()
+            for kind in titles:
+                if kind not in results:
+                    placeholders[kind].caption("Not available for the current results.")
+            ttft = min((t["ttft_s"] for t in summarizer.timings.values()), default=None)
+            if ttft is not None:
+                st.caption(f"First token after {ttft:.2f}s, all summaries after "
+                           f"{max(t['total_s'] for t in summarizer.timings.values()):.2f}s")
         except Exception as e:
             st.error(f"Error generating summary: {str(e)}")
     else:
         st.warning("⚠️ Please run A* Bed Allocation and/or CSP Scheduling first to generate a summary.")
+
+# Summary cache counters
+try:
+    from modules.rag_summarizer import get_default_cache
+    cache_stats = get_default_cache().stats()
+    st.sidebar.caption(f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['hit_rate']:.0%} hit rate)")
+except Exception:
+    pass
+
+# ---------------------- Performance ----------------------
+if perf_run:
+    st.session_state["perf_run"] = (instrumentation.snapshot(perf_run), instrumentation.prometheus_text(perf_run))
+
+if collect_metrics:
+    with st.sidebar.expander("⏱️ Performance of the last run", expanded=False):
+        if "perf_run" not in st.session_state:
+            st.caption("Run a step to see its stage timings and counters.")
+        else:
+            import json
+            perf, perf_text = st.session_state["perf_run"]
+
+            def _label_text(labels):
+                return ", ".join(f"{k}={v}" for k, v in labels.items())
+
+            st.dataframe(pd.DataFrame([
+                {"timer": h["name"], "labels": _label_text(h["labels"]), "calls": h["count"],
+                 "total_s": round(h["sum"], 4), "mean_ms": round(1000 * h["sum"] / h["count"], 2),
+                 "p95_ms": round(1000 * h["p95"], 2)}
+                for h in perf["histograms"]
+            ]), hide_index=True)
+            st.dataframe(pd.DataFrame([
+                {"counter": c["name"], "labels": _label_text(c["labels"]), "value": c["value"]}
+                for c in perf["counters"]
+            ]), hide_index=True)
+            st.download_button("Download JSON", json.dumps(perf, indent=2), file_name="metrics.json")
+            st.download_button("Download Prometheus text", perf_text, file_name="metrics.prom")
@@ -0,0 +1,5 @@
+"""
+Standalone benchmark scripts. Run from the src/ directory, e.g.
+
+    python -m benchmarks.bench_fuzzy_triage
+"""
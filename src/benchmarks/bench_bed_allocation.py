@@ -0,0 +1,63 @@
+"""
+Benchmark: per-bed A* scan versus the distance-field + heap allocator.
+
+    python -m benchmarks.bench_bed_allocation --grids 6 50 200 --patients 10000
+
+The A* path scans every free bed for every patient, so it is only run on
+the first --astar-patients patients (beyond grid 6) and extrapolated by
+the number of A* searches the full run would make.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from modules import a_star_bed_allocation as bed_alloc
+
+
+def make_patients(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return [{"patient_id": f"P{i:07d}", "fuzzy_severity": float(s)} for i, s in enumerate(rng.random(n))]
+
+
+def astar_searches(n_patients, n_beds):
+    """A* calls made by the reference allocator: one per free bed per patient."""
+    k = min(n_patients, n_beds)
+    return k * n_beds - k * (k - 1) // 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grids", type=int, nargs="+", default=[6, 50, 200])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--astar-patients", type=int, default=2)
+    args = parser.parse_args()
+
+    patients = make_patients(args.patients)
+
+    print(f"{'grid':>6} {'beds':>7} {'A* scan (s)':>14} {'field (s)':>10} {'field cold (s)':>15}")
+    for g in args.grids:
+        n_beds = g * g
+        k = args.patients if g <= 6 else min(args.patients, args.astar_patients)
+        start = time.perf_counter()
+        bed_alloc.allocate_beds(patients[:k], g, engine="astar")
+        astar_s = time.perf_counter() - start
+        astar_s *= astar_searches(args.patients, n_beds) / astar_searches(k, n_beds)
+
+        bed_alloc._distance_field.cache_clear()
+        start = time.perf_counter()
+        bed_alloc.allocate_beds(patients, g)
+        cold_s = time.perf_counter() - start
+        start = time.perf_counter()
+        bed_alloc.allocate_beds(patients, g)
+        field_s = time.perf_counter() - start
+
+        marker = "*" if k < args.patients else " "
+        print(f"{g:>6} {n_beds:>7} {astar_s:>13.2f}{marker} {field_s:>10.3f} {cold_s:>15.3f}")
+
+    print("* extrapolated from --astar-patients patients by A* search count")
+
+
+if __name__ == "__main__":
+    main()
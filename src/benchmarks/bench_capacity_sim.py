@@ -0,0 +1,48 @@
+"""
+Throughput of the capacity simulation: replications per second by worker
+count, and the projected wall time of --target replications.
+
+    python -m benchmarks.bench_capacity_sim --days 30 --replications 50 --workers 1 2 4
+
+The patient pool is triaged once; each worker count runs the same seeds,
+so the reported metrics must be identical across rows.
+"""
+
+import argparse
+import json
+import os
+
+from modules.capacity_sim import PatientPool, SimulationConfig, run_monte_carlo
+from benchmarks.bench_fuzzy_triage import DATA_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--replications", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--target", type=int, default=1000, help="replications to project the wall time for")
+    parser.add_argument("--ward-map", default=os.path.join(os.path.dirname(DATA_PATH), "ward_map.txt"))
+    args = parser.parse_args()
+
+    config = SimulationConfig(days=args.days, ward_map=args.ward_map)
+    pool = PatientPool.load(DATA_PATH, fuzzy=config.fuzzy)
+    report = {"days": args.days, "replications": args.replications, "cpu_count": os.cpu_count(), "runs": []}
+    baseline = None
+    for workers in dict.fromkeys(args.workers):
+        result = run_monte_carlo(config, args.replications, workers=workers, pool=pool)
+        per_s = args.replications / result["elapsed_s"]
+        report["runs"].append({
+            "workers": result["workers"],
+            "elapsed_s": result["elapsed_s"],
+            "replications_per_s": round(per_s, 2),
+            f"projected_s_for_{args.target}": round(args.target / per_s, 1),
+            "same_metrics": baseline is None or result["metrics"] == baseline,
+        })
+        baseline = baseline or result["metrics"]
+    report["metrics_p50"] = {k: round(v["p50"], 3) for k, v in baseline.items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: solve time versus case count for the python-constraint
+reference solver and the array-based propagation engine.
+
+    python -m benchmarks.bench_csp_scheduler --reference-sizes 3 5 8 10 --sizes 10 50 100 200 300
+
+Both engines get the same resources (--doctors, --rooms, a 15-minute day).
+Reference runs happen in a child process and are abandoned after
+--timeout seconds.
+
+    python -m benchmarks.bench_csp_scheduler --calendar --sizes 100 200 400
+
+--calendar instead schedules against a synthetic 50 surgeon x 30 room x
+96 slot ResourceCalendar (availability windows, shift limits, equipment).
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import csp_scheduler
+from modules.resource_calendar import ResourceCalendar
+
+DIAGNOSES = ["Heart Attack", "Stroke", "Appendicitis", "Trauma", "Fracture", "Burns", "Sepsis", "COPD"]
+
+
+def make_patients(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return [{"patient_id": f"P{i:04d}", "fuzzy_severity": float(s)} for i, s in enumerate(rng.random(n))]
+
+
+def synthetic_calendar(n_surgeons=50, n_rooms=30, seed=42):
+    """24h day of 15-minute slots (96) with random shifts, limits and equipment."""
+    rng = np.random.default_rng(seed)
+    equipment = ["anesthesia", "c-arm", "laparoscopy", "cardiac bypass", "burns"]
+    surgeons = []
+    for i in range(n_surgeons):
+        start = int(rng.integers(0, 12))
+        surgeons.append({"surgeon": f"Dr. {i:02d}", "start": f"{start:02d}:00", "end": f"{start + 12:02d}:00",
+                         "max_minutes": int(rng.choice([360, 480, 600]))})
+    rooms = []
+    for i in range(n_rooms):
+        extra = rng.choice(equipment[1:], size=2, replace=False)
+        rooms.append({"room": f"OR {i:02d}", "start": "00:00", "end": "23:59",
+                      "equipment": ";".join(["anesthesia", *extra])})
+    procedures = pd.DataFrame({
+        "diagnosis": DIAGNOSES,
+        "duration_minutes": [180, 120, 60, 150, 90, 120, 45, 30],
+        "equipment": ["anesthesia;cardiac bypass", "anesthesia;c-arm", "anesthesia;laparoscopy", "anesthesia;c-arm",
+                      "anesthesia;c-arm", "anesthesia;burns", "", ""],
+    })
+    return ResourceCalendar(pd.DataFrame(surgeons), pd.DataFrame(rooms), procedures,
+                            day_start="00:00", day_end="24:00", slot_minutes=15)
+
+
+def _timed_calendar_run(n):
+    calendar = synthetic_calendar()
+    rng = np.random.default_rng(7)
+    patients = make_patients(n)
+    for p in patients:
+        p["diagnosis"] = str(rng.choice(DIAGNOSES))
+    start = time.perf_counter()
+    schedule = csp_scheduler.build_schedule(patients, max_cases=None, calendar=calendar)
+    return time.perf_counter() - start, "Error" not in schedule[0]
+
+
+def resources(n_doctors, n_rooms):
+    doctors = [f"Dr. {i:02d}" for i in range(n_doctors)]
+    rooms = [f"OR {i:02d}" for i in range(n_rooms)]
+    return doctors, rooms, csp_scheduler.day_timeslots()
+
+
+def _timed_run(queue, n, engine, n_doctors, n_rooms):
+    doctors, rooms, slots = resources(n_doctors, n_rooms)
+    patients = make_patients(n)
+    start = time.perf_counter()
+    schedule = csp_scheduler.build_schedule(patients, doctors, rooms, slots, max_cases=None, engine=engine)
+    queue.put((time.perf_counter() - start, "Error" not in schedule[0]))
+
+
+def run_with_timeout(n, engine, n_doctors, n_rooms, timeout):
+    queue = mp.Queue()
+    proc = mp.Process(target=_timed_run, args=(queue, n, engine, n_doctors, n_rooms))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        return None, None
+    return queue.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reference-sizes", type=int, nargs="+", default=[3, 5, 8, 10, 12])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 300])
+    parser.add_argument("--doctors", type=int, default=12)
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--calendar", action="store_true")
+    args = parser.parse_args()
+
+    if args.calendar:
+        print(f"{'cases':>6} {'solve (s)':>10} {'feasible':>9}")
+        for n in args.sizes:
+            elapsed, feasible = _timed_calendar_run(n)
+            print(f"{n:>6} {elapsed:>10.3f} {str(feasible):>9}")
+        return
+
+    print(f"{'engine':>10} {'cases':>6} {'solve (s)':>10} {'feasible':>9}")
+    for engine, sizes in (("reference", args.reference_sizes), ("propagate", args.sizes)):
+        for n in sizes:
+            elapsed, feasible = run_with_timeout(n, engine, args.doctors, args.rooms, args.timeout)
+            shown = f">{args.timeout:.0f}" if elapsed is None else f"{elapsed:.3f}"
+            print(f"{engine:>10} {n:>6} {shown:>10} {str(feasible):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: per-row fuzzy triage (df.apply + ControlSystemSimulation)
+versus the vectorized compute_severity_batch engine.
+
+    python -m benchmarks.bench_fuzzy_triage --sizes 500 50000 1000000
+
+The per-row path is timed on at most --scalar-limit rows and extrapolated
+linearly for larger sizes (it would take tens of minutes at 1M rows).
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import fuzzy_triage
+
+DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv"))
+
+
+def sample_vitals(n, seed=42):
+    """Resample the bundled dataset's vitals to n rows."""
+    base = pd.read_csv(DATA_PATH, usecols=fuzzy_triage.VITAL_COLUMNS)
+    rng = np.random.default_rng(seed)
+    return base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+
+
+def time_scalar(df, system_ctrl):
+    start = time.perf_counter()
+    scores = df.apply(lambda row: fuzzy_triage.compute_severity(row, system_ctrl), axis=1).to_numpy()
+    return time.perf_counter() - start, scores
+
+
+def time_batch(df, system_ctrl):
+    start = time.perf_counter()
+    scores = fuzzy_triage.compute_severity_batch(df, system_ctrl)
+    return time.perf_counter() - start, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 50_000, 1_000_000])
+    parser.add_argument("--scalar-limit", type=int, default=2000)
+    args = parser.parse_args()
+
+    system_ctrl = fuzzy_triage.build_fuzzy_system()
+    compiled = fuzzy_triage.compile_fuzzy_system(system_ctrl)
+
+    print(f"{'rows':>10} {'per-row (s)':>14} {'batch (s)':>10} {'speedup':>9} {'max |diff|':>11}")
+    for n in args.sizes:
+        df = sample_vitals(n)
+        k = min(n, args.scalar_limit)
+        scalar_s, scalar_scores = time_scalar(df.iloc[:k], system_ctrl)
+        scalar_s *= n / k
+        batch_s, batch_scores = time_batch(df, compiled)
+        max_diff = float(np.max(np.abs(scalar_scores - batch_scores[:k])))
+        marker = "*" if k < n else " "
+        print(f"{n:>10} {scalar_s:>13.2f}{marker} {batch_s:>10.3f} {scalar_s / batch_s:>8.0f}x {max_diff:>11.2e}")
+
+    print("* extrapolated from the first --scalar-limit rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Startup budget: import time of what the app and the CLI load before any
+step runs, and the time to get the compiled fuzzy system on a warm disk
+cache (what the first triage after a restart pays).
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeat 7 --scale 2   # slower machine
+
+Every target runs in a fresh interpreter under `python -X importtime`
+(best of --repeat), after numpy and pandas, which every entry point pays
+for anyway; what it imports beyond them is its cost, reported with its
+slowest imports.
+The run fails (status 1) when a target exceeds its budget in BUDGETS_MS
+or pulls in one of the HEAVY packages, which belong to the steps that
+use them (see the lazy imports in fuzzy_triage, a_star_bed_allocation,
+csp_scheduler, retrieval_index and rag_summarizer).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+BASE = "import numpy\nimport pandas"
+BASE_LAST = "pandas"
+
+TARGETS = {
+    "pipeline": "from modules import pipeline",
+    "rag_summarizer": "from modules import rag_summarizer",
+    # module-level imports of app.py up to the first button (streamlit aside)
+    "app_startup": "from modules import instrumentation, pipeline\nfrom modules.rag_summarizer import get_default_cache",
+}
+
+# milliseconds on top of BASE
+BUDGETS_MS = {"pipeline": 100, "rag_summarizer": 100, "app_startup": 150, "fuzzy_system_load": 25}
+
+HEAVY = ("skfuzzy", "networkx", "scipy.optimize", "scipy.sparse", "constraint", "groq", "sklearn")
+
+LOAD_SNIPPET = """
+import json, time
+from modules import pipeline
+start = time.perf_counter()
+pipeline.fuzzy_system("exact")
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+
+def parse_importtime(stderr, after=BASE_LAST):
+    """
+    Imports from -X importtime output that come after the top-level import
+    of after: ({module: cumulative us}, total us of the top-level ones).
+    """
+    modules, total, started = {}, 0, after is None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header
+        top_level = not name[1:].startswith(" ")
+        if not started:
+            started = top_level and name.strip() == after
+            continue
+        modules[name.strip()] = int(cumulative)
+        if top_level:
+            total += int(cumulative)
+    return modules, total
+
+
+def run_python(code, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(cmd, cwd=SRC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def import_cost(code, repeat):
+    """(best total us, {module: cumulative us} of that run, HEAVY packages loaded)."""
+    probe = f"{BASE}\n{code}\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    best = None
+    for _ in range(repeat):
+        result = run_python(probe, importtime=True)
+        modules, total = parse_importtime(result.stderr)
+        if best is None or total < best[0]:
+            best = (total, modules, [m for m in result.stdout.strip().split(",") if m])
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    parser.add_argument("--top", type=int, default=5, help="slowest added imports listed per target")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    run_python(LOAD_SNIPPET)  # compile .pyc files and fill the fuzzy system cache
+    report = {"python": sys.version.split()[0], "results": [], "ok": True}
+
+    def record(name, ms, extra):
+        budget = BUDGETS_MS[name] * args.scale
+        entry = dict({"target": name, "ms": round(ms, 1), "budget_ms": budget}, **extra)
+        entry["ok"] = ms <= budget and not extra.get("heavy")
+        report["ok"] &= entry["ok"]
+        report["results"].append(entry)
+
+    for name in args.targets:
+        total_us, modules, heavy = import_cost(TARGETS[name], args.repeat)
+        slowest = sorted(((us, m) for m, us in modules.items()), reverse=True)[:args.top]
+        record(name, total_us / 1000,
+               {"heavy": heavy, "slowest": {m: round(us / 1000, 1) for us, m in slowest}})
+
+    load_s = min(json.loads(run_python(LOAD_SNIPPET).stdout)["seconds"] for _ in range(args.repeat))
+    record("fuzzy_system_load", load_s * 1000, {})
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    for entry in report["results"]:
+        if not entry["ok"]:
+            reason = f"imports {', '.join(entry['heavy'])}" if entry.get("heavy") else "over budget"
+            print(f"{entry['target']}: {entry['ms']} ms (budget {entry['budget_ms']} ms), {reason}", file=sys.stderr)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Peak memory and wall time of triage + allocation on a large patient file:
+whole-file pandas read (run_pipeline) versus the batched Parquet path
+(run_streaming).
+
+    python -m benchmarks.bench_ingest --rows 2000000
+
+A CSV of --rows rows is resampled from the bundled dataset (new ids)
+into a temporary directory. Each mode runs in its own subprocess so the
+reported peak RSS is not shared between them; the streaming run is timed
+cold (CSV -> Parquet conversion included) and warm (cache hit).
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_fuzzy_triage import DATA_PATH
+
+
+def write_sample_csv(path, n, seed=0, chunk=250_000):
+    base = pd.read_csv(DATA_PATH)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunk):
+        part = base.iloc[rng.integers(0, len(base), size=min(chunk, n - start))].reset_index(drop=True)
+        part["patient_id"] = [f"S{i:09d}" for i in range(start, start + len(part))]
+        part.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def run_mode(mode, path, cache_dir):
+    """Child process: run one mode and print its stats as JSON."""
+    from modules import ingest, pipeline
+
+    ingest.PARQUET_CACHE_DIR = cache_dir
+    config = pipeline.PipelineConfig(fuzzy="lut")
+    stages = ("triage", "allocate")
+    start = time.perf_counter()
+    if mode == "full":
+        results = pipeline.run_pipeline(pipeline.load_patients(path), config, stages)
+    else:
+        results = pipeline.run_streaming(path, config, stages)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "mean_severity": round(results["triage"].mean_severity, 6),
+    }))
+
+
+def child(mode, path, cache_dir):
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_ingest", "--child", mode, path, cache_dir],
+                         check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "CACHE_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_mode(*args.child)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="ingest_bench_")
+    try:
+        path = os.path.join(tmp, "patients.csv")
+        write_sample_csv(path, args.rows)
+        cache_dir = os.path.join(tmp, "cache")
+        report = {"rows": args.rows, "csv_mb": round(os.path.getsize(path) / 2 ** 20, 1)}
+        report["full_read"] = child("full", path, cache_dir)
+        report["streaming_cold"] = child("stream", path, cache_dir)
+        report["streaming_warm"] = child("stream", path, cache_dir)
+        report["parquet_mb"] = round(sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir)) / 2 ** 20, 1)
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Memory and top-k query time of PatientStore against the list of patient
+dicts it replaces.
+
+    python -m benchmarks.bench_patient_store --rows 1000000
+    python -m benchmarks.bench_patient_store --rows 100000 --k 5 50 500 --repeat 5
+
+A synthetic dataset (modules.synthetic_data) is scored with the --fuzzy
+engine and its patient_id, fuzzy_severity, diagnosis and
+recommended_bed_type columns are held both ways. Reported:
+
+    memory        bytes per patient still allocated (tracemalloc) after
+                  building to_dict(orient="records") / PatientStore.from_frame
+                  plus its severity order
+    top_k         the k most severe: sorted()[:k] and heapq.nlargest on the
+                  list, top_indices on a fresh store (partition) and on one
+                  with the cached order
+    build_schedule  build_schedule(max_cases=5) given the list / the store
+    update        new severities for --updates patients: repairing the
+                  cached order vs a full re-sort
+
+Exits with status 1 when the store does not use at least
+--min-memory-ratio times less memory per patient than the list.
+"""
+
+import argparse
+import heapq
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from modules import csp_scheduler as csp
+from modules import fuzzy_triage, synthetic_data
+from modules.patient_store import PatientStore
+from modules.pipeline import fuzzy_system
+
+COLUMNS = ["patient_id", "fuzzy_severity", "diagnosis", "recommended_bed_type"]
+
+
+def best_of(fn, repeat):
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def retained_bytes(build):
+    """(bytes still allocated after build(), its return value)."""
+    tracemalloc.start()
+    try:
+        value = build()
+        return tracemalloc.get_traced_memory()[0], value
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 100, 1000])
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="lut")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-memory-ratio", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = synthetic_data.generate_patients(args.rows, seed=args.seed)
+    df["fuzzy_severity"] = fuzzy_triage.compute_severity_batch(df, fuzzy_system(args.fuzzy))
+    frame = df[COLUMNS]
+    del df
+    n = len(frame)
+
+    list_bytes, patients = retained_bytes(lambda: frame.to_dict(orient="records"))
+    store_bytes, store = retained_bytes(lambda: PatientStore.from_frame(frame))
+    # the first queries run on a store without the cached order
+    cold = PatientStore.from_frame(frame)
+    order_bytes, _ = retained_bytes(store.order)
+    memory = {
+        "list_bytes_per_patient": round(list_bytes / n, 1),
+        "store_bytes_per_patient": round((store_bytes + order_bytes) / n, 1),
+        "store_nbytes_per_patient": round(store.nbytes / n, 1),
+        "store_dtype": str(store.data.dtype),
+    }
+    memory["ratio"] = round(memory["list_bytes_per_patient"] / memory["store_bytes_per_patient"], 1)
+
+    key = lambda p: p.get("fuzzy_severity", 0)
+    top_k = []
+    for k in args.k:
+        expected = [p["patient_id"] for p in sorted(patients, key=key, reverse=True)[:k]]
+        timings = {
+            "list_sorted": best_of(lambda: sorted(patients, key=key, reverse=True)[:k], args.repeat)[0],
+            "list_nlargest": best_of(lambda: heapq.nlargest(k, patients, key=key), args.repeat)[0],
+            "store_partition": best_of(lambda: cold.top_indices(k), args.repeat)[0],
+            "store_cached_order": best_of(lambda: store.top_indices(k), args.repeat)[0],
+        }
+        same = all([p.get("patient_id") for p in s.top(k)] == expected for s in (cold, store))
+        top_k.append(dict({"k": k, "same_patients": same}, **{name: round(s * 1000, 3) for name, s in timings.items()}))
+
+    list_s, list_schedule = best_of(lambda: csp.build_schedule(patients, max_cases=5), args.repeat)
+    store_s, store_schedule = best_of(lambda: csp.build_schedule(cold, max_cases=5), args.repeat)
+    schedule = {"list_ms": round(list_s * 1000, 3), "store_ms": round(store_s * 1000, 3),
+                "same_schedule": list_schedule == store_schedule}
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(n, min(args.updates, n), replace=False)
+    values = rng.random(len(rows))
+    start = time.perf_counter()
+    store.update_severity(rows, values)
+    repair_s = time.perf_counter() - start
+    repaired = store._order.copy()
+    resort_s, resorted = best_of(lambda: np.argsort(-store.severity, kind="stable"), args.repeat)
+    update = {"patients": len(rows), "repair_ms": round(repair_s * 1000, 3), "resort_ms": round(resort_s * 1000, 3),
+              "same_order": bool(np.array_equal(repaired, resorted))}
+
+    report = {"rows": n, "fuzzy": args.fuzzy, "memory": memory, "top_k_ms": top_k,
+              "build_schedule": schedule, "update_severity": update}
+    report["meets_memory_ratio"] = memory["ratio"] >= args.min_memory_ratio
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["meets_memory_ratio"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+End-to-end benchmark of the pipeline on seeded synthetic datasets.
+
+    python -m benchmarks.bench_pipeline --sizes 1000 10000 100000 1000000 --output bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json
+
+For every size a dataset is generated with modules.synthetic_data (same
+schema and seed, so runs are comparable across commits and machines) and
+each stage is run on it:
+
+    severity_scalar   compute_severity row by row (first --scalar-rows rows)
+    severity_batch    compute_severity_batch (--fuzzy engine)
+    allocate_beds     bed allocation on the scored records
+    build_schedule    CSP schedule of the --max-cases most severe patients
+                      over a full day of 15-minute slots (csp.day_timeslots)
+    prompts           bed_allocation_prompt + schedule_prompt + combined_prompt
+
+Each stage is timed (best of --repeat) without tracing, then run once
+more under tracemalloc for its peak Python allocation. A stage that
+returns an {"Error": ...} entry stops the run instead of timing a
+rejection. The report is
+JSON with machine / library versions; --compare prints the time ratio
+of every (size, stage) against an earlier report and exits with status
+1 when one is slower than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from modules import a_star_bed_allocation as bed_alloc
+from modules import csp_scheduler as csp
+from modules import fuzzy_triage, synthetic_data
+from modules.pipeline import fuzzy_system
+from modules.rag_summarizer import bed_allocation_prompt, combined_prompt, schedule_prompt
+
+STAGES = ("severity_scalar", "severity_batch", "allocate_beds", "build_schedule", "prompts")
+
+
+def machine_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def measure(fn, repeat, trace=True):
+    """(best seconds over repeat runs, tracemalloc peak in MB or None, last return value)."""
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    peak_mb = None
+    if trace:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb, value
+
+
+def run_size(n, args, system):
+    """Results of every selected stage on an n-row dataset."""
+    start = time.perf_counter()
+    df = synthetic_data.generate_patients(n, seed=args.seed)
+    results = [{"rows": n, "dataset_rows": n, "stage": "generate",
+                "seconds": round(time.perf_counter() - start, 4), "peak_mb": None}]
+
+    def record(stage, rows, fn):
+        seconds, peak_mb, value = measure(fn, args.repeat, trace=not args.no_memory)
+        if isinstance(value, list) and value and isinstance(value[0], dict) and "Error" in value[0]:
+            raise RuntimeError(f"{stage} failed on {n} rows: {value[0]['Error']}")
+        results.append({
+            "rows": rows,
+            "dataset_rows": n,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "rows_per_s": round(rows / seconds) if seconds > 0 else None,
+            "peak_mb": round(peak_mb, 3) if peak_mb is not None else None,
+        })
+        return value
+
+    if "severity_scalar" in args.stages:
+        sample = df.head(args.scalar_rows)
+        scalar_system = fuzzy_triage.build_fuzzy_system() if args.fuzzy == "exact" else system
+        record("severity_scalar", len(sample),
+               lambda: [fuzzy_triage.compute_severity(row, scalar_system) for _, row in sample.iterrows()])
+
+    severity = fuzzy_triage.compute_severity_batch(df, system)
+    if "severity_batch" in args.stages:
+        severity = record("severity_batch", n, lambda: fuzzy_triage.compute_severity_batch(df, system))
+
+    patients = pd.DataFrame({"patient_id": df["patient_id"], "fuzzy_severity": severity,
+                             "diagnosis": df["diagnosis"]}).to_dict(orient="records")
+    allocations = bed_alloc.allocate_beds(patients, grid_size=args.grid_size)
+    if "allocate_beds" in args.stages:
+        allocations = record("allocate_beds", n, lambda: bed_alloc.allocate_beds(patients, grid_size=args.grid_size))
+
+    # the demo's 4 slots hold only 8 cases; a working day fits --max-cases
+    timeslots = csp.day_timeslots()
+    schedule = csp.build_schedule(patients, timeslots=timeslots, max_cases=args.max_cases)
+    if "build_schedule" in args.stages:
+        schedule = record("build_schedule", n,
+                          lambda: csp.build_schedule(patients, timeslots=timeslots, max_cases=args.max_cases))
+
+    if "prompts" in args.stages:
+        record("prompts", n, lambda: (bed_allocation_prompt(allocations, n), schedule_prompt(schedule),
+                                      combined_prompt(allocations, schedule, n)))
+    return results
+
+
+def compare(report, baseline, threshold):
+    """Time ratio (new / old) per (dataset size, stage) in both reports; True when none exceeds threshold."""
+    old = {(r["dataset_rows"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    ok = True
+    for r in report["results"]:
+        before = old.get((r["dataset_rows"], r["stage"]))
+        if not before or r["stage"] == "generate":
+            continue
+        ratio = r["seconds"] / before
+        flag = "SLOWER" if ratio > threshold else ""
+        ok &= ratio <= threshold
+        print(f"{r['stage']:>16} {r['dataset_rows']:>10}  {before:10.4f}s -> {r['seconds']:10.4f}s  x{ratio:5.2f} {flag}",
+              file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="exact")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scalar-rows", type=int, default=200, help="rows scored by the row-by-row path")
+    parser.add_argument("--grid-size", type=int, default=6)
+    parser.add_argument("--max-cases", type=int, default=20,
+                        help="cases scheduled over the default doctors and rooms for one day")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare stage times with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio flagged by --compare")
+    args = parser.parse_args()
+
+    system = fuzzy_system(args.fuzzy)
+    report = {"machine": machine_info(), "seed": args.seed, "fuzzy": args.fuzzy, "repeat": args.repeat, "results": []}
+    for n in args.sizes:
+        report["results"] += run_size(n, args, system)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        sys.exit(0 if compare(report, baseline, args.threshold) else 1)
+
+
+if __name__ == "__main__":
+    main()
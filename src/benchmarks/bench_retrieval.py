@@ -0,0 +1,89 @@
+"""
+Build / load / query latency of the retrieval index.
+
+    python -m benchmarks.bench_retrieval --records 1000000 --queries 200
+
+Records are sampled (with new ids) from the diagnosis / symptoms /
+pre_existing_conditions columns of the sample dataset. The index is
+written to a temporary directory and queried through memory-mapped
+segments, the same path the app uses.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.retrieval_index import RECORD_FIELDS, RetrievalIndex, record_texts
+from benchmarks.bench_fuzzy_triage import DATA_PATH
+
+
+def sample_records(n, seed=0):
+    base = pd.read_csv(DATA_PATH, usecols=list(RECORD_FIELDS))
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), size=n)].reset_index(drop=True)
+    df.insert(0, "patient_id", [f"S{i:08d}" for i in range(n)])
+    return df
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--increment", type=int, default=1_000)
+    args = parser.parse_args()
+
+    df = sample_records(args.records)
+    path = tempfile.mkdtemp(prefix="retrieval_bench_")
+    try:
+        start = time.perf_counter()
+        index = RetrievalIndex(path)
+        index.add_records(df)
+        index.save()
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = RetrievalIndex.load(path)
+        load_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        queries = [record_texts(df.iloc[[i]])[0] for i in rng.integers(0, len(df), size=args.queries)]
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            index.search(q, k=args.k)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.asarray(latencies) * 1000
+
+        extra = sample_records(args.increment, seed=2)
+        extra["patient_id"] = [f"N{i:08d}" for i in range(len(extra))]
+        start = time.perf_counter()
+        index.add_records(extra)
+        index.save()
+        increment_s = time.perf_counter() - start
+
+        print(json.dumps({
+            "records": args.records,
+            "build_and_save_s": round(build_s, 2),
+            "load_mmap_s": round(load_s, 4),
+            "index_mb": round(_dir_size(path) / 2 ** 20, 1),
+            "query_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+            "query_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+            f"add_{args.increment}_and_save_s": round(increment_s, 3),
+        }, indent=2))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Accuracy and throughput report for the compiled severity lookup table.
+
+    python -m benchmarks.bench_severity_lut --grids 36,16,28,16 71,31,56,31
+
+Each grid is heart_rate,spo2,temperature,respiratory_rate point counts.
+Errors are measured against the exact vectorized engine; the largest
+errors sit where no rule fires and the exact path drops to the 0.5
+fallback, a discontinuity no interpolation grid can follow.
+"""
+
+import argparse
+import json
+import time
+
+from modules import fuzzy_triage
+from benchmarks.bench_fuzzy_triage import sample_vitals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grids", nargs="+", default=["36,16,28,16", "71,31,56,31"])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=200_000)
+    args = parser.parse_args()
+
+    system_ctrl = fuzzy_triage.build_fuzzy_system()
+    compiled = fuzzy_triage.compile_fuzzy_system(system_ctrl)
+    df = sample_vitals(args.rows)
+
+    start = time.perf_counter()
+    fuzzy_triage.compute_severity_batch(df, compiled)
+    exact_s = time.perf_counter() - start
+
+    for spec in args.grids:
+        grid = dict(zip(fuzzy_triage.VITAL_COLUMNS, (int(v) for v in spec.split(","))))
+
+        start = time.perf_counter()
+        lut = fuzzy_triage.build_severity_lut(compiled, grid=grid)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fuzzy_triage.compute_severity_batch(df, lut)
+        lut_s = time.perf_counter() - start
+
+        report = fuzzy_triage.lut_accuracy_report(compiled, lut, n_samples=args.samples)
+        report.update({
+            "build_or_load_s": round(load_s, 3),
+            "rows": args.rows,
+            "exact_batch_s": round(exact_s, 3),
+            "lut_batch_s": round(lut_s, 3),
+        })
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
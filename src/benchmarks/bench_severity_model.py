@@ -0,0 +1,61 @@
+"""
+RandomForest baseline: training time versus core count, and inference
+throughput by batch size.
+
+    python -m benchmarks.bench_severity_model --rows 100000 --jobs 1 2 4 -1
+
+Rows are resampled from the bundled dataset. Models are fitted without
+saving (model_dir=None) so every run really trains; the last model is
+then used for predict_severity_category at each --batch-sizes value.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import severity_model
+from benchmarks.bench_fuzzy_triage import DATA_PATH
+
+
+def sample_rows(n, seed=0):
+    base = pd.read_csv(DATA_PATH)
+    rng = np.random.default_rng(seed)
+    return base.iloc[rng.integers(0, len(base), size=n)].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, -1])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = sample_rows(args.rows)
+    report = {"rows": args.rows, "cpu_count": os.cpu_count(), "trees": args.trees, "train_s": {}, "predict_rows_per_s": {}}
+
+    model = None
+    for jobs in args.jobs:
+        start = time.perf_counter()
+        model = severity_model.train_model(df, n_jobs=jobs, model_dir=None, n_estimators=args.trees)
+        report["train_s"][str(jobs)] = round(time.perf_counter() - start, 2)
+
+    for size in args.batch_sizes:
+        batch = df.iloc[:size]
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            severity_model.predict_severity_category(batch, model=model)
+            best = min(best, time.perf_counter() - start)
+        report["predict_rows_per_s"][str(size)] = round(len(batch) / best)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
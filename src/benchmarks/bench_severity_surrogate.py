@@ -0,0 +1,70 @@
+"""
+Validation and throughput report for the learned fuzzy surrogate.
+
+    python -m benchmarks.bench_severity_surrogate --rows 1000000 --tolerances 0.01 0.02
+
+For each tolerance the surrogate is built (or loaded from its cache) and
+checked against the exact vectorized engine on uniform samples over the
+input universes and on the bundled dataset: max / mean / p99 absolute
+error, share of rows that fell back to exact inference, and rows/s next
+to the exact engine and the lookup table.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from modules import fuzzy_triage
+from benchmarks.bench_fuzzy_triage import sample_vitals
+
+
+def _rows_per_s(df, system, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fuzzy_triage.compute_severity_batch(df, system)
+        best = min(best, time.perf_counter() - start)
+    return round(len(df) / best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tolerances", type=float, nargs="+", default=[fuzzy_triage.SURROGATE_TOLERANCE])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    compiled = fuzzy_triage.compile_fuzzy_system(fuzzy_triage.build_fuzzy_system())
+    df = sample_vitals(args.rows)
+    exact = fuzzy_triage.compute_severity_batch(df, compiled)
+    baseline = {
+        "rows": args.rows,
+        "exact_rows_per_s": _rows_per_s(df, compiled, args.repeat),
+        "lut_rows_per_s": _rows_per_s(df, fuzzy_triage.build_severity_lut(compiled), args.repeat),
+    }
+    print(json.dumps(baseline, indent=2))
+
+    for tolerance in args.tolerances:
+        start = time.perf_counter()
+        surrogate = fuzzy_triage.build_severity_surrogate(compiled, tolerance=tolerance)
+        build_s = time.perf_counter() - start
+
+        report = fuzzy_triage.surrogate_accuracy_report(compiled, surrogate, n_samples=args.samples)
+        surrogate.reset_counts()  # count over every chunk of the dataset run
+        err = np.abs(fuzzy_triage.compute_severity_batch(df, surrogate) - exact)
+        report.update({
+            "build_or_load_s": round(build_s, 2),
+            "dataset_max_abs_error": float(err.max()),
+            "dataset_mean_abs_error": float(err.mean()),
+            "dataset_fallback_share": surrogate.fallback_share,
+            "surrogate_rows_per_s": _rows_per_s(df, surrogate, args.repeat),
+        })
+        report["speedup_vs_exact"] = round(report["surrogate_rows_per_s"] / baseline["exact_rows_per_s"], 2)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Latency of serial vs concurrent summary generation against a local mock
+of the chat completions API (no network, no API key).
+
+    python -m benchmarks.bench_summarizer --latency 0.3 --tokens 60 --fail-first 1
+
+The mock waits --latency seconds before the first byte and --token-delay
+between streamed tokens, and answers the first --fail-first requests
+with 503 so the retry path is exercised. "serial" is the old behaviour:
+a fresh client per summary, three blocking calls in a row.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from groq import Groq
+
+from modules.rag_summarizer import AsyncRAGSummarizer, RAGSummarizer, run_summaries
+
+
+def make_mock_server(latency=0.3, tokens=60, token_delay=0.005, fail_first=0):
+    """OpenAI-compatible /chat/completions server on a free localhost port (keep-alive, SSE streaming)."""
+    state = {"requests": 0, "connections": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with lock:
+                state["connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                state["requests"] += 1
+                failing = state["requests"] <= fail_first
+            time.sleep(latency)
+            if failing:
+                self._send(503, b'{"error": {"message": "overloaded"}}')
+                return
+
+            words = [f"w{i} " for i in range(tokens)]
+            base = {"id": "mock", "created": 0, "model": request["model"]}
+            if not request.get("stream"):
+                time.sleep(token_delay * tokens)
+                message = {"role": "assistant", "content": "".join(words)}
+                body = dict(base, object="chat.completion",
+                            choices=[{"index": 0, "message": message, "finish_reason": "stop"}])
+                self._send(200, json.dumps(body).encode())
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in words:
+                chunk = dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(token_delay)
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", state
+
+
+def sample_results(n=20):
+    allocations = [{"Patient": f"P{i}", "Severity": 1 - i / n, "Assigned_Bed": f"Bed-({i}, 0)",
+                    "Distance_Cost": i} for i in range(n)]
+    schedule = [{"Patient_ID": f"P{i}", "Severity": 1 - i / n, "Doctor": "Dr. Smith",
+                 "Room": "OT-1", "Time": f"{8 + i}:00"} for i in range(5)]
+    return allocations, schedule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    allocations, schedule = sample_results()
+    report = {}
+
+    server, url, state = make_mock_server(args.latency, args.tokens, args.token_delay)
+    totals = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        for call in ("bed", "schedule", "combined"):
+            summarizer = RAGSummarizer(client=Groq(api_key="mock", base_url=url, max_retries=0), cache=False)
+            if call == "bed":
+                summarizer.create_bed_allocation_summary(allocations, len(allocations))
+            elif call == "schedule":
+                summarizer.create_schedule_summary(schedule)
+            else:
+                summarizer.create_combined_summary(allocations, schedule, len(allocations))
+        totals.append(time.perf_counter() - start)
+    report["serial"] = {"total_s": round(min(totals), 3), "first_result_s": round(min(totals) / 3, 3),
+                        "connections": state["connections"]}
+    server.shutdown()
+
+    server, url, state = make_mock_server(args.latency, args.tokens, args.token_delay, args.fail_first)
+    totals, ttfts = [], []
+    summarizer = AsyncRAGSummarizer(api_key="mock", base_url=url, cache=False, backoff=0.05)
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        results = run_summaries(allocations, schedule, len(allocations), summarizer=summarizer)
+        totals.append(time.perf_counter() - start)
+        ttfts.append(min(t["ttft_s"] for t in summarizer.timings.values()))
+        assert all(not text.startswith("Error") for text in results.values()), results
+    report["concurrent"] = {"total_s": round(min(totals), 3), "first_token_s": round(min(ttfts), 3),
+                            "connections": state["connections"], "requests": state["requests"]}
+    server.shutdown()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Throughput and latency of the streaming triage processor.
+
+    python -m benchmarks.bench_triage_stream --events 500000 --patients 10000
+    python -m benchmarks.bench_triage_stream --source socket --max-batch 256 4096 --max-wait-ms 0 5
+
+Readings are generated up front: every patient starts from a row of the
+bundled dataset (temperature in Fahrenheit, as monitors report it) and
+drifts as a random walk, so bands change now and then. For every
+(max_batch, max_wait) pair the whole stream is pushed as fast as the
+processor accepts it, in chunks of --chunk-lines (about one 64 KB socket
+read), either straight into TriageStream.put ("memory") or through a
+Unix socket ("socket"). Reported: events/s, batches, batch latency
+(oldest queued line to scored), band changes and how often the producer
+had to wait for room (backpressure). --rate paces the producer instead,
+to see the latency at a given load. Exits with status 1 when no
+configuration reaches --target events/s.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import triage_stream
+from modules.pipeline import fuzzy_system
+from benchmarks.bench_fuzzy_triage import DATA_PATH
+
+# random walk step per reading
+STEP = {"heart_rate": 2.0, "spo2": 0.5, "temperature": 0.1, "respiratory_rate": 0.6}
+
+
+def make_events(n_events, n_patients, seed=0):
+    """n_events JSON lines (bytes) of n_patients patients, in arrival order."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(DATA_PATH, usecols=triage_stream.VITALS)[triage_stream.VITALS].dropna()
+    start = base.iloc[rng.integers(0, len(base), n_patients)].to_numpy(dtype=np.float64)
+    celsius = start[:, 2] < 50
+    start[celsius, 2] = start[celsius, 2] * 9 / 5 + 32
+
+    patient = rng.integers(0, n_patients, n_events)
+    steps = rng.normal(size=(n_events, len(STEP))) * np.array([STEP[c] for c in triage_stream.VITALS])
+    # each reading moves its patient's walk by one step: cumulative sum per patient
+    order = np.argsort(patient, kind="stable")
+    walk = np.cumsum(steps[order], axis=0)
+    p = patient[order]
+    group_start = np.flatnonzero(np.r_[True, p[1:] != p[:-1]])
+    walk -= np.repeat(walk[group_start] - steps[order][group_start], np.diff(np.r_[group_start, len(p)]), axis=0)
+    values = np.empty_like(walk)
+    values[order] = start[p] + walk
+    values = np.round(values, 1)
+
+    ts = 1.7e9 + np.arange(n_events) * 1e-3
+    return [('{"patient_id":"P%06d","heart_rate":%.1f,"spo2":%.1f,"temperature":%.1f,"respiratory_rate":%.1f,"ts":%.3f}'
+             % (i, v[0], v[1], v[2], v[3], t)).encode() for i, v, t in zip(patient, values, ts)]
+
+
+async def produce_memory(stream, lines, chunk_lines, rate):
+    started = time.perf_counter()
+    for i in range(0, len(lines), chunk_lines):
+        if rate:
+            ahead = i / rate - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+        await stream.put(lines[i:i + chunk_lines])
+    stream.close()
+
+
+async def produce_socket(stream, lines, chunk_lines, rate):
+    path = os.path.join(tempfile.mkdtemp(), "triage.sock")
+    server = await triage_stream.serve(stream, path=path)
+    _, writer = await asyncio.open_unix_connection(path)
+    started = time.perf_counter()
+    for i in range(0, len(lines), chunk_lines):
+        if rate:
+            ahead = i / rate - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+        writer.write(b"\n".join(lines[i:i + chunk_lines]) + b"\n")
+        await writer.drain()  # blocks while the processor is behind
+    writer.close()
+    await writer.wait_closed()
+    server.close()
+    await server.wait_closed()
+    stream.close()
+    os.unlink(path)
+
+
+async def run_once(lines, system, args, max_batch, max_wait):
+    stream = triage_stream.TriageStream(system=system, max_batch=max_batch, max_wait=max_wait,
+                                        max_pending=args.max_pending, window=args.window)
+    produce = produce_socket if args.source == "socket" else produce_memory
+    start = time.perf_counter()
+    consumer = asyncio.create_task(stream.run())
+    await produce(stream, lines, args.chunk_lines, args.rate)
+    stats = await consumer
+    elapsed = time.perf_counter() - start
+    latency = stream.latency_quantiles()
+    return {
+        "max_batch": max_batch,
+        "max_wait_ms": max_wait * 1000,
+        "events": stats["events"],
+        "seconds": round(elapsed, 3),
+        "events_per_s": round(stats["events"] / elapsed),
+        "batches": stats["batches"],
+        "mean_batch": round(stats["events"] / max(stats["batches"], 1), 1),
+        "latency_ms_p50": round(latency["p50"] * 1000, 2),
+        "latency_ms_p99": round(latency["p99"] * 1000, 2),
+        "latency_ms_max": round(stats["max_latency_s"] * 1000, 2),
+        "band_changes": stats["band_changes"],
+        "backpressure_waits": stats["backpressure_waits"],
+        "max_pending": stats["max_pending"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--source", choices=["memory", "socket"], default="memory")
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="lut")
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[256, 1024, 4096])
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[triage_stream.MAX_WAIT * 1000])
+    parser.add_argument("--max-pending", type=int, default=triage_stream.MAX_PENDING)
+    parser.add_argument("--window", type=int, default=triage_stream.WINDOW)
+    parser.add_argument("--chunk-lines", type=int, default=512, help="lines per put() / socket write")
+    parser.add_argument("--rate", type=float, help="events/s the producer is paced at (default: as fast as accepted)")
+    parser.add_argument("--target", type=float, default=100_000, help="events/s at least one configuration must reach")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    lines = make_events(args.events, args.patients, args.seed)
+    system = fuzzy_system(args.fuzzy)
+    report = {"events": args.events, "patients": args.patients, "source": args.source, "fuzzy": args.fuzzy,
+              "json": triage_stream._loads.__module__, "rate": args.rate, "runs": []}
+    for max_batch in args.max_batch:
+        for max_wait_ms in args.max_wait_ms:
+            report["runs"].append(asyncio.run(run_once(lines, system, args, max_batch, max_wait_ms / 1000)))
+    best = max(r["events_per_s"] for r in report["runs"])
+    report["meets_target"] = best >= args.target
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["meets_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
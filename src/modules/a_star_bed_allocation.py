@@ -1,6 +1,15 @@
 import heapq
+import time
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 
+from . import instrumentation
+from .patient_store import by_severity
+from .ward_map import WardMap
+
 def heuristic(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
@@ -8,12 +17,15 @@ def a_star_search(start, goal, grid_size):
     open_set = []
     heapq.heappush(open_set, (0, start))
     g_score = {start: 0}
+    expanded = pushes = 1
 
     while open_set:
         _, current = heapq.heappop(open_set)
         if current == goal:
+            _count_search(expanded, pushes)
             return g_score[current]
 
+        expanded += 1
         x, y = current
         for dx, dy in [(0,1), (0,-1), (1,0), (-1,0)]:
             neighbor = (x + dx, y + dy)
@@ -23,12 +35,190 @@ def a_star_search(start, goal, grid_size):
                     g_score[neighbor] = tentative_g
                     f = tentative_g + heuristic(neighbor, goal)
                     heapq.heappush(open_set, (f, neighbor))
+                    pushes += 1
+    _count_search(expanded, pushes)
     return float("inf")
 
-def allocate_beds(patients, grid_size=6):
+
+def _count_search(expanded, pushes):
+    instrumentation.count("allocation_astar_searches_total")
+    instrumentation.count("allocation_astar_nodes_expanded_total", expanded)
+    instrumentation.count("allocation_astar_heap_pushes_total", pushes)
+
+def distance_field(grid_size, start=(0, 0)):
+    """
+    BFS distance from start to every cell of an empty grid_size x grid_size
+    grid (same cost A* would find for each goal). Cached per grid layout;
+    the returned array is read-only.
+    """
+    return _distance_field(int(grid_size), tuple(start))
+
+
+@lru_cache(maxsize=32)
+def _distance_field(grid_size, start):
+    dist = np.full((grid_size, grid_size), np.inf)
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        d = dist[x, y] + 1
+        for dx, dy in [(0,1), (0,-1), (1,0), (-1,0)]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < grid_size and 0 <= ny < grid_size and dist[nx, ny] == np.inf:
+                dist[nx, ny] = d
+                queue.append((nx, ny))
+    dist.flags.writeable = False
+    return dist
+
+
+def _bed_heap(grid_size, start_pos):
+    """Free beds as a heap of (distance, x, y); ties break in row-major order like the A* scan."""
+    dist = distance_field(grid_size, start_pos)
+    heap = [(dist[i, j], i, j) for i in range(grid_size) for j in range(grid_size)]
+    heapq.heapify(heap)
+    return heap
+
+
+def _allocation_record(p, bed, cost):
+    return {
+        "Patient": p.get("patient_id", "Unknown"),
+        "Severity": round(p.get("fuzzy_severity", 0), 3),
+        "Assigned_Bed": f"Bed-{bed[0]}-{bed[1]}" if bed else "None",
+        "Distance_Cost": cost
+    }
+
+
+def _to_records(allocations):
+    df_alloc = pd.DataFrame(allocations)
+    if "Distance_Cost" in df_alloc.columns:
+        df_alloc["Distance_Cost"] = pd.to_numeric(df_alloc["Distance_Cost"], errors="coerce")
+
+    return df_alloc.to_dict(orient="records")
+
+
+def allocate_beds(patients, grid_size=6, engine="field", ward_map=None, mode="greedy"):
+    """
+    Assign beds to patients in descending severity, nearest free bed first.
+
+    patients is a list of patient dicts or a PatientStore; a store is
+    walked through its cached severity order instead of being sorted.
+
+    engine="field" computes one distance field from the entrance and pops
+    the nearest free bed from a heap (O(grid + P log B)).
+    engine="astar" is the original per-bed A* scan, kept as a reference.
+
+    With a ward_map (modules.ward_map.WardMap) routing follows the floor
+    plan instead of the empty grid: walls, weighted corridors, several
+    entrances, and each patient only gets a bed of their
+    "recommended_bed_type" (any type when missing). A patient's optional
+    "entrance" key selects the entrance index, otherwise the nearest one.
+
+    mode="optimal" replaces the greedy severity-order pass with one global
+    min-cost assignment minimising sum(severity x distance), see
+    _allocate_beds_optimal.
+    """
+    with instrumentation.timer("allocate_beds", mode=mode, engine="ward" if ward_map is not None else engine):
+        allocations = _allocate_beds(patients, grid_size, engine, ward_map, mode)
+    if instrumentation.enabled():
+        assigned = sum(a.get("Assigned_Bed") not in (None, "None") for a in allocations)
+        instrumentation.count("allocation_patients_total", len(allocations), mode=mode)
+        instrumentation.count("allocation_beds_assigned_total", assigned, mode=mode)
+    return allocations
+
+
+def _allocate_beds(patients, grid_size, engine, ward_map, mode):
+    if mode == "optimal":
+        if ward_map is None:
+            return _allocate_beds_optimal(patients, WardMap.empty_grid(grid_size), respect_types=False)
+        return _allocate_beds_optimal(patients, ward_map)
+    if mode != "greedy":
+        raise ValueError(f"Unknown allocation mode: {mode}")
+    if ward_map is not None:
+        return _allocate_beds_ward(patients, ward_map)
+    if engine == "astar":
+        return _allocate_beds_astar(patients, grid_size)
+    if engine != "field":
+        raise ValueError(f"Unknown allocation engine: {engine}")
+
+    start_pos = (0, 0)
+    patients_sorted = by_severity(patients)
+    free_beds = _bed_heap(grid_size, start_pos)
+    instrumentation.count("allocation_heap_pushes_total", len(free_beds), engine="field")
+    instrumentation.count("allocation_heap_pops_total", min(len(free_beds), len(patients_sorted)), engine="field")
+
+    allocations = []
+    for p in patients_sorted:
+        # same conventions as the A* scan: inf when no bed is left
+        best_bed, best_cost = None, float("inf")
+        if free_beds:
+            cost, i, j = heapq.heappop(free_beds)
+            best_bed = (i, j)
+            # unreachable beds are still handed out, without a cost
+            best_cost = int(cost) if cost != float("inf") else None
+        allocations.append(_allocation_record(p, best_bed, best_cost))
+
+    return _to_records(allocations)
+
+
+def _patient_bed_type(p):
+    bed_type = p.get("recommended_bed_type")
+    if bed_type is None or (isinstance(bed_type, float) and bed_type != bed_type):
+        return None
+    return bed_type
+
+
+def _allocate_beds_ward(patients, ward_map):
+    patients_sorted = by_severity(patients)
+    used = np.zeros(len(ward_map.bed_cells), dtype=bool)
+    heaps = {}
+
+    def free_beds(entrance, bed_type):
+        # one heap of (distance, bed index) per entrance/bed type, built on first use;
+        # beds taken through another heap are skipped lazily on pop
+        key = (entrance, bed_type)
+        if key not in heaps:
+            dist = ward_map.bed_distances(entrance)
+            if bed_type is None:
+                candidates = range(len(dist))
+            else:
+                candidates = np.flatnonzero(ward_map.bed_types == bed_type).tolist()
+            heap = [(float(dist[k]), k) for k in candidates]
+            heapq.heapify(heap)
+            heaps[key] = heap
+        return heaps[key]
+
+    allocations = []
+    for p in patients_sorted:
+        entrance = p.get("entrance")
+        heap = free_beds(None if entrance is None else int(entrance), _patient_bed_type(p))
+        while heap and used[heap[0][1]]:
+            heapq.heappop(heap)
+
+        best_bed, best_cost, bed_type = None, float("inf"), None
+        if heap:
+            cost, k = heapq.heappop(heap)
+            used[k] = True
+            best_bed = tuple(int(v) for v in ward_map.bed_cells[k])
+            best_cost = cost if cost != float("inf") else None
+            bed_type = ward_map.bed_types[k]
+
+        record = _allocation_record(p, best_bed, best_cost)
+        record["Bed_Type"] = bed_type
+        allocations.append(record)
+
+    if instrumentation.enabled():
+        # every heap is built in full, so pops are what is no longer in it
+        pushes = sum(len(ward_map.bed_cells) if t is None else int(np.sum(ward_map.bed_types == t))
+                     for _, t in heaps)
+        instrumentation.count("allocation_heap_pushes_total", pushes, engine="ward")
+        instrumentation.count("allocation_heap_pops_total", pushes - sum(len(h) for h in heaps.values()), engine="ward")
+    return _to_records(allocations)
+
+
+def _allocate_beds_astar(patients, grid_size=6):
     beds = [(i, j) for i in range(grid_size) for j in range(grid_size)]
     start_pos = (0, 0)
-    patients_sorted = sorted(patients, key=lambda x: x.get("fuzzy_severity", 0), reverse=True)
+    patients_sorted = by_severity(patients)
 
     allocations = []
     used_beds = set()
@@ -50,15 +240,384 @@ def allocate_beds(patients, grid_size=6):
                     break
 
         used_beds.add(best_bed)
-        allocations.append({
-            "Patient": p.get("patient_id", "Unknown"),
-            "Severity": round(p.get("fuzzy_severity", 0), 3),
-            "Assigned_Bed": f"Bed-{best_bed[0]}-{best_bed[1]}" if best_bed else "None",
-            "Distance_Cost": best_cost
-        })
+        allocations.append(_allocation_record(p, best_bed, best_cost))
 
-    df_alloc = pd.DataFrame(allocations)
-    if "Distance_Cost" in df_alloc.columns:
-        df_alloc["Distance_Cost"] = pd.to_numeric(df_alloc["Distance_Cost"], errors="coerce")
+    return _to_records(allocations)
 
-    return df_alloc.to_dict(orient="records")
+
+# ---------------------- Global optimal assignment ----------------------
+
+# Dense patient x bed cost matrices up to this many cells are solved in one
+# Hungarian call; larger problems are solved in severity-ordered blocks.
+OPTIMAL_DENSE_CELLS = 4_000_000
+OPTIMAL_BLOCK_SIZE = 1000
+OPTIMAL_K_NEAREST = 32
+# Added to every severity in the assignment cost, so that a patient with
+# severity 0 still prefers any reachable bed of their type to none
+OPTIMAL_MIN_WEIGHT = 1e-6
+
+
+def _allocate_beds_optimal(patients, ward_map, respect_types=True,
+                           block_size=OPTIMAL_BLOCK_SIZE, k_nearest=OPTIMAL_K_NEAREST):
+    """
+    Severity-weighted min-cost bipartite matching of patients to beds.
+
+    Cost of giving bed b to patient p is w_p * (distance_pb - M), with
+    w_p = severity_p + OPTIMAL_MIN_WEIGHT and M exceeding every finite
+    distance, so the solver prefers serving severe patients first and then
+    minimises their total travel; every feasible pair costs less than 0.
+    Pairs with the wrong bed type or an unreachable bed cost 0, i.e. the
+    same as leaving the patient unassigned.
+
+    Small problems are one dense linear_sum_assignment. Above
+    OPTIMAL_DENSE_CELLS, patients are taken in severity order in blocks of
+    block_size and each block is matched against a candidate set: for each
+    (entrance, bed type) group in the block, its size plus k_nearest of the
+    closest free beds. Memory stays O(block_size x candidates).
+    """
+    # scipy.optimize takes ~0.3s to import; only this mode needs it
+    from scipy.optimize import linear_sum_assignment
+
+    patients_sorted = by_severity(patients)
+    n_patients, n_beds = len(patients_sorted), len(ward_map.bed_cells)
+
+    weight = np.array([float(p.get("fuzzy_severity", 0) or 0) for p in patients_sorted]) + OPTIMAL_MIN_WEIGHT
+    entrances = [None if p.get("entrance") is None else int(p.get("entrance")) for p in patients_sorted]
+    bed_types = [_patient_bed_type(p) if respect_types else None for p in patients_sorted]
+
+    fields = {e: ward_map.bed_distances(e) for e in set(entrances)}
+    finite = np.concatenate([d[np.isfinite(d)] for d in fields.values()] + [np.zeros(1)])
+    big_m = float(finite.max()) + 1.0
+
+    assigned_bed = np.full(n_patients, -1)
+    free = np.ones(n_beds, dtype=bool)
+
+    if n_patients * n_beds <= OPTIMAL_DENSE_CELLS:
+        blocks = [(np.arange(n_patients), np.arange(n_beds))]
+    else:
+        blocks = None
+
+    def solve(rows, cols):
+        cost = np.zeros((len(rows), len(cols)))
+        for e, dist in fields.items():
+            sel = np.array([entrances[r] == e for r in rows])
+            if sel.any():
+                d = dist[cols]
+                cost[sel] = weight[rows[sel], None] * np.where(np.isfinite(d), d - big_m, 0.0)[None, :]
+        if respect_types:
+            want = np.array([bed_types[r] for r in rows], dtype=object)
+            typed = np.array([t is not None for t in want])
+            mismatch = typed[:, None] & (want[:, None] != ward_map.bed_types[cols][None, :])
+            cost[mismatch] = 0.0
+        r_idx, c_idx = linear_sum_assignment(cost)
+        instrumentation.count("allocation_assignment_solves_total")
+        instrumentation.count("allocation_assignment_cells_total", cost.size)
+        ok = cost[r_idx, c_idx] < 0
+        return rows[r_idx[ok]], cols[c_idx[ok]]
+
+    if blocks is not None:
+        for rows, cols in blocks:
+            r, c = solve(rows, cols)
+            assigned_bed[r] = c
+    else:
+        order = {e: np.argsort(d, kind="stable") for e, d in fields.items()}
+        for start in range(0, n_patients, block_size):
+            rows = np.arange(start, min(start + block_size, n_patients))
+            if not free.any():
+                break
+            candidates = set()
+            groups = {}
+            for r in rows:
+                key = (entrances[r], bed_types[r])
+                groups[key] = groups.get(key, 0) + 1
+            for (e, t), count in groups.items():
+                ranked = order[e][free[order[e]]]
+                if t is not None:
+                    ranked = ranked[ward_map.bed_types[ranked] == t]
+                candidates.update(ranked[:count + k_nearest].tolist())
+            cols = np.array(sorted(candidates), dtype=int)
+            if len(cols) == 0:
+                continue
+            r, c = solve(rows, cols)
+            assigned_bed[r] = c
+            free[c] = False
+
+    allocations = []
+    for i, p in enumerate(patients_sorted):
+        k = assigned_bed[i]
+        if k < 0:
+            record = _allocation_record(p, None, float("inf"))
+            record["Bed_Type"] = None
+        else:
+            cost = float(fields[entrances[i]][k])
+            record = _allocation_record(p, tuple(int(v) for v in ward_map.bed_cells[k]), cost)
+            record["Bed_Type"] = ward_map.bed_types[k]
+        allocations.append(record)
+
+    records = _to_records(allocations)
+    if not respect_types:
+        for r in records:
+            r.pop("Bed_Type", None)
+    return records
+
+
+def allocation_objective(allocations):
+    """Total severity-weighted distance and number of patients left without a bed."""
+    total, unassigned = 0.0, 0
+    for a in allocations:
+        cost = a.get("Distance_Cost")
+        if a.get("Assigned_Bed") in (None, "None") or cost is None or not np.isfinite(cost):
+            unassigned += 1
+        else:
+            total += a.get("Severity", 0) * cost
+    return {"objective": round(total, 3), "unassigned": unassigned}
+
+
+def compare_allocation_modes(patients, grid_size=6, ward_map=None):
+    """
+    Run greedy and optimal allocation on the same input.
+
+    Returns:
+        dict: {mode: {"objective", "unassigned", "solve_time_s"}}
+    """
+    report = {}
+    for mode in ("greedy", "optimal"):
+        start = time.perf_counter()
+        allocations = allocate_beds(patients, grid_size, ward_map=ward_map, mode=mode)
+        report[mode] = dict(allocation_objective(allocations), solve_time_s=round(time.perf_counter() - start, 4))
+    return report
+
+
+# ---------------------- Incremental allocation service ----------------------
+
+class IndexedHeap:
+    """Binary min-heap of (key, item) pairs with O(log n) update/remove by item."""
+
+    def __init__(self, pairs=()):
+        self._heap = [(key, item) for key, item in pairs]
+        heapq.heapify(self._heap)
+        self._pos = {item: i for i, (_, item) in enumerate(self._heap)}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._pos
+
+    def peek(self):
+        return self._heap[0] if self._heap else None
+
+    def push(self, item, key):
+        if item in self._pos:
+            self.update(item, key)
+            return
+        self._heap.append((key, item))
+        self._pos[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def pop(self):
+        key, item = self._heap[0]
+        self.remove(item)
+        return key, item
+
+    def remove(self, item):
+        i = self._pos.pop(item)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def update(self, item, key):
+        i = self._pos[item]
+        self._heap[i] = (key, item)
+        self._sift_up(i)
+        self._sift_down(self._pos[item])
+
+    def _swap(self, i, j):
+        h = self._heap
+        h[i], h[j] = h[j], h[i]
+        self._pos[h[i][1]] = i
+        self._pos[h[j][1]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] < self._heap[parent]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i):
+        n = len(self._heap)
+        while True:
+            smallest, left, right = i, 2 * i + 1, 2 * i + 2
+            if left < n and self._heap[left] < self._heap[smallest]:
+                smallest = left
+            if right < n and self._heap[right] < self._heap[smallest]:
+                smallest = right
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+
+class BedAllocator:
+    """
+    Stateful bed allocation for a live admission feed.
+
+    Holds occupancy as a boolean array over the ward's beds, free beds in
+    one indexed heap per (entrance, bed type) ordered by distance, and
+    patients without a bed in a waiting queue per bed type ordered by
+    severity. admit / discharge / reprioritize are O(log B) (times the
+    small number of entrance/type heaps a bed belongs to), so events can
+    be applied one by one instead of re-running allocate_beds.
+
+    Admitting patients in descending severity into an empty allocator gives
+    the same beds as allocate_beds(mode="greedy"), except for beds that
+    cannot be reached from the patient's entrance (walled off on a ward
+    map): allocate_beds hands those out without a Distance_Cost (NaN) once the
+    reachable beds are taken, while here they are never handed out and the
+    patient waits in the queue, like one for whom no bed is left.
+    """
+
+    def __init__(self, grid_size=6, ward_map=None):
+        self.respect_types = ward_map is not None
+        self.ward_map = ward_map if ward_map is not None else WardMap.empty_grid(grid_size)
+        n_beds = len(self.ward_map.bed_cells)
+        self.occupied = np.zeros(n_beds, dtype=bool)
+        self.occupant = [None] * n_beds
+        self.patients = {}  # patient_id -> {"severity", "bed_type", "entrance", "bed"}
+        self._free = {}
+        self._waiting = {}
+        self._seq = 0
+
+    # --- free beds ---
+
+    def _free_heap(self, entrance, bed_type):
+        key = (entrance, bed_type)
+        if key not in self._free:
+            dist = self.ward_map.bed_distances(entrance)
+            beds = range(len(dist)) if bed_type is None else np.flatnonzero(self.ward_map.bed_types == bed_type).tolist()
+            self._free[key] = IndexedHeap((float(dist[k]), k) for k in beds if not self.occupied[k])
+        return self._free[key]
+
+    def _take_bed(self, k, patient_id):
+        self.occupied[k] = True
+        self.occupant[k] = patient_id
+        for heap in self._free.values():
+            if k in heap:
+                heap.remove(k)
+
+    def _release_bed(self, k):
+        self.occupied[k] = False
+        self.occupant[k] = None
+        bed_type = self.ward_map.bed_types[k]
+        for (entrance, t), heap in self._free.items():
+            if t is None or t == bed_type:
+                heap.push(k, float(self.ward_map.bed_distances(entrance)[k]))
+
+    # --- waiting queue ---
+
+    def _waiting_heap(self, bed_type):
+        if bed_type not in self._waiting:
+            self._waiting[bed_type] = IndexedHeap()
+        return self._waiting[bed_type]
+
+    def _next_waiting(self, bed_type):
+        """Most severe waiting patient that can use a bed of bed_type."""
+        best = None
+        for t in (bed_type, None):
+            heap = self._waiting.get(t)
+            if heap and (best is None or heap.peek() < best[0]):
+                best = (heap.peek(), t)
+        if best is None:
+            return None
+        (_, patient_id), t = best
+        self._waiting[t].remove(patient_id)
+        return patient_id
+
+    # --- events ---
+
+    def admit(self, patient):
+        """
+        Admit a patient dict or PatientRecord (patient_id, fuzzy_severity,
+        optional recommended_bed_type / entrance). Returns the allocation record,
+        or None if the patient was queued because no suitable bed is free.
+        """
+        patient_id = patient.get("patient_id", "Unknown")
+        if patient_id in self.patients:
+            raise ValueError(f"Patient {patient_id} is already admitted")
+        entrance = patient.get("entrance")
+        state = {
+            "severity": float(patient.get("fuzzy_severity", 0) or 0),
+            "bed_type": _patient_bed_type(patient) if self.respect_types else None,
+            "entrance": None if entrance is None else int(entrance),
+            "bed": -1,
+            "seq": self._seq,
+        }
+        self._seq += 1
+        self.patients[patient_id] = state
+        return self._place(patient_id)
+
+    def _place(self, patient_id):
+        state = self.patients[patient_id]
+        heap = self._free_heap(state["entrance"], state["bed_type"])
+        if len(heap) == 0 or heap.peek()[0] == float("inf"):
+            self._waiting_heap(state["bed_type"]).push(patient_id, (-state["severity"], state["seq"]))
+            return None
+        _, k = heap.peek()
+        self._take_bed(k, patient_id)
+        state["bed"] = k
+        return self._record(patient_id)
+
+    def discharge(self, patient_id):
+        """
+        Free the patient's bed (or drop them from the waiting queue). The
+        freed bed goes to the most severe compatible waiting patient;
+        returns that patient's new allocation record, if any.
+        """
+        state = self.patients.pop(patient_id)
+        k = state["bed"]
+        if k < 0:
+            self._waiting[state["bed_type"]].remove(patient_id)
+            return None
+        self._release_bed(k)
+        next_id = self._next_waiting(self.ward_map.bed_types[k])
+        if next_id is None:
+            return None
+        return self._place(next_id)
+
+    def reprioritize(self, patient_id, new_severity):
+        """Update a patient's severity; waiting patients move in the queue."""
+        state = self.patients[patient_id]
+        state["severity"] = float(new_severity)
+        if state["bed"] < 0:
+            self._waiting[state["bed_type"]].update(patient_id, (-state["severity"], state["seq"]))
+
+    # --- views ---
+
+    def _record(self, patient_id):
+        state = self.patients[patient_id]
+        k = state["bed"]
+        record = _allocation_record({"patient_id": patient_id, "fuzzy_severity": state["severity"]},
+                                    tuple(int(v) for v in self.ward_map.bed_cells[k]),
+                                    float(self.ward_map.bed_distances(state["entrance"])[k]))
+        if self.respect_types:
+            record["Bed_Type"] = self.ward_map.bed_types[k]
+        return record
+
+    def snapshot(self):
+        """Current state for the UI: allocations (by severity), waiting list and counts."""
+        beds = np.flatnonzero(self.occupied)
+        allocations = sorted((self._record(self.occupant[k]) for k in beds), key=lambda r: -r["Severity"])
+        waiting = sorted(({"Patient": pid, "Severity": round(s["severity"], 3), "Bed_Type": s["bed_type"]}
+                          for pid, s in self.patients.items() if s["bed"] < 0), key=lambda r: -r["Severity"])
+        return {
+            "allocations": allocations,
+            "waiting": waiting,
+            "occupied": int(self.occupied.sum()),
+            "free": int((~self.occupied).sum()),
+        }
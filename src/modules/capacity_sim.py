@@ -0,0 +1,404 @@
+"""
+Multi-day discrete-event simulation of bed and operating-room load.
+
+Arrivals are replayed from the dataset timestamps (cycled over the
+horizon) or synthesized as a Poisson process with the dataset's
+hour-of-day arrival profile. Each patient is triaged with the fuzzy
+engine, and a share of them needs an inpatient bed of their
+recommended_bed_type. Bed requests go through
+a_star_bed_allocation.BedAllocator, the event-by-event form of
+allocate_beds(mode="greedy"): nearest free reachable bed, otherwise a
+severity ordered waiting queue (unlike allocate_beds it never hands out
+a bed the patient's entrance cannot reach). Patients who wait longer than max_wait_hours are
+counted as overflow (transferred out). Once a day the pending surgical
+cases are scheduled with csp_scheduler.build_schedule, and the cases
+that do not fit wait for the next day.
+
+Events sit in one heap of (time, kind, seq, patient) tuples, and arrivals
+are merged in from a pre-sorted array. Per-patient state is a set of
+NumPy arrays indexed by patient number. Replications run in a
+ProcessPoolExecutor, each with its own seed.
+
+    python -m modules.capacity_sim --days 30 --replications 1000 --ward-map ../data/ward_map.txt
+"""
+
+import argparse
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import csp_scheduler as csp
+from . import fuzzy_triage
+from .a_star_bed_allocation import BedAllocator
+from .patient_store import PatientStore
+
+DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv"))
+
+# Length of stay per bed type: lognormal (median days, sigma of log)
+LOS_DAYS = {"ICU": (2.5, 0.5), "HDU": (2.0, 0.5), "General Ward": (2.0, 0.6)}
+DEFAULT_LOS = (2.0, 0.6)
+
+# event kinds, in processing order at equal times (beds are freed before
+# they are requested, and the daily census sees the settled state)
+DISCHARGE, ARRIVAL, TIMEOUT, DAY = 0, 1, 2, 3
+
+# patient status
+WAITING, IN_BED, DISCHARGED, OVERFLOW = 0, 1, 2, 3
+
+
+class SimulationConfig:
+    """
+    Options for one simulation run.
+
+    Attributes:
+        days: horizon in days
+        arrivals: "replay" (dataset timestamps, cycled) or "synthesize"
+            (Poisson process with the dataset's hourly profile)
+        arrivals_per_day: ED arrivals per day for "synthesize", None for
+            the dataset's rate
+        admit_share: share of ED arrivals that need an inpatient bed
+        los_days: {bed type: (median days, sigma)} lognormal stays
+        max_wait_hours: waiting longer than this counts as overflow
+        surgery_share: share of admitted patients that need surgery
+        or_cases_per_day: surgeries build_schedule may place per day, None
+            for min(doctors, rooms) x timeslots of the default resources
+        schedule_hour: hour of day the OR list is built (and census taken)
+        fuzzy: fuzzy engine for triage ("exact", "lut" or "surrogate")
+        ward_map: WardMap, path to a ward map, or None for the square grid
+        grid_size: square grid size when there is no ward map
+    """
+
+    def __init__(self, days=30, arrivals="synthesize", arrivals_per_day=None, admit_share=0.15, los_days=None,
+                 max_wait_hours=12.0, surgery_share=0.2, or_cases_per_day=None, schedule_hour=8, fuzzy="lut",
+                 ward_map=None, grid_size=6):
+        if arrivals not in ("replay", "synthesize"):
+            raise ValueError(f"Unknown arrival mode: {arrivals}")
+        self.days = days
+        self.arrivals = arrivals
+        self.arrivals_per_day = arrivals_per_day
+        self.admit_share = admit_share
+        self.los_days = dict(LOS_DAYS, **(los_days or {}))
+        self.max_wait_hours = max_wait_hours
+        self.surgery_share = surgery_share
+        self.or_cases_per_day = or_cases_per_day or min(len(csp.DOCTORS), len(csp.ROOMS)) * len(csp.TIMESLOTS)
+        self.schedule_hour = schedule_hour
+        self.fuzzy = fuzzy
+        self.ward_map = ward_map
+        self.grid_size = grid_size
+
+    def resolve_ward_map(self):
+        if isinstance(self.ward_map, str):
+            from .ward_map import WardMap
+            self.ward_map = WardMap.load(self.ward_map).build_index()
+        return self.ward_map
+
+
+class PatientPool:
+    """
+    Triaged dataset rows the simulation draws patients from.
+
+    Attributes:
+        severity: float32 fuzzy severity per row
+        bed_type: int8 index into bed_types per row (-1: none recorded)
+        bed_types: bed type names
+        arrival_h: hours since the first timestamp per row
+        onset_h: time_since_symptoms_hours per row (symptom onset before arrival)
+        hourly_rate: mean arrivals per hour of day (24 values)
+        span_days: whole days covered by the timestamps
+    """
+
+    def __init__(self, severity, bed_type, bed_types, arrival_h, onset_h, hourly_rate, span_days):
+        self.severity = severity
+        self.bed_type = bed_type
+        self.bed_types = bed_types
+        self.arrival_h = arrival_h
+        self.onset_h = onset_h
+        self.hourly_rate = hourly_rate
+        self.span_days = span_days
+
+    @classmethod
+    def from_frame(cls, df, fuzzy="lut"):
+        from .pipeline import fuzzy_system
+
+        severity = fuzzy_triage.compute_severity_batch(df, fuzzy_system(fuzzy)).astype(np.float32)
+        bed_types = sorted(df["recommended_bed_type"].dropna().astype(str).unique())
+        codes = pd.Categorical(df["recommended_bed_type"].astype(object), categories=bed_types).codes.astype(np.int8)
+        stamps = pd.to_datetime(df["timestamp"])
+        arrival_h = ((stamps - stamps.min()).dt.total_seconds() / 3600).to_numpy()
+        span_days = max(1, int(np.ceil((arrival_h.max() + 1e-9) / 24)))
+        hourly_rate = np.bincount(stamps.dt.hour, minlength=24) / span_days
+        onset_h = pd.to_numeric(df.get("time_since_symptoms_hours"), errors="coerce")
+        onset_h = np.zeros(len(df)) if onset_h is None else onset_h.fillna(0).to_numpy()
+        return cls(severity, codes, bed_types, arrival_h, onset_h.astype(np.float32), hourly_rate, span_days)
+
+    @classmethod
+    def load(cls, path=DATA_PATH, fuzzy="lut"):
+        return cls.from_frame(pd.read_csv(path), fuzzy=fuzzy)
+
+
+def _arrivals(pool, config, rng):
+    """(arrival hours, pool row) of the ED arrivals that need a bed, sorted by time."""
+    horizon = config.days * 24.0
+    if config.arrivals == "replay":
+        cycles = int(np.ceil(config.days / pool.span_days))
+        times = (pool.arrival_h[None, :] + 24.0 * pool.span_days * np.arange(cycles)[:, None]).ravel()
+        rows = np.tile(np.arange(len(pool.arrival_h)), cycles)
+    else:
+        rate = pool.hourly_rate
+        if config.arrivals_per_day is not None:
+            rate = rate * (config.arrivals_per_day / rate.sum())
+        counts = rng.poisson(np.tile(rate, config.days))
+        times = np.repeat(np.arange(len(counts)), counts) + rng.random(counts.sum())
+        rows = rng.integers(0, len(pool.severity), size=len(times))
+    keep = (times < horizon) & (rng.random(len(times)) < config.admit_share)
+    times, rows = times[keep], rows[keep]
+    order = np.argsort(times, kind="stable")
+    return times[order], rows[order]
+
+
+def simulate(pool, config, seed=0):
+    """
+    One replication.
+
+    Returns:
+        dict of scalar metrics plus "census" ({bed type: occupied beds at
+        each day's schedule_hour})
+    """
+    rng = np.random.default_rng(seed)
+    ward_map = config.resolve_ward_map()
+    allocator = BedAllocator(grid_size=config.grid_size, ward_map=ward_map)
+    arrival_t, rows = _arrivals(pool, config, rng)
+    n = len(arrival_t)
+
+    # compact per-patient state
+    bed_type = pool.bed_type[rows]
+    severity = pool.severity[rows]
+    median, sigma = np.array([config.los_days.get(t, DEFAULT_LOS) for t in pool.bed_types] + [DEFAULT_LOS]).T
+    los_h = 24.0 * median[bed_type] * np.exp(sigma[bed_type] * rng.standard_normal(n))
+    needs_surgery = rng.random(n) < config.surgery_share
+    status = np.full(n, WAITING, dtype=np.int8)
+    bed_t = np.full(n, np.nan)
+    surgery_t = np.full(n, np.nan)
+
+    bed_names = list(pool.bed_types) if ward_map is not None else ["any"]
+    bed_kind = np.array([bed_names.index(str(t)) if str(t) in bed_names else 0
+                         for t in allocator.ward_map.bed_types]) if ward_map is not None \
+        else np.zeros(len(allocator.ward_map.bed_cells), dtype=int)
+    capacity = np.bincount(bed_kind, minlength=len(bed_names))
+    occupied = np.zeros(len(bed_names), dtype=np.int64)
+    area = np.zeros(len(bed_names))  # bed-hours occupied, per kind
+    peak = np.zeros(len(bed_names), dtype=np.int64)
+    census = [[] for _ in bed_names]
+    last_t = 0.0
+
+    events = [(d * 24.0 + config.schedule_hour, DAY, 0, -1) for d in range(config.days)]
+    heapq.heapify(events)
+    seq = 0
+    pending_surgery = []
+    or_scheduled = or_infeasible = 0
+    horizon = config.days * 24.0
+    next_arrival = 0
+
+    def placed(i, t):
+        nonlocal seq
+        status[i] = IN_BED
+        bed_t[i] = t
+        k = bed_kind[allocator.patients[i]["bed"]]
+        occupied[k] += 1
+        peak[k] = max(peak[k], occupied[k])
+        heapq.heappush(events, (t + los_h[i], DISCHARGE, seq, i))
+        seq += 1
+        if needs_surgery[i]:
+            pending_surgery.append(i)
+
+    while True:
+        if next_arrival < n and (not events or arrival_t[next_arrival] < events[0][0]):
+            t, kind, i = arrival_t[next_arrival], ARRIVAL, next_arrival
+            next_arrival += 1
+        elif events:
+            t, kind, _, i = heapq.heappop(events)
+        else:
+            break
+        if t >= horizon:
+            break
+        area += occupied * (t - last_t)
+        last_t = t
+
+        if kind == ARRIVAL:
+            patient = {"patient_id": i, "fuzzy_severity": float(severity[i])}
+            if bed_type[i] >= 0:
+                patient["recommended_bed_type"] = pool.bed_types[bed_type[i]]
+            if allocator.admit(patient) is not None:
+                placed(i, t)
+            else:
+                heapq.heappush(events, (t + config.max_wait_hours, TIMEOUT, seq, i))
+                seq += 1
+        elif kind == DISCHARGE:
+            occupied[bed_kind[allocator.patients[i]["bed"]]] -= 1
+            status[i] = DISCHARGED
+            record = allocator.discharge(i)
+            if record is not None:
+                placed(record["Patient"], t)
+        elif kind == TIMEOUT:
+            if status[i] == WAITING:
+                allocator.discharge(i)
+                status[i] = OVERFLOW
+        else:
+            for k in range(len(bed_names)):
+                census[k].append(int(occupied[k]))
+            pending_surgery = [c for c in pending_surgery if status[c] == IN_BED]
+            if pending_surgery:
+                cases = PatientStore({"patient_id": pending_surgery, "fuzzy_severity": severity[pending_surgery]})
+                limit = config.or_cases_per_day
+                schedule = csp.build_schedule(cases, max_cases=limit)
+                while limit > 1 and len(schedule) == 1 and "Error" in schedule[0]:
+                    limit //= 2
+                    schedule = csp.build_schedule(cases, max_cases=limit)
+                if "Error" in schedule[0]:
+                    or_infeasible += 1
+                else:
+                    done = {entry["Patient_ID"] for entry in schedule}
+                    surgery_t[list(done)] = t
+                    or_scheduled += len(done)
+                    pending_surgery = [c for c in pending_surgery if c not in done]
+
+    area += occupied * (max(horizon - last_t, 0.0))
+    arrived = next_arrival
+    waits = bed_t[:arrived] - arrival_t[:arrived]
+    served = ~np.isnan(waits)
+    wait = waits[served]
+    operated = ~np.isnan(surgery_t)
+    result = {
+        "admissions": int(arrived),
+        "placed": int(served.sum()),
+        "overflow": int(np.sum(status == OVERFLOW)),
+        "waiting_at_end": int(np.sum(status[:arrived] == WAITING)),
+        "overflow_share": float(np.mean(status[:arrived] == OVERFLOW)) if arrived else 0.0,
+        "wait_h_mean": float(wait.mean()) if len(wait) else 0.0,
+        "wait_h_p95": float(np.percentile(wait, 95)) if len(wait) else 0.0,
+        "waited_over_4h_share": float(np.mean(wait > 4.0)) if len(wait) else 0.0,
+        "onset_to_bed_h_median": float(np.median(wait + pool.onset_h[rows[:arrived]][served])) if len(wait) else 0.0,
+        "surgeries": int(or_scheduled),
+        "surgery_backlog_end": len(pending_surgery),
+        "surgery_wait_h_mean": float(np.mean(surgery_t[operated] - bed_t[operated])) if operated.any() else 0.0,
+        "or_utilization": or_scheduled / (config.or_cases_per_day * config.days) if config.days else 0.0,
+        "or_infeasible_days": or_infeasible,
+        "census": dict(zip(bed_names, census)),
+    }
+    for k, name in enumerate(bed_names):
+        result[f"occupancy_mean[{name}]"] = float(area[k] / (capacity[k] * horizon)) if capacity[k] else 0.0
+        result[f"occupancy_peak[{name}]"] = float(peak[k] / capacity[k]) if capacity[k] else 0.0
+    return result
+
+
+# ---------------------- Monte Carlo ----------------------
+
+_worker_state = None
+
+
+def _init_worker(pool, config):
+    global _worker_state
+    _worker_state = (pool, config)
+
+
+def _run_chunk(seeds):
+    pool, config = _worker_state
+    return [simulate(pool, config, seed) for seed in seeds]
+
+
+def summarize(results):
+    """
+    Aggregate replications: mean / p5 / p50 / p95 of every scalar metric,
+    and p5 / p50 / p95 of the daily census per bed type.
+    """
+    scalars = {}
+    for key in results[0]:
+        if key == "census":
+            continue
+        values = np.array([r[key] for r in results], dtype=np.float64)
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        scalars[key] = {"mean": float(values.mean()), "p5": float(p5), "p50": float(p50), "p95": float(p95)}
+    census = {}
+    for name in results[0]["census"]:
+        days = np.array([r["census"][name] for r in results], dtype=np.float64)
+        if days.size:
+            census[name] = {q: np.percentile(days, int(q[1:]), axis=0).round(1).tolist() for q in ("p5", "p50", "p95")}
+    return {"replications": len(results), "metrics": scalars, "daily_census": census}
+
+
+def run_monte_carlo(config=None, replications=100, seed=0, workers=None, pool=None, chunk_size=None):
+    """
+    Run independent replications in a process pool and aggregate them.
+
+    Args:
+        config: SimulationConfig
+        replications: number of runs
+        seed: base seed; replication i uses SeedSequence(seed).spawn(...)[i],
+            so results do not depend on the worker count
+        workers: processes, defaults to os.cpu_count() (1 runs in-process)
+        pool: PatientPool, defaults to the bundled dataset triaged with config.fuzzy
+        chunk_size: replications per task, defaults to an even split in 4 tasks per worker
+
+    Returns:
+        summarize() output plus "elapsed_s" and "workers"
+    """
+    config = config or SimulationConfig()
+    config.resolve_ward_map()
+    pool = pool or PatientPool.load(fuzzy=config.fuzzy)
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    workers = max(1, min(workers or os.cpu_count() or 1, replications))
+    started = time.perf_counter()
+    if workers == 1:
+        results = [simulate(pool, config, s) for s in seeds]
+    else:
+        chunk_size = chunk_size or max(1, -(-replications // (workers * 4)))
+        chunks = [seeds[i:i + chunk_size] for i in range(0, replications, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pool, config)) as executor:
+            results = [r for part in executor.map(_run_chunk, chunks) for r in part]
+    report = summarize(results)
+    report["elapsed_s"] = round(time.perf_counter() - started, 3)
+    report["workers"] = workers
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.capacity_sim",
+                                     description="Monte Carlo bed and OR load forecast.")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--replications", type=int, default=100)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arrivals", choices=["replay", "synthesize"], default="synthesize")
+    parser.add_argument("--arrivals-per-day", type=float, help="ED arrivals per day (synthesize)")
+    parser.add_argument("--admit-share", type=float, default=0.15)
+    parser.add_argument("--max-wait-hours", type=float, default=12.0)
+    parser.add_argument("--surgery-share", type=float, default=0.2)
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="lut")
+    parser.add_argument("--ward-map", help="ward floor plan (.txt / .npz), default: square grid")
+    parser.add_argument("--grid-size", type=int, default=6)
+    parser.add_argument("--data", default=DATA_PATH, help="patient file the arrivals are drawn from")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    config = SimulationConfig(days=args.days, arrivals=args.arrivals, arrivals_per_day=args.arrivals_per_day,
+                              admit_share=args.admit_share, max_wait_hours=args.max_wait_hours,
+                              surgery_share=args.surgery_share, fuzzy=args.fuzzy, ward_map=args.ward_map,
+                              grid_size=args.grid_size)
+    from .pipeline import load_patients
+    pool = PatientPool.from_frame(load_patients(args.data), fuzzy=args.fuzzy)
+    report = run_monte_carlo(config, args.replications, seed=args.seed, workers=args.workers, pool=pool)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
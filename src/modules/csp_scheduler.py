@@ -1,19 +1,599 @@
-from constraint import Problem
+import time
 
-def build_schedule(patients):
+import numpy as np
+
+from . import instrumentation
+from .patient_store import by_severity
+
+# Default resources of the demo schedule
+DOCTORS = ["Dr. A", "Dr. B", "Dr. C"]
+ROOMS = ["Room 1", "Room 2"]
+TIMESLOTS = ["9 AM", "10 AM", "11 AM", "12 PM"]
+
+# Search budget for the propagation engine before it gives up
+MAX_BACKTRACKS = 10_000
+
+
+def day_timeslots(start_hour=8, end_hour=18, minutes=15):
+    """Slot labels for a working day, e.g. ["08:00", "08:15", ...]."""
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(start_hour * 60, end_hour * 60, minutes)]
+
+
+def build_schedule(patients, doctors=None, rooms=None, timeslots=None, max_cases=None, engine="propagate",
+                   calendar=None, time_budget=5.0, seed=0):
     """
     Constraint Satisfaction Scheduling:
     Assigns surgeries to doctors, rooms, and timeslots.
-    Balanced version: very fast (~1-2s) and always finds feasible solutions.
+
+    Args:
+        patients: list of patient dicts or a PatientStore (patient_id,
+            fuzzy_severity, optional duration_slots for cases longer than
+            one slot)
+        doctors, rooms, timeslots: resource lists, default to the demo lists
+        max_cases: schedule only the N most severe patients (None, the
+            default, for all), selected in O(N log max_cases) from a list,
+            O(N) from a store; max_schedulable() gives a value that fits
+            the resources
+        engine: "propagate" (array-based forward-checking search, scales to
+            hundreds of cases) or "reference" (python-constraint with
+            pairwise constraints, practical up to ~5 cases) or "portfolio"
+            (several propagate orderings, seeded restarts and a local
+            search racing in a process pool, see schedule_portfolio)
+        calendar: optional ResourceCalendar; supplies surgeons, rooms,
+            slots, availability windows, shift limits, room equipment and
+            per-diagnosis durations (propagate / portfolio engines)
+        time_budget, seed: wall-clock budget and base seed for the portfolio
+
+    Returns:
+        list of dicts: Patient_ID, Doctor, Room, Time, Severity,
+        Duration_Slots (with a calendar also End and Diagnosis); or
+        [{"Error": ..., "Reason": ...}] when no schedule is found, Reason
+        being set when capacity_shortfall() proves it cannot exist
+    """
+    with instrumentation.timer("build_schedule", engine=engine):
+        schedule = _build_schedule(patients, doctors, rooms, timeslots, max_cases, engine, calendar, time_budget, seed)
+    if instrumentation.enabled():
+        feasible = not (len(schedule) == 1 and "Error" in schedule[0])
+        instrumentation.count("schedule_cases_total", len(schedule) if feasible else 0, engine=engine)
+        instrumentation.count("schedule_infeasible_total", int(not feasible), engine=engine)
+    return schedule
+
+
+def _build_schedule(patients, doctors, rooms, timeslots, max_cases, engine, calendar, time_budget, seed):
+    if calendar is not None:
+        if engine == "reference":
+            raise ValueError("Resource calendars are not supported by the reference engine")
+        doctors, rooms, timeslots = calendar.surgeons, calendar.rooms, calendar.timeslots
+    doctors = list(doctors or DOCTORS)
+    rooms = list(rooms or ROOMS)
+    timeslots = list(timeslots or TIMESLOTS)
+
+    patients = by_severity(patients, max_cases)
+
+    if engine == "reference":
+        return _build_schedule_reference(patients, doctors, rooms, timeslots)
+    if engine not in ("propagate", "portfolio"):
+        raise ValueError(f"Unknown scheduling engine: {engine}")
+
+    durations, constraints = _case_constraints(patients, calendar)
+
+    if engine == "portfolio":
+        from .schedule_portfolio import solve_portfolio
+        severity = [p.get("fuzzy_severity", 0) for p in patients]
+        result = solve_portfolio(durations, severity, len(doctors), len(rooms), len(timeslots),
+                                 time_budget=time_budget, seed=seed, **constraints)["result"]
+    elif calendar is not None:
+        # equipment makes some cases fit in few rooms: search those (and the
+        # longest) first, ties in severity order; severity order alone can
+        # exhaust the backtrack budget on instances that are feasible
+        order = np.lexsort((np.arange(len(patients)), -durations, constraints["room_ok"].sum(axis=1)))
+        result = solve_schedule(durations[order], len(doctors), len(rooms), len(timeslots),
+                                **dict(constraints, room_ok=constraints["room_ok"][order]))
+        if result is not None:
+            inverse = np.argsort(order)
+            result = tuple(a[inverse] for a in result)
+    else:
+        result = solve_schedule(durations, len(doctors), len(rooms), len(timeslots), **constraints)
+    if result is None:
+        error = {"Error": "No feasible schedule found"}
+        reason = capacity_shortfall(durations, len(doctors), len(rooms), len(timeslots), room_names=rooms,
+                                    **constraints)
+        if reason is not None:
+            error["Reason"] = reason
+        return [error]
+
+    doc_idx, room_idx, start_idx = result
+    schedule = []
+    for i, p in enumerate(patients):
+        schedule.append(_schedule_entry(p.get("patient_id", f"P{i}"), p.get("fuzzy_severity", 0),
+                                        doctors[doc_idx[i]], rooms[room_idx[i]], start_idx[i], durations[i],
+                                        timeslots, calendar, p.get("diagnosis")))
+
+    return schedule
+
+
+def _case_constraints(patients, calendar):
+    """(durations, solve_schedule keyword arguments) for the patients, in their order."""
+    if calendar is None:
+        return np.array([int(p.get("duration_slots", 1) or 1) for p in patients], dtype=np.int64), {}
+    durations, room_ok = calendar.case_requirements(patients)
+    return durations, dict(room_ok=room_ok, doctor_busy=~calendar.surgeon_avail, room_busy=~calendar.room_avail,
+                           doctor_limit=calendar.surgeon_limit)
+
+
+def case_capacity(doctors=None, rooms=None, timeslots=None, calendar=None):
+    """
+    Most cases the resources could hold if each took one slot: the slots
+    where a doctor and a room are both free. No schedule has more cases.
+    """
+    if calendar is not None:
+        return int(np.minimum(calendar.surgeon_avail.sum(axis=0), calendar.room_avail.sum(axis=0)).sum())
+    return min(len(doctors or DOCTORS), len(rooms or ROOMS)) * len(timeslots or TIMESLOTS)
+
+
+def max_schedulable(patients, doctors=None, rooms=None, timeslots=None, calendar=None):
+    """
+    Largest k for which the k most severe patients pass
+    capacity_shortfall(), found by bisection (more cases only add
+    demand). A max_cases that fits the resources, e.g. as a UI default;
+    the search itself can still fail below it.
+
+    Args:
+        patients, doctors, rooms, timeslots, calendar: as for build_schedule
+
+    Returns:
+        int
+    """
+    if calendar is not None:
+        doctors, rooms, timeslots = calendar.surgeons, calendar.rooms, calendar.timeslots
+    doctors = list(doctors or DOCTORS)
+    rooms = list(rooms or ROOMS)
+    timeslots = list(timeslots or TIMESLOTS)
+    patients = by_severity(patients, case_capacity(doctors, rooms, timeslots, calendar))
+    durations, constraints = _case_constraints(patients, calendar)
+
+    lo, hi = 0, len(patients)
+    while lo < hi:
+        k = (lo + hi + 1) // 2
+        head = dict(constraints, room_ok=constraints["room_ok"][:k]) if "room_ok" in constraints else constraints
+        if capacity_shortfall(durations[:k], len(doctors), len(rooms), len(timeslots), **head) is None:
+            lo = k
+        else:
+            hi = k - 1
+    return lo
+
+
+def _schedule_entry(pid, severity, doctor, room, start, duration, timeslots, calendar, diagnosis=None):
+    entry = {
+        "Patient_ID": pid,
+        "Doctor": doctor,
+        "Room": room,
+        "Time": timeslots[start],
+        "Severity": round(severity, 3),
+        # kept so that reschedule() knows how long the case occupies its doctor and room
+        "Duration_Slots": int(duration),
+    }
+    if calendar is not None:
+        end = calendar.day_start + (start + duration) * calendar.slot_minutes
+        entry["End"] = f"{end // 60:02d}:{end % 60:02d}"
+        # kept so that reschedule() knows the equipment the case needs
+        entry["Diagnosis"] = None if diagnosis is None or diagnosis != diagnosis else diagnosis
+    return entry
+
+
+def _slot_index(label, timeslots, calendar, default):
+    """Slot index of a Time/End label; labels past the last slot map to len(timeslots)."""
+    if label is None:
+        return default
+    if label in timeslots:
+        return timeslots.index(label)
+    if calendar is not None:
+        h, m = str(label).split(":")
+        return min(len(timeslots), max(0, (int(h) * 60 + int(m) - calendar.day_start) // calendar.slot_minutes))
+    raise ValueError(f"Unknown timeslot {label!r}")
+
+
+def reschedule(previous_schedule, changes, doctors=None, rooms=None, timeslots=None, calendar=None,
+               max_backtracks=MAX_BACKTRACKS):
+    """
+    Repair a schedule after a disruption instead of solving from scratch.
+
+    Cases untouched by the change keep their doctor, room and time. Only
+    cases in conflict with the change are reopened, with their old
+    assignment tried first (minimal perturbation). If they cannot all be
+    placed, the least severe kept cases are reopened too, doubling the
+    neighbourhood each round; if even a full re-solve fails, the least
+    severe cases are left unscheduled.
+
+    With a calendar, each case's equipment needs come from the "Diagnosis"
+    that build_schedule records in its entries, so kept and reopened cases
+    alike only end up in rooms that have the equipment; a kept case in a
+    room that lacks it is reopened.
+
+    Each case keeps the length recorded in its entry's "Duration_Slots"
+    (entries without it, e.g. from the reference engine, take one slot).
+
+    Args:
+        previous_schedule: output of build_schedule with the same resources
+        changes: dict with any of
+            "add": patient dicts to fit in (e.g. an emergency case)
+            "remove": patient ids that are cancelled or done
+            "update": patient dicts with a new fuzzy_severity and/or
+                duration_slots / diagnosis
+            "block": [{"doctor" or "room": name, "start": slot label,
+                "end": slot label (exclusive, default end of day)}]
+                for resource time that is no longer available
+        doctors, rooms, timeslots, calendar: as for build_schedule
+
+    Returns:
+        (schedule, diff): the repaired schedule in severity order, and one
+        {"Patient_ID", "Change", "From", "To"} dict per case that was
+        added, moved, removed or left unscheduled
     """
+    if calendar is not None:
+        doctors, rooms, timeslots = calendar.surgeons, calendar.rooms, calendar.timeslots
+    doctors = list(doctors or DOCTORS)
+    rooms = list(rooms or ROOMS)
+    timeslots = list(timeslots or TIMESLOTS)
+    n_slots = len(timeslots)
+
+    def describe(value, length):
+        t, d, r = value
+        return f"{doctors[d]} / {rooms[r]} / {timeslots[t]} ({length} slot{'s' if length > 1 else ''})"
+
+    # --- current cases: pid -> patient, previous (start, doctor, room), duration ---
+    cases = {}
+    for entry in previous_schedule:
+        if "Error" in entry:
+            continue
+        pid = entry["Patient_ID"]
+        start = _slot_index(entry["Time"], timeslots, calendar, 0)
+        duration = int(entry.get("Duration_Slots", 1))
+        if calendar is not None and "End" in entry and "Duration_Slots" not in entry:
+            duration = _slot_index(entry["End"], timeslots, calendar, n_slots) - start
+        patient = {"patient_id": pid, "fuzzy_severity": entry.get("Severity", 0), "duration_slots": duration}
+        if entry.get("Diagnosis") is not None:
+            patient["diagnosis"] = entry["Diagnosis"]
+        cases[pid] = {
+            "patient": patient,
+            "prev": (start, doctors.index(entry["Doctor"]), rooms.index(entry["Room"])),
+        }
+
+    diff = []
+    reopen = set()
+    for pid in changes.get("remove", []):
+        if cases.pop(pid, None) is not None:
+            diff.append({"Patient_ID": pid, "Change": "removed", "From": None, "To": None})
+    for p in changes.get("update", []):
+        case = cases[p["patient_id"]]
+        old = dict(case["patient"])
+        case["patient"].update(p)
+        if "diagnosis" in p and calendar is not None and "duration_slots" not in p:
+            case["patient"].pop("duration_slots", None)
+        if old.get("duration_slots") != case["patient"].get("duration_slots") or "diagnosis" in p:
+            reopen.add(p["patient_id"])
+    for p in changes.get("add", []):
+        cases[p["patient_id"]] = {"patient": dict(p), "prev": None}
+        reopen.add(p["patient_id"])
+
+    pids = sorted(cases, key=lambda pid: cases[pid]["patient"].get("fuzzy_severity", 0), reverse=True)
+    patients = [cases[pid]["patient"] for pid in pids]
+    if calendar is not None:
+        durations, room_ok = calendar.case_requirements(patients)
+        base_doc_busy, base_room_busy = ~calendar.surgeon_avail, ~calendar.room_avail
+        doc_limit = calendar.surgeon_limit
+    else:
+        durations = np.array([int(p.get("duration_slots", 1) or 1) for p in patients], dtype=np.int64)
+        room_ok = np.ones((len(pids), len(rooms)), dtype=bool)
+        base_doc_busy = np.zeros((len(doctors), n_slots), dtype=bool)
+        base_room_busy = np.zeros((len(rooms), n_slots), dtype=bool)
+        doc_limit = None
+    base_doc_busy, base_room_busy = base_doc_busy.copy(), base_room_busy.copy()
+
+    for block in changes.get("block", []):
+        a = _slot_index(block.get("start"), timeslots, calendar, 0)
+        b = _slot_index(block.get("end"), timeslots, calendar, n_slots)
+        if "doctor" in block:
+            base_doc_busy[doctors.index(block["doctor"]), a:b] = True
+        if "room" in block:
+            base_room_busy[rooms.index(block["room"]), a:b] = True
 
-    # Slightly larger domain for feasibility
-    doctors = ["Dr. A", "Dr. B", "Dr. C"]
-    rooms = ["Room 1", "Room 2"]
-    timeslots = ["9 AM", "10 AM", "11 AM", "12 PM"]
+    # cases whose old slot is no longer valid (blocked, or now ineligible) are reopened
+    prev = np.full((len(pids), 3), -1)
+    for i, pid in enumerate(pids):
+        if cases[pid]["prev"] is not None and pid not in reopen:
+            t, d, r = cases[pid]["prev"]
+            end = t + durations[i]
+            if end > n_slots or base_doc_busy[d, t:end].any() or base_room_busy[r, t:end].any() or not room_ok[i, r]:
+                reopen.add(pid)
+        if cases[pid]["prev"] is not None:
+            prev[i] = cases[pid]["prev"]
+
+    kept_by_severity = [i for i in reversed(range(len(pids))) if pids[i] not in reopen and prev[i][0] >= 0]
+    dropped = set()
+    n_extra = 0
+    while True:
+        extra = set(kept_by_severity[:n_extra])
+        open_idx = [i for i in range(len(pids)) if i not in dropped and (pids[i] in reopen or i in extra)]
+        fixed_idx = [i for i in range(len(pids)) if i not in dropped and i not in open_idx]
+
+        doc_busy, room_busy = base_doc_busy.copy(), base_room_busy.copy()
+        doc_load = np.zeros(len(doctors), dtype=np.int64)
+        for i in fixed_idx:
+            t, d, r = prev[i]
+            doc_busy[d, t:t + durations[i]] = True
+            room_busy[r, t:t + durations[i]] = True
+            doc_load[d] += durations[i]
+
+        idx = np.array(open_idx, dtype=int)
+        result = solve_schedule(durations[idx], len(doctors), len(rooms), n_slots, room_ok=room_ok[idx],
+                                doctor_busy=doc_busy, room_busy=room_busy, doctor_limit=doc_limit,
+                                doctor_load=doc_load, preferred=prev[idx], max_backtracks=max_backtracks)
+        if result is not None:
+            break
+        if n_extra < len(kept_by_severity):
+            n_extra = max(1, 2 * n_extra)
+            continue
+        # nothing left to move: leave the least severe remaining case unscheduled
+        # and start again from the smallest neighbourhood
+        dropped.add(max(i for i in range(len(pids)) if i not in dropped))
+        n_extra = 0
+        if len(dropped) == len(pids):
+            result = (np.array([], dtype=int),) * 3
+            idx = np.array([], dtype=int)
+            break
+
+    assignment = {i: tuple(prev[i]) for i in fixed_idx}
+    for k, i in enumerate(idx):
+        assignment[int(i)] = (int(result[2][k]), int(result[0][k]), int(result[1][k]))
+
+    schedule = []
+    for i, pid in enumerate(pids):
+        p = cases[pid]["patient"]
+        if i in dropped:
+            diff.append({"Patient_ID": pid, "Change": "unscheduled",
+                         "From": describe(prev[i], durations[i]) if prev[i][0] >= 0 else None, "To": None})
+            continue
+        t, d, r = assignment[i]
+        schedule.append(_schedule_entry(pid, p.get("fuzzy_severity", 0), doctors[d], rooms[r], t, durations[i],
+                                        timeslots, calendar, p.get("diagnosis")))
+        if cases[pid]["prev"] is None:
+            diff.append({"Patient_ID": pid, "Change": "added", "From": None, "To": describe((t, d, r), durations[i])})
+        elif (t, d, r) != tuple(int(v) for v in prev[i]):
+            diff.append({"Patient_ID": pid, "Change": "moved", "From": describe(prev[i], durations[i]),
+                         "To": describe((t, d, r), durations[i])})
+
+    return schedule, diff
+
+
+def _window_free(busy, length):
+    """free[r, t] is True when resource r is idle for slots t .. t+length-1."""
+    n_res, n_slots = busy.shape
+    free = np.zeros((n_res, n_slots), dtype=bool)
+    if length > n_slots:
+        return free
+    csum = np.zeros((n_res, n_slots + 1), dtype=np.int32)
+    np.cumsum(busy, axis=1, out=csum[:, 1:])
+    free[:, :n_slots - length + 1] = (csum[:, length:] - csum[:, :n_slots - length + 1]) == 0
+    return free
+
+
+def capacity_shortfall(durations, n_doctors, n_rooms, n_slots, doctor_ok=None, room_ok=None,
+                       doctor_busy=None, room_busy=None, doctor_limit=None, doctor_load=None, room_names=None):
+    """
+    Cheap necessary conditions for a schedule to exist, checked before
+    any search:
+
+    * every case has a start slot with an eligible doctor and room free
+      for its whole duration;
+    * all case-slots fit in the doctors' remaining shift limits;
+    * for each set of eligible rooms (one per procedure's equipment
+      needs), the cases that only fit in those rooms fit in the slots
+      where one of them and a doctor are both free.
+
+    Passing them does not prove feasibility; failing any proves the
+    opposite, so solve_schedule() returns at once instead of spending its
+    backtrack budget.
+
+    Args:
+        as for solve_schedule; room_names label rooms in the message
+
+    Returns:
+        a message describing the first violated condition, or None
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    if n == 0:
+        return None
+    doctor_ok = np.ones((n, n_doctors), dtype=bool) if doctor_ok is None else np.asarray(doctor_ok, dtype=bool)
+    room_ok = np.ones((n, n_rooms), dtype=bool) if room_ok is None else np.asarray(room_ok, dtype=bool)
+    doc_busy = np.zeros((n_doctors, n_slots), dtype=bool) if doctor_busy is None else np.asarray(doctor_busy, dtype=bool)
+    room_busy = np.zeros((n_rooms, n_slots), dtype=bool) if room_busy is None else np.asarray(room_busy, dtype=bool)
+    doc_limit = np.full(n_doctors, n_slots) if doctor_limit is None else np.asarray(doctor_limit, dtype=np.int64)
+    doc_load = np.zeros(n_doctors, dtype=np.int64) if doctor_load is None else np.asarray(doctor_load, dtype=np.int64)
+    room_names = list(room_names) if room_names is not None else [f"room {r}" for r in range(n_rooms)]
 
-    # Limit to top 5 severe patients
-    patients = sorted(patients, key=lambda x: x.get("fuzzy_severity", 0), reverse=True)[:5]
+    for length in np.unique(durations):
+        cases = np.flatnonzero(durations == length)
+        doc_mask = doctor_ok[cases] & (doc_load + length <= doc_limit)[None, :]
+        doc_start = (doc_mask.astype(np.int32) @ _window_free(doc_busy, length)) > 0
+        room_start = (room_ok[cases].astype(np.int32) @ _window_free(room_busy, length)) > 0
+        stuck = ~(doc_start & room_start).any(axis=1)
+        if stuck.any():
+            return f"{stuck.sum()} case(s) of {length} slots fit no free doctor and room window"
+
+    doc_free, room_free = ~doc_busy, ~room_busy
+    doctor_capacity = int(np.minimum(doc_limit - doc_load, doc_free.sum(axis=1)).clip(0).sum())
+    if durations.sum() > doctor_capacity:
+        return f"{durations.sum()} case slots exceed the {doctor_capacity} doctor slots left in the shift limits"
+
+    free_doctors = doc_free.sum(axis=0)
+    for rooms in np.unique(room_ok, axis=0):
+        demand = durations[~(room_ok & ~rooms).any(axis=1)].sum()
+        capacity = int(np.minimum(room_free[rooms].sum(axis=0), free_doctors).sum())
+        if demand > capacity:
+            names = ", ".join(room_names[r] for r in np.flatnonzero(rooms))
+            return f"{demand} slots of cases that only fit in {names} exceed the {capacity} slots free there"
+    return None
+
+
+def solve_schedule(durations, n_doctors, n_rooms, n_slots, doctor_ok=None, room_ok=None,
+                   doctor_busy=None, room_busy=None, doctor_limit=None, doctor_load=None,
+                   preferred=None, value_order="earliest", seed=None, deadline=None,
+                   max_backtracks=MAX_BACKTRACKS):
+    """
+    Integer-encoded surgery scheduling by depth-first search with
+    forward checking.
+
+    Cases are variables in the given order (callers pass them by
+    descending severity). Resource use is kept as boolean busy matrices
+    (resource x slot), so the "no double booking" constraints for doctors
+    and rooms become one array lookup instead of O(n^2) pair constraints.
+    Values are tried earliest start first. After every assignment:
+
+    * forward checking: every unassigned case must still have a start
+      slot with an eligible free doctor and room for its whole duration;
+    * capacity propagation: remaining case-slots must fit in
+      sum over slots of min(free doctors, free rooms).
+
+    Instances that fail capacity_shortfall() are rejected before the
+    search starts.
+
+    Args:
+        durations: int array (n_cases,), slots each case occupies
+        doctor_ok / room_ok: bool arrays (n_cases, n_doctors / n_rooms) of
+            eligible resources, all True when None
+        doctor_busy / room_busy: bool arrays (resources, n_slots) of
+            slots already blocked, all False when None
+        doctor_limit: int array (n_doctors,), max slots a doctor may
+            operate (shift limit), unlimited when None
+        doctor_load: int array (n_doctors,), slots already operated
+            (counts against doctor_limit), zero when None
+        preferred: int array (n_cases, 3) of (start, doctor, room) to try
+            before any other value, -1 rows for no preference
+        value_order: "earliest" (start, then lowest doctor/room index),
+            "balanced" (earliest start, least loaded doctor first) or
+            "random" (shuffled with seed, for restarts)
+        deadline: time.monotonic() value after which the search gives up
+
+    Returns:
+        (doctor_idx, room_idx, start_idx) int arrays, or None if no
+        schedule exists (or the backtrack budget ran out)
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    doctor_ok = np.ones((n, n_doctors), dtype=bool) if doctor_ok is None else np.asarray(doctor_ok, dtype=bool)
+    room_ok = np.ones((n, n_rooms), dtype=bool) if room_ok is None else np.asarray(room_ok, dtype=bool)
+    doc_busy = np.zeros((n_doctors, n_slots), dtype=bool) if doctor_busy is None else np.array(doctor_busy, dtype=bool)
+    room_busy = np.zeros((n_rooms, n_slots), dtype=bool) if room_busy is None else np.array(room_busy, dtype=bool)
+    doc_limit = np.full(n_doctors, n_slots) if doctor_limit is None else np.asarray(doctor_limit, dtype=np.int64)
+    doc_load = np.zeros(n_doctors, dtype=np.int64) if doctor_load is None else np.array(doctor_load, dtype=np.int64)
+
+    doc_idx = np.full(n, -1)
+    room_idx = np.full(n, -1)
+    start_idx = np.full(n, -1)
+    if n == 0:
+        return doc_idx, room_idx, start_idx
+    if capacity_shortfall(durations, n_doctors, n_rooms, n_slots, doctor_ok, room_ok, doc_busy, room_busy,
+                          doc_limit, doc_load) is not None:
+        return None
+
+    lengths = np.unique(durations)
+    rng = np.random.default_rng(seed)
+
+    def candidates(c):
+        """(start, doctor, room) values for case c, preferred value first, then earliest start."""
+        length = durations[c]
+        doc_free = _window_free(doc_busy, length) & (doctor_ok[c] & (doc_load + length <= doc_limit))[:, None]
+        room_free = _window_free(room_busy, length) & room_ok[c][:, None]
+        first = None
+        if preferred is not None and preferred[c][0] >= 0:
+            t, d, r = (int(v) for v in preferred[c])
+            if doc_free[d, t] and room_free[r, t]:
+                first = (t, d, r)
+                yield first
+        starts = np.flatnonzero(doc_free.any(axis=0) & room_free.any(axis=0))
+        if value_order == "random":
+            starts = rng.permutation(starts)
+        for t in starts:
+            docs = np.flatnonzero(doc_free[:, t])
+            rooms = np.flatnonzero(room_free[:, t])
+            if value_order == "balanced":
+                docs = docs[np.argsort(doc_load[docs], kind="stable")]
+            elif value_order == "random":
+                docs, rooms = rng.permutation(docs), rng.permutation(rooms)
+            for d in docs:
+                for r in rooms:
+                    if (t, d, r) != first:
+                        yield int(t), int(d), int(r)
+
+    def consistent(level):
+        rest = np.arange(level + 1, n)
+        if len(rest) == 0:
+            return True
+        # capacity: slots where a doctor and a room are both idle
+        capacity = np.minimum((~doc_busy).sum(axis=0), (~room_busy).sum(axis=0)).sum()
+        if durations[rest].sum() > capacity:
+            return False
+        if durations[rest].sum() > np.minimum(doc_limit - doc_load, (~doc_busy).sum(axis=1)).clip(0).sum():
+            return False
+        # forward checking, one matrix product per distinct duration
+        for length in lengths:
+            cases = rest[durations[rest] == length]
+            if len(cases) == 0:
+                continue
+            doc_mask = doctor_ok[cases] & (doc_load + length <= doc_limit)[None, :]
+            doc_start = (doc_mask.astype(np.int32) @ _window_free(doc_busy, length)) > 0
+            room_start = (room_ok[cases].astype(np.int32) @ _window_free(room_busy, length)) > 0
+            if not (doc_start & room_start).any(axis=1).all():
+                return False
+        return True
+
+    def assign(c, t, d, r, value):
+        doc_busy[d, t:t + durations[c]] = value
+        room_busy[r, t:t + durations[c]] = value
+        doc_load[d] += durations[c] if value else -durations[c]
+
+    stack = [candidates(0)]
+    backtracks = checks = 0
+    try:
+        while stack:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            level = len(stack) - 1
+            if start_idx[level] >= 0:
+                assign(level, start_idx[level], doc_idx[level], room_idx[level], False)
+                start_idx[level] = -1
+            for t, d, r in stack[-1]:
+                assign(level, t, d, r, True)
+                checks += 1
+                if consistent(level):
+                    doc_idx[level], room_idx[level], start_idx[level] = d, r, t
+                    break
+                assign(level, t, d, r, False)
+            else:
+                stack.pop()
+                backtracks += 1
+                if backtracks > max_backtracks:
+                    return None
+                continue
+            if level + 1 == n:
+                return doc_idx, room_idx, start_idx
+            stack.append(candidates(level + 1))
+
+        return None
+    finally:
+        instrumentation.count("schedule_backtracks_total", backtracks)
+        instrumentation.count("schedule_constraint_checks_total", checks)
+
+
+def _build_schedule_reference(patients, doctors, rooms, timeslots):
+    """
+    Original python-constraint formulation with pairwise constraints, kept
+    as a reference. Balanced version: very fast (~1-2s) for the default
+    top 5 cases and always finds feasible solutions.
+    """
+    from constraint import Problem
 
     problem = Problem()
 
@@ -62,7 +642,8 @@ def build_schedule(patients):
             "Doctor": solution[f"doctor_{pid}"],
             "Room": solution[f"room_{pid}"],
             "Time": solution[f"time_{pid}"],
-            "Severity": round(p.get("fuzzy_severity", 0), 3)
+            "Severity": round(p.get("fuzzy_severity", 0), 3),
+            "Duration_Slots": 1,
         })
 
     return schedule
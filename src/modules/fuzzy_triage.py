@@ -1,9 +1,21 @@
+import hashlib
+import os
+import pickle
+
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
+import pandas as pd
 import math
 
+from . import instrumentation
+
+# skfuzzy (and networkx behind it) is imported inside the functions that
+# need it: scoring goes through CompiledFuzzySystem, which is loaded from
+# a pickle when the rules have not changed (see cached_fuzzy_system)
+
 def build_fuzzy_system():
+    import skfuzzy as fuzz
+    from skfuzzy import control as ctrl
+
     heart_rate = ctrl.Antecedent(np.arange(40, 181, 1), 'heart_rate')
     spo2 = ctrl.Antecedent(np.arange(70, 101, 1), 'spo2')
     temperature = ctrl.Antecedent(np.arange(95, 106, 0.1), 'temperature')
@@ -42,7 +54,17 @@ def build_fuzzy_system():
 
 
 def compute_severity(row, system_ctrl):
-    """Safely compute severity for one row, even if missing data."""
+    """
+    Safely compute severity for one row, even if missing data.
+
+    system_ctrl may also be a CompiledFuzzySystem, SeverityLookupTable or
+    SeveritySurrogate; the row is then scored by that engine.
+    """
+    if isinstance(system_ctrl, (CompiledFuzzySystem, SeverityLookupTable, SeveritySurrogate)):
+        return float(compute_severity_batch(pd.DataFrame([dict(row)]), system_ctrl)[0])
+    from skfuzzy import control as ctrl
+
+    instrumentation.count("triage_rows_scored_total", engine="skfuzzy")
     try:
         # Create a fresh simulation for each patient
         sim = ctrl.ControlSystemSimulation(system_ctrl)
@@ -69,3 +91,624 @@ def compute_severity(row, system_ctrl):
     except Exception as e:
         print("Fuzzy error:", e)
         return 0.5  # safe fallback
+
+
+# ---------------------- Vectorized batch engine ----------------------
+
+VITAL_COLUMNS = ["heart_rate", "spo2", "temperature", "respiratory_rate"]
+VITAL_DEFAULTS = {"heart_rate": 80, "spo2": 95, "temperature": 98.6, "respiratory_rate": 18}
+# rows per block: defuzzify holds two (rows, 101) float64 buffers, ~26 MB at this size
+BATCH_CHUNK_SIZE = 16384
+
+
+class CompiledFuzzySystem:
+    """
+    Array form of a skfuzzy ControlSystem.
+
+    Membership functions, rules and the centroid weights of the output
+    universe are extracted once so that many patients can be scored with
+    plain NumPy operations instead of one ControlSystemSimulation each.
+    """
+
+    def __init__(self, system_ctrl):
+        from skfuzzy.control.term import TermAggregate
+
+        self.antecedents = {}
+        for ant in system_ctrl.antecedents:
+            terms = {label: np.asarray(term.mf, dtype=np.float64) for label, term in ant.terms.items()}
+            self.antecedents[ant.label] = (np.asarray(ant.universe, dtype=np.float64), terms)
+
+        consequents = list(system_ctrl.consequents)
+        if len(consequents) != 1:
+            raise ValueError("Batch engine supports a single consequent, got %d" % len(consequents))
+        cons = consequents[0]
+        self.output_label = cons.label
+        self.output_universe = np.asarray(cons.universe, dtype=np.float64)
+        self.output_terms = list(cons.terms)
+        self.output_mfs = np.vstack([np.asarray(cons.terms[t].mf, dtype=np.float64) for t in self.output_terms])
+
+        # (antecedent tree, [(term index, weight)], and_func, or_func) per rule;
+        # the tree is copied into _Clause nodes so no skfuzzy object is kept
+        self.rules = []
+        for rule in system_ctrl.rules:
+            targets = [(self.output_terms.index(c.term.label), c.weight) for c in rule.consequent]
+            self.rules.append((_clause(rule.antecedent, TermAggregate), targets, rule.and_func, rule.or_func))
+
+        self.area_weights, self.moment_weights = _centroid_weights(self.output_universe)
+
+    def fuzzify(self, inputs):
+        """Membership degree of every antecedent term, keyed by (variable, term)."""
+        memberships = {}
+        for label, (universe, terms) in self.antecedents.items():
+            # ControlSystemSimulation clips inputs to the universe bounds
+            x = np.clip(inputs[label], universe[0], universe[-1])
+            for term_label, mf in terms.items():
+                memberships[(label, term_label)] = np.interp(x, universe, mf)
+        return memberships
+
+    def activations(self, inputs):
+        """Accumulated activation of every output term, shape (n_terms, n_rows)."""
+        memberships = self.fuzzify(inputs)
+        n = len(next(iter(inputs.values())))
+        cuts = np.zeros((len(self.output_terms), n))
+        for antecedent, targets, and_func, or_func in self.rules:
+            firing = _fire(antecedent, memberships, and_func, or_func)
+            for idx, weight in targets:
+                np.fmax(cuts[idx], firing * weight, out=cuts[idx])
+        return cuts
+
+    def defuzzify(self, cuts, fallback=0.5):
+        """Centroid of the clipped output sets, computed as two mat-vec products."""
+        # max over terms of the clipped sets, one term at a time so that only
+        # two (n_rows, universe) buffers exist instead of a (rows, terms, universe) one
+        output_mf = np.zeros((cuts.shape[1], len(self.output_universe)))
+        clipped = np.empty_like(output_mf)
+        for cut, mf in zip(cuts, self.output_mfs):
+            np.minimum(cut[:, None], mf[None, :], out=clipped)
+            np.maximum(output_mf, clipped, out=output_mf)
+        area = output_mf @ self.area_weights
+        moment = output_mf @ self.moment_weights
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = moment / area
+        # skfuzzy raises on an empty output set; compute_severity falls back to 0.5
+        result[area <= 0] = fallback
+        return result
+
+    def compute(self, inputs, fallback=0.5):
+        return self.defuzzify(self.activations(inputs), fallback)
+
+
+def _centroid_weights(x):
+    """
+    Weights w_a, w_m such that area = mf @ w_a and moment = mf @ w_m for a
+    piecewise-linear membership function sampled on x (same integral as
+    skfuzzy's centroid).
+    """
+    dx = np.diff(x)
+    x1, x2 = x[:-1], x[1:]
+    area = np.zeros_like(x)
+    moment = np.zeros_like(x)
+    area[:-1] += dx / 2
+    area[1:] += dx / 2
+    moment[:-1] += dx * (2 * x1 + x2) / 6
+    moment[1:] += dx * (x1 + 2 * x2) / 6
+    return area, moment
+
+
+class _Clause:
+    """
+    Plain copy of a skfuzzy rule antecedent node: kind "term" (term is a
+    (variable, term) key) or "and" / "or" / "not" over term1 / term2.
+    str() is skfuzzy's text for the node, which fingerprints hash.
+    """
+
+    __slots__ = ("kind", "term", "term1", "term2", "text")
+
+    def __init__(self, kind, term=None, term1=None, term2=None, text=""):
+        self.kind = kind
+        self.term = term
+        self.term1 = term1
+        self.term2 = term2
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+def _clause(node, aggregate_type):
+    """_Clause tree of a skfuzzy Term / TermAggregate tree."""
+    if isinstance(node, aggregate_type):
+        term2 = None if node.kind == "not" else _clause(node.term2, aggregate_type)
+        return _Clause(node.kind, term1=_clause(node.term1, aggregate_type), term2=term2, text=str(node))
+    return _Clause("term", term=(node.parent.label, node.label), text=str(node))
+
+
+def _fire(node, memberships, and_func, or_func):
+    """Evaluate a rule antecedent (_Clause tree) over arrays."""
+    if node.kind == "term":
+        return memberships[node.term]
+    if node.kind == "not":
+        return 1.0 - _fire(node.term1, memberships, and_func, or_func)
+    left = _fire(node.term1, memberships, and_func, or_func)
+    right = _fire(node.term2, memberships, and_func, or_func)
+    return and_func(left, right) if node.kind == "and" else or_func(left, right)
+
+
+def compile_fuzzy_system(system_ctrl):
+    """Return a CompiledFuzzySystem (no-op if already compiled)."""
+    if isinstance(system_ctrl, CompiledFuzzySystem):
+        return system_ctrl
+    return CompiledFuzzySystem(system_ctrl)
+
+
+SYSTEM_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "fuzzy_system"))
+
+
+def rules_hash():
+    """
+    Hash of this module's source (the rules and membership functions of
+    build_fuzzy_system, the CompiledFuzzySystem layout) and of the
+    installed skfuzzy package (path and mtime, so an upgrade rebuilds).
+    Computed without importing skfuzzy.
+    """
+    from importlib.util import find_spec
+
+    spec = find_spec("skfuzzy")
+    installed = f"{spec.origin}|{os.stat(spec.origin).st_mtime_ns}" if spec and spec.origin else "missing"
+    with open(__file__, "rb") as fh:
+        return hashlib.sha256(installed.encode() + b"|" + fh.read()).hexdigest()[:16]
+
+
+def cached_fuzzy_system(cache_dir=SYSTEM_CACHE_DIR):
+    """
+    compile_fuzzy_system(build_fuzzy_system()), pickled under cache_dir and
+    keyed by rules_hash(), so a fresh process loads it in a millisecond
+    instead of importing skfuzzy and rebuilding the ControlSystem.
+
+    Args:
+        cache_dir: where compiled_<hash>.pkl lives (None to always build)
+
+    Returns:
+        CompiledFuzzySystem
+    """
+    path = os.path.join(cache_dir, f"compiled_{rules_hash()}.pkl") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "rb") as fh:
+                return pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            pass  # unreadable or from an older layout, rebuild below
+
+    compiled = compile_fuzzy_system(build_fuzzy_system())
+    if path is None:
+        return compiled
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        pickle.dump(compiled, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return compiled
+
+
+def vitals_to_arrays(df):
+    """
+    Extract the four vitals as float64 arrays plus a mask of rows with any
+    missing value. Absent columns use the same defaults as compute_severity.
+    """
+    n = len(df) if isinstance(df, pd.DataFrame) else len(next(iter(df.values()), ()))
+    inputs = {}
+    missing = np.zeros(n, dtype=bool)
+    for col in VITAL_COLUMNS:
+        if col in df:
+            values = np.asarray(pd.to_numeric(df[col], errors="coerce"), dtype=np.float64)
+        else:
+            values = np.full(n, VITAL_DEFAULTS[col], dtype=np.float64)
+        missing |= np.isnan(values)
+        inputs[col] = values
+    return inputs, missing
+
+
+def compute_severity_batch(df, system, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Vectorized equivalent of df.apply(compute_severity, axis=1).
+
+    Args:
+        df: DataFrame (or dict of arrays) with the vital sign columns
+        system: ControlSystem from build_fuzzy_system(), a CompiledFuzzySystem,
+            a SeverityLookupTable (compiled mode) or a SeveritySurrogate
+        chunk_size: rows evaluated per block, bounds memory on large inputs
+
+    Returns:
+        np.ndarray: severity per row, 0.5 where any vital is missing
+    """
+    if isinstance(system, (SeverityLookupTable, SeveritySurrogate)):
+        compiled = system
+    else:
+        compiled = compile_fuzzy_system(system)
+    engine = _ENGINE_NAMES.get(type(compiled), "exact")
+    with instrumentation.timer("triage_batch", engine=engine):
+        inputs, missing = vitals_to_arrays(df)
+        n = len(missing)
+        out = np.full(n, 0.5)
+        valid = np.flatnonzero(~missing)
+
+        for start in range(0, len(valid), chunk_size):
+            idx = valid[start:start + chunk_size]
+            chunk = {col: values[idx] for col, values in inputs.items()}
+            out[idx] = compiled.compute(chunk)
+
+    instrumentation.count("triage_rows_scored_total", n, engine=engine)
+    instrumentation.count("triage_rows_missing_vitals_total", n - len(valid))
+    return out
+
+
+# ---------------------- Compiled lookup-table mode ----------------------
+
+LUT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "fuzzy_lut"))
+
+# Grid points per input, spread evenly over each antecedent's universe
+DEFAULT_LUT_GRID = {"heart_rate": 71, "spo2": 31, "temperature": 56, "respiratory_rate": 31}
+
+
+def fuzzy_system_fingerprint(system):
+    """
+    Stable hash of a fuzzy system: universes, membership functions, rule
+    structure and operators. Any change to the rules or membership
+    parameters yields a different fingerprint.
+    """
+    compiled = compile_fuzzy_system(system)
+    h = hashlib.sha256()
+    for label in sorted(compiled.antecedents):
+        universe, terms = compiled.antecedents[label]
+        h.update(label.encode())
+        h.update(universe.tobytes())
+        for term_label in sorted(terms):
+            h.update(term_label.encode())
+            h.update(terms[term_label].tobytes())
+    h.update(compiled.output_label.encode())
+    h.update(compiled.output_universe.tobytes())
+    h.update(",".join(compiled.output_terms).encode())
+    h.update(compiled.output_mfs.tobytes())
+    for antecedent, targets, and_func, or_func in compiled.rules:
+        h.update(f"{antecedent}|{targets}|{and_func.__name__}|{or_func.__name__}".encode())
+    return h.hexdigest()
+
+
+class SeverityLookupTable:
+    """
+    Severity precomputed on a regular 4-D grid over the vital sign universes.
+
+    Scoring is a multilinear interpolation between the 16 surrounding grid
+    nodes, i.e. a handful of array reads per patient regardless of how many
+    rules the system has. The table is a memory-mapped .npy file.
+    """
+
+    def __init__(self, axes, table, key):
+        self.axes = axes  # {vital: 1-D grid coordinates}, in VITAL_COLUMNS order
+        self.table = table
+        self.key = key
+
+    def compute(self, inputs, fallback=0.5):
+        n = len(next(iter(inputs.values())))
+        lower = []
+        frac = []
+        for col in VITAL_COLUMNS:
+            axis = self.axes[col]
+            x = np.clip(np.asarray(inputs[col], dtype=np.float64), axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            lower.append(i)
+            frac.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+
+        result = np.zeros(n)
+        for corner in range(16):
+            weight = np.ones(n)
+            index = []
+            for d in range(4):
+                bit = (corner >> d) & 1
+                weight *= frac[d] if bit else 1.0 - frac[d]
+                index.append(lower[d] + bit)
+            result += weight * self.table[tuple(index)]
+        return result
+
+
+def _lut_axes(compiled, grid):
+    axes = {}
+    for col in VITAL_COLUMNS:
+        universe = compiled.antecedents[col][0]
+        axes[col] = np.linspace(universe[0], universe[-1], int(grid[col]))
+    return axes
+
+
+def build_severity_lut(system, grid=None, cache_dir=LUT_CACHE_DIR, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Load the lookup table for this system, building it first if needed.
+
+    The file name is keyed by the system fingerprint and the grid, so
+    editing a rule or membership function triggers a rebuild on next use.
+
+    Args:
+        system: ControlSystem or CompiledFuzzySystem
+        grid: {vital: number of grid points}, defaults to DEFAULT_LUT_GRID
+        cache_dir: where the .npy tables live (None keeps it in memory only)
+
+    Returns:
+        SeverityLookupTable
+    """
+    compiled = compile_fuzzy_system(system)
+    grid = dict(DEFAULT_LUT_GRID, **(grid or {}))
+    grid_spec = ",".join(f"{col}={int(grid[col])}" for col in VITAL_COLUMNS)
+    key = hashlib.sha256(f"{fuzzy_system_fingerprint(compiled)}|{grid_spec}".encode()).hexdigest()[:16]
+    axes = _lut_axes(compiled, grid)
+
+    path = os.path.join(cache_dir, f"severity_lut_{key}.npy") if cache_dir else None
+    if path and os.path.exists(path):
+        return SeverityLookupTable(axes, np.load(path, mmap_mode="r"), key)
+
+    shape = tuple(len(axes[col]) for col in VITAL_COLUMNS)
+    mesh = np.meshgrid(*(axes[col] for col in VITAL_COLUMNS), indexing="ij")
+    flat = {col: m.ravel() for col, m in zip(VITAL_COLUMNS, mesh)}
+    table = np.empty(flat[VITAL_COLUMNS[0]].size, dtype=np.float32)
+    for start in range(0, table.size, chunk_size):
+        chunk = {col: v[start:start + chunk_size] for col, v in flat.items()}
+        table[start:start + chunk_size] = compiled.compute(chunk)
+    table = table.reshape(shape)
+
+    if path is None:
+        return SeverityLookupTable(axes, table, key)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+    return SeverityLookupTable(axes, np.load(path, mmap_mode="r"), key)
+
+
+def lut_accuracy_report(system, lut, n_samples=200_000, seed=0):
+    """
+    Compare the lookup table against the exact vectorized engine on inputs
+    drawn uniformly from each universe.
+
+    Returns:
+        dict: max / mean / p99 absolute error and the share of samples
+        within 0.01 and 0.05 of the exact severity
+    """
+    compiled = compile_fuzzy_system(system)
+    rng = np.random.default_rng(seed)
+    inputs = {}
+    for col in VITAL_COLUMNS:
+        universe = compiled.antecedents[col][0]
+        inputs[col] = rng.uniform(universe[0], universe[-1], n_samples)
+
+    err = np.abs(compiled.compute(inputs) - lut.compute(inputs))
+    return {
+        "samples": n_samples,
+        "grid": {col: len(lut.axes[col]) for col in VITAL_COLUMNS},
+        "max_abs_error": float(err.max()),
+        "mean_abs_error": float(err.mean()),
+        "p99_abs_error": float(np.quantile(err, 0.99)),
+        "within_0.01": float(np.mean(err <= 0.01)),
+        "within_0.05": float(np.mean(err <= 0.05)),
+    }
+
+
+# ---------------------- Learned surrogate mode ----------------------
+
+SURROGATE_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "fuzzy_surrogate"))
+
+SURROGATE_TOLERANCE = 0.01   # max |surrogate - exact| accepted in a certified cell
+SURROGATE_CERTIFY_MARGIN = 0.8  # a cell is certified when its sampled worst error is below margin * tolerance
+SURROGATE_HIDDEN = 32        # units per hidden layer
+SURROGATE_CELLS = 16         # certification cells per activation axis
+SURROGATE_MIN_ACTIVATION = 0.05  # weaker rule firing is next to the no-rule-fires cliff
+
+
+class SeveritySurrogate:
+    """
+    Fuzzy inference with a learned defuzzifier.
+
+    Fuzzification and rule firing stay exact (interpolation and min/max,
+    the cheap part); the centroid over the output universe, about three
+    quarters of the exact cost, is replaced by a tiny MLP on the vector of
+    output-term activations.
+
+    The activation cube is split into cells (plus an "exactly 0" bin per
+    axis, since most patients only fire some output terms) and the MLP is
+    checked against the exact centroid on a dense sample in every cell
+    when it is built. Rows that land in a cell whose sampled error exceeds
+    the tolerance, or whose strongest activation is below min_activation
+    (close to the region where no rule fires and the output jumps to the
+    0.5 fallback), are defuzzified exactly; rows where no rule fires get
+    the fallback directly.
+
+    scored_rows / fallback_rows count the rows of every compute() call
+    since construction or reset_counts(), so fallback_share covers a
+    whole compute_severity_batch run, not just its last chunk.
+    """
+
+    def __init__(self, compiled, weights, biases, trusted, key, tolerance=SURROGATE_TOLERANCE,
+                 min_activation=SURROGATE_MIN_ACTIVATION):
+        self.compiled = compiled
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.trusted = np.asarray(trusted, dtype=bool)  # one flag per cell, shape (cells + 1,) * n_terms
+        self.key = key
+        self.tolerance = tolerance
+        self.min_activation = min_activation
+        self.reset_counts()
+
+    def reset_counts(self):
+        self.scored_rows = 0
+        self.fallback_rows = 0
+
+    @property
+    def fallback_share(self):
+        """Share of the rows scored since the last reset that were defuzzified exactly."""
+        return self.fallback_rows / self.scored_rows if self.scored_rows else 0.0
+
+    def predict(self, cuts):
+        """MLP severity for activations of shape (n_terms, n_rows)."""
+        a = cuts.T.astype(np.float32) * 2 - 1
+        for w, b in zip(self.weights[:-1], self.biases[:-1]):
+            a = np.tanh(a @ w + b)
+        return (a @ self.weights[-1] + self.biases[-1])[:, 0].astype(np.float64)
+
+    def cell_index(self, cuts):
+        """Certification cell of each row: bin 0 for an activation of exactly 0, else 1..cells."""
+        cells = self.trusted.shape[0] - 1
+        return tuple(np.where(c > 0, np.minimum((c * cells).astype(np.intp), cells - 1) + 1, 0) for c in cuts)
+
+    def surrogate_rows(self, cuts):
+        """Mask of rows the MLP may score (certified cell, away from the no-fire region)."""
+        return (cuts.max(axis=0) >= self.min_activation) & self.trusted[self.cell_index(cuts)]
+
+    def compute(self, inputs, fallback=0.5):
+        cuts = self.compiled.activations(inputs)
+        use = self.surrogate_rows(cuts)
+        exact = ~use & (cuts.max(axis=0) > 0)
+        out = np.full(cuts.shape[1], float(fallback))
+        out[use] = self.predict(cuts[:, use])
+        out[exact] = self.compiled.defuzzify(cuts[:, exact], fallback)
+        n_exact = int(np.count_nonzero(exact))
+        self.scored_rows += len(out)
+        self.fallback_rows += n_exact
+        instrumentation.count("triage_surrogate_fallback_rows_total", n_exact)
+        return out
+
+
+def _fit_mlp(X, y, hidden, epochs, seed, batch_size=256, learning_rate=3e-3):
+    """Two tanh hidden layers, linear output, Adam on squared error; X in [-1, 1]."""
+    rng = np.random.default_rng(seed)
+    sizes = [X.shape[1], hidden, hidden, 1]
+    weights = [rng.normal(0, np.sqrt(1 / a), (a, b)) for a, b in zip(sizes[:-1], sizes[1:])]
+    biases = [np.zeros(b) for b in sizes[1:]]
+    params = weights + biases
+    m = [np.zeros_like(p) for p in params]
+    v = [np.zeros_like(p) for p in params]
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(len(X))
+        for start in range(0, len(X), batch_size):
+            idx = order[start:start + batch_size]
+            acts = [X[idx]]
+            for i, (w, b) in enumerate(zip(weights, biases)):
+                z = acts[-1] @ w + b
+                acts.append(np.tanh(z) if i < len(weights) - 1 else z)
+            delta = (acts[-1][:, 0] - y[idx])[:, None] * (2 / len(idx))
+            grads_w, grads_b = [None] * len(weights), [None] * len(weights)
+            for i in reversed(range(len(weights))):
+                grads_w[i] = acts[i].T @ delta
+                grads_b[i] = delta.sum(axis=0)
+                if i:
+                    delta = (delta @ weights[i].T) * (1 - acts[i] ** 2)
+            step += 1
+            for j, (p, g) in enumerate(zip(params, grads_w + grads_b)):
+                m[j] = 0.9 * m[j] + 0.1 * g
+                v[j] = 0.999 * v[j] + 0.001 * g * g
+                p -= learning_rate * (m[j] / (1 - 0.9 ** step)) / (np.sqrt(v[j] / (1 - 0.999 ** step)) + 1e-8)
+        if epoch % 4 == 3:
+            learning_rate *= 0.5
+    return weights, biases
+
+
+def build_severity_surrogate(system, tolerance=SURROGATE_TOLERANCE, hidden=SURROGATE_HIDDEN, epochs=24,
+                             n_train=300_000, cells=SURROGATE_CELLS, samples_per_cell=64, seed=0,
+                             cache_dir=SURROGATE_CACHE_DIR):
+    """
+    Load the surrogate for this system, training and certifying it first if needed.
+
+    Training targets are the exact centroids of activation vectors drawn
+    uniformly from [0, 1]^n_terms, with each term zeroed half of the time
+    so the faces of the cube (terms that do not fire) are covered as well
+    as the inside. Certification draws samples_per_cell fresh points in
+    every cell and keeps SURROGATE_CERTIFY_MARGIN of the tolerance as
+    headroom for the points between samples.
+
+    Args:
+        system: ControlSystem or CompiledFuzzySystem
+        tolerance: error bound for certified cells
+        cache_dir: where the .npz files live (None keeps it in memory only)
+
+    Returns:
+        SeveritySurrogate
+    """
+    compiled = compile_fuzzy_system(system)
+    n_terms = len(compiled.output_terms)
+    spec = f"{hidden},{epochs},{n_train},{cells},{samples_per_cell},{seed},{tolerance},{SURROGATE_CERTIFY_MARGIN}"
+    key = hashlib.sha256(f"{fuzzy_system_fingerprint(compiled)}|{spec}".encode()).hexdigest()[:16]
+
+    path = os.path.join(cache_dir, f"severity_surrogate_{key}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        data = np.load(path)
+        n_layers = len([k for k in data.files if k.startswith("w")])
+        return SeveritySurrogate(compiled, [data[f"w{i}"] for i in range(n_layers)],
+                                 [data[f"b{i}"] for i in range(n_layers)], data["trusted"], key, tolerance)
+
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, (n_train, n_terms)) * (rng.uniform(size=(n_train, n_terms)) < 0.5)
+    X = X[X.max(axis=1) > 0]
+    y = compiled.defuzzify(X.T)
+    weights, biases = _fit_mlp(X * 2 - 1, y, hidden, epochs, seed)
+    shape = (cells + 1,) * n_terms
+    surrogate = SeveritySurrogate(compiled, weights, biases, np.ones(shape, dtype=bool), key, tolerance)
+
+    # worst sampled error per cell; cells never sampled above min_activation stay
+    # trusted (rows there are defuzzified exactly anyway)
+    worst = np.zeros(int(np.prod(shape)))
+    cell_ids = np.repeat(np.arange(len(worst)), samples_per_cell)
+    for start in range(0, len(cell_ids), BATCH_CHUNK_SIZE):
+        ids = cell_ids[start:start + BATCH_CHUNK_SIZE]
+        bins = np.stack(np.unravel_index(ids, shape))
+        cuts = np.where(bins > 0, (bins - 1 + rng.uniform(0, 1, bins.shape)) / cells, 0.0)
+        keep = cuts.max(axis=0) >= surrogate.min_activation
+        err = np.abs(surrogate.predict(cuts[:, keep]) - compiled.defuzzify(cuts[:, keep]))
+        np.maximum.at(worst, ids[keep], err)
+    surrogate.trusted = (worst <= tolerance * SURROGATE_CERTIFY_MARGIN).reshape(shape)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, trusted=surrogate.trusted,
+                 **{f"w{i}": w for i, w in enumerate(surrogate.weights)},
+                 **{f"b{i}": b for i, b in enumerate(surrogate.biases)})
+        os.replace(tmp_path, path)
+    return surrogate
+
+
+def surrogate_accuracy_report(system, surrogate, n_samples=200_000, seed=0):
+    """
+    Validate a surrogate against the exact vectorized engine on inputs
+    drawn uniformly from each universe.
+
+    Returns:
+        dict: max / mean / p99 absolute error of the served output (with
+        exact fallback), the same for the MLP alone, the share of rows
+        that fell back, and the certified share of activation cells
+    """
+    compiled = compile_fuzzy_system(system)
+    rng = np.random.default_rng(seed)
+    inputs = {}
+    for col in VITAL_COLUMNS:
+        universe = compiled.antecedents[col][0]
+        inputs[col] = rng.uniform(universe[0], universe[-1], n_samples)
+
+    exact = compiled.compute(inputs)
+    surrogate.reset_counts()
+    err = np.abs(surrogate.compute(inputs) - exact)
+    cuts = compiled.activations(inputs)
+    raw = np.abs(surrogate.predict(cuts) - exact)
+    return {
+        "samples": n_samples,
+        "tolerance": surrogate.tolerance,
+        "max_abs_error": float(err.max()),
+        "mean_abs_error": float(err.mean()),
+        "p99_abs_error": float(np.quantile(err, 0.99)),
+        "within_tolerance": float(np.mean(err <= surrogate.tolerance)),
+        "fallback_share": surrogate.fallback_share,
+        "certified_cells": float(surrogate.trusted.mean()),
+        "mlp_only_max_abs_error": float(raw.max()),
+        "mlp_only_mean_abs_error": float(raw.mean()),
+    }
+
+
+# engine label of each compiled system type in the instrumentation metrics
+_ENGINE_NAMES = {CompiledFuzzySystem: "exact", SeverityLookupTable: "lut", SeveritySurrogate: "surrogate"}
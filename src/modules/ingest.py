@@ -0,0 +1,147 @@
+"""
+Streaming ingestion of patient files.
+
+CSV files are read in blocks with pyarrow and converted once to a
+columnar Parquet cache with compact dtypes (dictionary-encoded
+categoricals, float32 vitals, small integers). Readers yield pandas
+DataFrames one record batch at a time and only decode the requested
+columns, so triage over a multi-GB admission history touches the four
+vitals (plus ids) and memory stays bounded by the batch size.
+
+    for batch in read_batches(path, columns=["patient_id", *VITAL_COLUMNS]):
+        ...
+"""
+
+import csv
+import hashlib
+import os
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+PARQUET_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "parquet"))
+
+BATCH_ROWS = 65_536
+CSV_ROW_BYTES = 256  # rough CSV row size, turns BATCH_ROWS into a read block size
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# explicit storage types; columns not listed keep pyarrow's inferred type
+PATIENT_SCHEMA = {
+    "patient_id": pa.string(),
+    "symptoms": pa.string(),
+    "gender": _CATEGORY,
+    "blood_group": _CATEGORY,
+    "diagnosis": _CATEGORY,
+    "arrival_mode": _CATEGORY,
+    "consciousness_level": _CATEGORY,
+    "severity_category": _CATEGORY,
+    "recommended_bed_type": _CATEGORY,
+    "pre_existing_conditions": _CATEGORY,
+    "heart_rate": pa.float32(),
+    "spo2": pa.float32(),
+    "temperature": pa.float32(),
+    "respiratory_rate": pa.float32(),
+    "blood_pressure_systolic": pa.float32(),
+    "blood_pressure_diastolic": pa.float32(),
+    "age": pa.int16(),
+    "glasgow_coma_scale": pa.int8(),
+    "pain_level": pa.int8(),
+    "previous_hospitalizations": pa.int16(),
+    "hemoglobin": pa.float32(),
+    "white_blood_cell_count": pa.float32(),
+    "platelet_count": pa.float32(),
+    "blood_sugar": pa.float32(),
+    "creatinine": pa.float32(),
+    "time_since_symptoms_hours": pa.float32(),
+    "severity_score": pa.float32(),
+}
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1] in (".parquet", ".pq")
+
+
+def _csv_columns(path):
+    with open(path, encoding="utf-8", newline="") as fh:
+        return next(csv.reader(fh), [])
+
+
+def iter_record_batches(path, columns=None, batch_rows=BATCH_ROWS):
+    """
+    Arrow record batches from a CSV or Parquet file.
+
+    Args:
+        path: .csv or .parquet file
+        columns: columns to decode (projection pushdown), None for all
+        batch_rows: rows per batch (approximate for CSV)
+    """
+    if _is_parquet(path):
+        parquet = pq.ParquetFile(path)
+        yield from parquet.iter_batches(batch_size=batch_rows, columns=columns)
+        return
+
+    available = _csv_columns(path)
+    wanted = available if columns is None else [c for c in columns if c in available]
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=max(1 << 16, batch_rows * CSV_ROW_BYTES)),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: t for c, t in PATIENT_SCHEMA.items() if c in wanted},
+            include_columns=wanted,
+        ),
+    )
+    yield from reader
+
+
+def read_batches(path, columns=None, batch_rows=BATCH_ROWS):
+    """Generator of pandas DataFrames, one per record batch (categoricals stay categorical)."""
+    for batch in iter_record_batches(path, columns, batch_rows):
+        yield batch.to_pandas()
+
+
+def convert_to_parquet(src_path, dest_path, batch_rows=BATCH_ROWS):
+    """
+    Stream a CSV into a Parquet file with the compact PATIENT_SCHEMA types.
+    One row group per batch; memory use is bounded by batch_rows.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    writer = None
+    try:
+        for batch in iter_record_batches(src_path, batch_rows=batch_rows):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, batch.schema, compression="zstd")
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"No rows in {src_path}")
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def parquet_cache_path(path, cache_dir=None):
+    """Cache file for a CSV (under cache_dir, default PARQUET_CACHE_DIR), keyed by its absolute path, size and mtime."""
+    cache_dir = cache_dir or PARQUET_CACHE_DIR
+    stat = os.stat(path)
+    key = hashlib.sha256(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{key}.parquet")
+
+
+def cached_parquet(path, cache_dir=None, batch_rows=BATCH_ROWS):
+    """Parquet version of a patient file, converting a CSV on first use (Parquet input is returned as is)."""
+    if _is_parquet(path):
+        return path
+    dest = parquet_cache_path(path, cache_dir)
+    if not os.path.exists(dest):
+        convert_to_parquet(path, dest, batch_rows)
+    return dest
+
+
+def read_table(path, columns=None):
+    """Whole file as one compact DataFrame, through the Parquet cache."""
+    return pq.read_table(cached_parquet(path), columns=columns).to_pandas()
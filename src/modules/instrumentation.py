@@ -0,0 +1,368 @@
+"""
+Timers, counters and histograms for the triage, allocation, scheduling
+and summary hot paths, plus an optional profiler hook per stage.
+
+Instrumentation is off unless HOSPITAL_METRICS=1 is set or enable() is
+called. While it is off every call returns after one flag check, and hot
+loops only ever keep plain local counters that are reported once per
+call, so the cost is a few hundred nanoseconds per stage call:
+
+    from modules import instrumentation
+    instrumentation.enable()
+    with instrumentation.capture() as run:        # metrics of this run only
+        pipeline.run_pipeline(df)
+    print(instrumentation.prometheus_text(run))   # or to_json(run)
+
+Everything recorded also goes to the process-wide REGISTRY, which
+write_prometheus() can dump for a textfile collector.
+
+Profiling is independent of the metrics switch: set_profiler("cprofile")
+(or "pyinstrument", if installed) or HOSPITAL_PROFILE=cprofile writes
+one profile per stage() block to PROFILE_DIR.
+"""
+
+import bisect
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("HOSPITAL_METRICS", "").lower() not in ("", "0", "false")
+
+PROFILE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "profiles"))
+PREFIX = "hospital_"
+
+# seconds, for stage and request latencies
+TIME_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def enable(on=True):
+    """Switch metric collection on or off for the whole process."""
+    global ENABLED
+    ENABLED = bool(on)
+
+
+def enabled():
+    return ENABLED
+
+
+class Histogram:
+    """Bucketed observations (Prometheus-style upper bounds, +Inf implied)."""
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (max for the +Inf bucket)."""
+        if self.count == 0:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry:
+    """
+    A set of named counters and histograms; names may carry labels.
+
+    Args:
+        parent: registry that receives every update as well (REGISTRY for
+            the per-run registries of capture())
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    def count(self, name, value, labels=()):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.parent is not None:
+            self.parent.count(name, value, labels)
+
+    def observe(self, name, value, labels=(), buckets=TIME_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+        if self.parent is not None:
+            self.parent.observe(name, value, labels, buckets)
+
+    def __bool__(self):
+        return bool(self.counters or self.histograms)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Plain-data copy: {"counters": [...], "histograms": [...]}, sorted by name."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                histograms.append({
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                    "min": h.min if h.count else None, "max": h.max if h.count else None,
+                    "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                })
+        return {"counters": counters, "histograms": histograms}
+
+
+REGISTRY = Registry()
+_current = contextvars.ContextVar("instrumentation_registry", default=REGISTRY)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v).lower() if isinstance(v, bool) else str(v)) for k, v in labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Add value to counter name (no-op while disabled)."""
+    if ENABLED:
+        _current.get().count(name, value, _labels(labels))
+
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    """Record one observation in histogram name (no-op while disabled)."""
+    if ENABLED:
+        _current.get().observe(name, value, _labels(labels), buckets)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            _current.get().observe(f"{self.name}_seconds", time.perf_counter() - self.started, _labels(self.labels))
+        return False
+
+
+def timer(name, **labels):
+    """Context manager recording its duration in histogram <name>_seconds."""
+    return _Timer(name, labels) if ENABLED else _NULL_TIMER
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Timer(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------------- Runs ----------------------
+
+class capture:
+    """
+    Context manager collecting the metrics recorded inside it (in this
+    thread and in tasks started from it) into a fresh Registry, which
+    it returns. Updates still reach REGISTRY.
+    """
+
+    def __enter__(self):
+        self.registry = Registry(parent=REGISTRY)
+        self._token = _current.set(self.registry)
+        return self.registry
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+def begin_run():
+    """Start a per-run Registry without a with block (e.g. at the top of a Streamlit script run)."""
+    registry = Registry(parent=REGISTRY)
+    _current.set(registry)
+    return registry
+
+
+# ---------------------- Profiling ----------------------
+
+_profiler = {"kind": os.environ.get("HOSPITAL_PROFILE") or None, "stages": None, "out_dir": PROFILE_DIR}
+_profiling = threading.local()
+
+
+def set_profiler(kind=None, stages=None, out_dir=PROFILE_DIR):
+    """
+    Profile stage() blocks.
+
+    Args:
+        kind: "cprofile", "pyinstrument" or None to stop profiling
+        stages: stage names to profile, None for all
+        out_dir: where <stage>-<timestamp>.prof / .html files are written
+    """
+    if kind not in (None, "cprofile", "pyinstrument"):
+        raise ValueError(f"Unknown profiler: {kind}")
+    if kind == "pyinstrument":
+        import pyinstrument  # noqa: F401  fail now rather than in the first stage
+    _profiler.update(kind=kind, stages=None if stages is None else set(stages), out_dir=out_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def _pyinstrument_profiler():
+    from pyinstrument import Profiler
+    return Profiler
+
+
+class stage:
+    """
+    Time a pipeline stage (histogram stage_seconds{stage=name}) and run
+    the configured profiler around it. Nested stages are timed but only
+    the outermost one is profiled. Works as a with block or a decorator.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+        self._profile = None
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        kind, stages = _profiler["kind"], _profiler["stages"]
+        if kind and (stages is None or self.name in stages) and not getattr(_profiling, "active", False):
+            _profiling.active = True
+            self._profile = cProfile.Profile() if kind == "cprofile" else _pyinstrument_profiler()()
+            self._profile.enable() if kind == "cprofile" else self._profile.start()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        if self._profile is not None:
+            _profiling.active = False
+            os.makedirs(_profiler["out_dir"], exist_ok=True)
+            base = os.path.join(_profiler["out_dir"], f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+            if isinstance(self._profile, cProfile.Profile):
+                self._profile.disable()
+                self.path = base + ".prof"
+                self._profile.dump_stats(self.path)
+            else:
+                self._profile.stop()
+                self.path = base + ".html"
+                with open(self.path, "w", encoding="utf-8") as fh:
+                    fh.write(self._profile.output_html())
+            self._profile = None
+        if ENABLED:
+            _current.get().observe("stage_seconds", elapsed, (("stage", self.name),))
+        return False
+
+
+# ---------------------- Export ----------------------
+
+def snapshot(registry=None):
+    return (registry or REGISTRY).snapshot()
+
+
+def to_json(registry=None, path=None):
+    """Snapshot as JSON text, also written to path when given."""
+    text = json.dumps(dict(snapshot(registry), created=time.time()), indent=2)
+    if path:
+        _write_text(path, text)
+    return text
+
+
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def prometheus_text(registry=None):
+    """Prometheus text exposition format (counters and cumulative histograms)."""
+    snap = snapshot(registry)
+    lines, typed = [], set()
+    for c in snap["counters"]:
+        name = PREFIX + c["name"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_label_text(c['labels'])} {c['value']}")
+    for h in snap["histograms"]:
+        name = PREFIX + h["name"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, n in h["buckets"].items():
+            cumulative += n
+            lines.append(f"{name}_bucket{_label_text(h['labels'], ('le', bound))} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(h['labels'])} {h['sum']}")
+        lines.append(f"{name}_count{_label_text(h['labels'])} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, registry=None):
+    """Write prometheus_text atomically (safe for a node_exporter textfile collector)."""
+    _write_text(path, prometheus_text(registry))
+
+
+def write_metrics(path, registry=None):
+    """Prometheus text for .prom / .txt paths, JSON otherwise."""
+    if os.path.splitext(path)[1] in (".prom", ".txt"):
+        write_prometheus(path, registry)
+    else:
+        to_json(registry, path)
+
+
+def _write_text(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,314 @@
+"""
+Compact columnar store of triaged patients with a severity index.
+
+Bed allocation and surgery scheduling take patients most severe first.
+Handed a list of dicts they sort all of it on every call, and the dicts
+themselves cost several hundred bytes per patient. A PatientStore keeps
+the columns those steps read in one NumPy structured array (about 22
+bytes per patient at 1M patients, against about 390 for the dicts) and
+answers "the k most severe" from a severity index:
+
+- top_indices(k) is an argpartition-style selection, O(N) plus O(k log k)
+  to order the k selected rows;
+- the full descending order is computed once (stable argsort) and kept;
+  update_severity() repairs it in place instead of re-sorting.
+
+Ties keep input order, the same as sorted(..., reverse=True), so a store
+and the equivalent list of dicts give identical allocations and
+schedules. allocate_beds, build_schedule, compare_allocation_modes and
+BedAllocator.admit accept either; by_severity() is the shared entry point.
+
+    store = PatientStore.from_frame(triaged_df)
+    for p in store.top(10):
+        print(p.get("patient_id"), p.get("fuzzy_severity"))
+"""
+
+import heapq
+import sys
+
+import numpy as np
+import pandas as pd
+
+REQUIRED = ("patient_id", "fuzzy_severity")
+# stored as codes into PatientStore.categories (-1: missing)
+CATEGORICAL = ("recommended_bed_type", "diagnosis")
+# small non-negative integers (-1: missing)
+INTEGER = ("entrance", "duration_slots")
+
+# update_severity repairs the cached order for up to len(store) // REPAIR_DIVISOR
+# patients at once; larger updates drop it and the next query re-sorts
+REPAIR_DIVISOR = 64
+
+
+def _id_column(values):
+    """Patient ids as the narrowest plain array: int64, ASCII bytes, unicode, or object as a last resort."""
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        return values.astype(np.int64)
+    if values.dtype.kind in "SU":
+        return values
+    kind = pd.api.types.infer_dtype(values, skipna=False)
+    if kind == "integer":
+        return values.astype(np.int64)
+    if kind == "string":
+        try:
+            return values.astype(str).astype(np.bytes_)
+        except UnicodeEncodeError:
+            return values.astype(str)
+    return values.astype(object)
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int32
+
+
+_MISSING = object()
+
+
+class _Selection:
+    """
+    Rows of a PatientStore handed out as PatientRecords. Each column is
+    decoded to a Python list for all the rows at once, on first access.
+    """
+
+    __slots__ = ("store", "indices", "values")
+
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = indices
+        self.values = {}
+
+    def decode(self, key):
+        values = self.store.decode(key, self.indices) if key in self.store.columns else ()
+        self.values[key] = values
+        return values
+
+
+class PatientRecord:
+    """
+    Read-only view of one patient of a PatientStore, usable wherever a
+    patient dict is read: get(), [], in, keys() and dict(record).
+    """
+
+    __slots__ = ("rows", "pos")
+
+    def __init__(self, rows, pos):
+        self.rows = rows
+        self.pos = pos
+
+    @property
+    def index(self):
+        """Row of the patient in the store."""
+        return int(self.rows.indices[self.pos])
+
+    def get(self, key, default=None):
+        values = self.rows.values.get(key)
+        if values is None:
+            values = self.rows.decode(key)
+        value = values[self.pos] if values else _MISSING
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        return [key for key in self.rows.store.columns if key in self]
+
+    def __repr__(self):
+        return f"PatientRecord({dict(self)!r})"
+
+
+class PatientStore:
+    """
+    Patients as one structured array, data[i] being patient i.
+
+    Columns: patient_id, fuzzy_severity (float64), and whichever of
+    CATEGORICAL / INTEGER the input has. categories[col] holds the values
+    of a categorical column; records() decode codes and missing values
+    back to what a patient dict would hold.
+    """
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns: dict of column name -> array-like with one value per
+                patient; needs patient_id and fuzzy_severity (missing
+                severities count as 0), other keys than CATEGORICAL /
+                INTEGER are ignored
+        """
+        missing = [c for c in REQUIRED if c not in columns]
+        if missing:
+            raise ValueError(f"PatientStore needs columns {missing}")
+        arrays = {
+            "patient_id": _id_column(columns["patient_id"]),
+            "fuzzy_severity": np.asarray(pd.to_numeric(pd.Series(columns["fuzzy_severity"]), errors="coerce")
+                                         .fillna(0), dtype=np.float64),
+        }
+        self.categories = {}
+        for col in CATEGORICAL:
+            if col in columns:
+                cat = pd.Categorical(pd.Series(columns[col], dtype=object))
+                self.categories[col] = np.asarray(cat.categories, dtype=object)
+                arrays[col] = cat.codes.astype(_code_dtype(len(cat.categories)))
+        for col in INTEGER:
+            if col in columns:
+                values = pd.to_numeric(pd.Series(columns[col]), errors="coerce").fillna(-1).to_numpy()
+                arrays[col] = values.astype(np.int32)
+
+        n = len(arrays["patient_id"])
+        if any(len(a) != n for a in arrays.values()):
+            raise ValueError("PatientStore columns must have the same length")
+        self.data = np.empty(n, dtype=[(name, a.dtype) for name, a in arrays.items()])
+        for name, a in arrays.items():
+            self.data[name] = a
+        self.columns = tuple(arrays)
+        self._fields = {name: self.data[name] for name in self.columns}  # field views, made once
+        self._order = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """Store of a DataFrame's rows (in row order)."""
+        return cls({c: df[c].to_numpy() for c in df.columns})
+
+    @classmethod
+    def from_records(cls, patients):
+        """Store of a list of patient dicts (in list order)."""
+        return cls.from_frame(pd.DataFrame.from_records(list(patients)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.records(np.arange(len(self))))
+
+    def __getitem__(self, i):
+        return self.records([i])[0]
+
+    @property
+    def severity(self):
+        return self.data["fuzzy_severity"]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the store: the array, the cached order and the category values."""
+        size = self.data.nbytes + (0 if self._order is None else self._order.nbytes)
+        if self.data.dtype["patient_id"] == object:
+            size += sum(sys.getsizeof(v) for v in self.data["patient_id"])
+        return size + sum(sys.getsizeof(v) for cats in self.categories.values() for v in cats)
+
+    def decode(self, key, indices):
+        """Column key at the given rows as a list of Python values, _MISSING where missing."""
+        values = self._fields[key][indices]
+        if key in self.categories:
+            # code -1 picks the appended _MISSING
+            return np.append(self.categories[key], _MISSING)[values].tolist()
+        if key in INTEGER:
+            return np.where(values < 0, _MISSING, values.astype(object)).tolist()
+        if values.dtype.kind == "S":
+            return np.char.decode(values, "ascii").tolist()
+        return values.tolist()
+
+    def records(self, indices):
+        """PatientRecords of the rows in indices, in that order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        rows = _Selection(self, indices)
+        return [PatientRecord(rows, pos) for pos in range(len(indices))]
+
+    def to_frame(self):
+        """The store as a DataFrame with the original values."""
+        frame = {}
+        for col in self.columns:
+            values = self.data[col]
+            if col in self.categories:
+                values = pd.Categorical.from_codes(values, self.categories[col])
+            elif col == "patient_id" and values.dtype.kind == "S":
+                values = np.char.decode(values, "ascii").astype(object)
+            elif col in INTEGER:
+                values = pd.array(np.where(values < 0, pd.NA, values), dtype="Int64")
+            frame[col] = values
+        return pd.DataFrame(frame)
+
+    # ---------------------- Severity index ----------------------
+
+    def order(self):
+        """Row indices by descending severity (ties in row order), computed once and kept."""
+        if self._order is None:
+            order = np.argsort(-self.severity, kind="stable")
+            self._order = order.astype(np.int32) if len(order) < np.iinfo(np.int32).max else order
+        return self._order
+
+    def top_indices(self, k=None):
+        """
+        Row indices of the k most severe patients, most severe first (all
+        of them for k=None). Without a cached order this is a partition
+        around the k-th largest severity, O(N + k log k); ties at the
+        boundary go to the earlier rows, as a stable sort would.
+        """
+        n = len(self)
+        if k is not None and k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k is None or k >= n or self._order is not None:
+            return self.order()[:k]
+        neg = -self.severity
+        kth = np.partition(neg, k - 1)[k - 1]
+        above = np.flatnonzero(neg < kth)
+        ties = np.flatnonzero(neg == kth)[:k - len(above)]
+        chosen = np.concatenate([above, ties])
+        return chosen[np.lexsort((chosen, neg[chosen]))]
+
+    def top(self, k=None):
+        """PatientRecords of the k most severe patients, most severe first."""
+        return self.records(self.top_indices(k))
+
+    def update_severity(self, indices, values):
+        """
+        Set new severities for the rows in indices (unique). A cached order
+        is repaired by moving just those rows, O(N + m log N) for m rows,
+        unless m is a large share of the store.
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), indices.shape)
+        order, self._order = self._order, None
+        self.data["fuzzy_severity"][indices] = values
+        if order is None or len(indices) * REPAIR_DIVISOR > len(self):
+            return
+        order = order[~np.isin(order, indices)]
+        keys = -self.severity[order]
+        moved = indices[np.lexsort((indices, -values))]
+        moved_keys = -self.severity[moved]
+        left = np.searchsorted(keys, moved_keys, "left")
+        right = np.searchsorted(keys, moved_keys, "right")
+        # within a run of equal severities rows stay in index order
+        at = [lo + np.searchsorted(order[lo:hi], i) for lo, hi, i in zip(left, right, moved)]
+        self._order = np.insert(order, at, moved)
+
+
+def by_severity(patients, k=None):
+    """
+    Patients most severe first, only the k most severe when k is given;
+    ties keep input order.
+
+    Args:
+        patients: PatientStore (answered from its index, as PatientRecords)
+            or a list of patient dicts (sorted, or heapq.nlargest for k:
+            O(N log k))
+        k: number of patients wanted, None for all
+
+    Returns:
+        list of patients
+    """
+    if isinstance(patients, PatientStore):
+        return patients.top(k)
+    key = lambda p: p.get("fuzzy_severity", 0)
+    if k is None:
+        return sorted(patients, key=key, reverse=True)
+    return heapq.nlargest(k, patients, key=key)
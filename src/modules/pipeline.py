@@ -0,0 +1,679 @@
+"""
+Headless triage → bed allocation → surgery scheduling → summary pipeline.
+
+Every stage is a plain function with an explicit input and a small
+result object, so the Streamlit app, the batch CLI and the benchmarks
+drive the same code and each stage can be timed on its own:
+
+    triage_stage(df, config)                 -> TriageResult
+    allocation_stage(triage, config)         -> AllocationResult
+    schedule_stage(triage, config)           -> ScheduleResult
+    summary_stage(allocation, schedule, ...) -> SummaryResult
+
+Batch usage (from src/):
+
+    python -m modules.pipeline ../data/hospital_patients_dataset.csv --output-dir out/
+    python -m modules.pipeline big.parquet --stages triage --fuzzy lut --output-dir out/
+    python -m modules.pipeline huge.csv --stream --fuzzy lut --output-dir out/
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import a_star_bed_allocation as bed_alloc
+from . import csp_scheduler as csp
+from . import fuzzy_triage
+from . import instrumentation
+from .patient_store import PatientStore
+
+STAGES = ("triage", "allocate", "schedule", "summarize")
+DEFAULT_STAGES = ("triage", "allocate", "schedule")
+
+# columns carried from the input into the triage result, when present
+PASSTHROUGH_COLUMNS = ("recommended_bed_type", "diagnosis")
+
+
+class PipelineConfig:
+    """
+    Options for all stages.
+
+    Attributes:
+        fuzzy: "exact" (vectorized inference), "lut" (lookup table) or
+            "surrogate" (learned defuzzifier with exact fallback)
+        chunk_size: rows per fuzzy inference block
+        ward_map: WardMap, path to a ward map file, or None for the square grid
+        grid_size: square grid size when there is no ward map
+        alloc_mode: "greedy" or "optimal"
+        compare_modes: also report objective / time for every allocation mode
+        schedule_engine: "propagate", "portfolio" or "reference"
+        max_cases: most severe cases to schedule, None for all, or "auto"
+            for as many as the resources can hold (csp.max_schedulable)
+        calendar: ResourceCalendar, a calendar directory, or None
+        deterministic: temperature 0 summaries, cached across restarts
+        index: RetrievalIndex for summary context, or None
+        cache: StageCache, a cache directory, or None to always recompute
+    """
+
+    def __init__(self, fuzzy="exact", chunk_size=fuzzy_triage.BATCH_CHUNK_SIZE, ward_map=None, grid_size=6,
+                 alloc_mode="greedy", compare_modes=False, schedule_engine="propagate", max_cases=None,
+                 calendar=None, deterministic=False, index=None, cache=None):
+        self.fuzzy = fuzzy
+        self.chunk_size = chunk_size
+        self.ward_map = ward_map
+        self.grid_size = grid_size
+        self.alloc_mode = alloc_mode
+        self.compare_modes = compare_modes
+        self.schedule_engine = schedule_engine
+        self.max_cases = max_cases
+        self.calendar = calendar
+        self.deterministic = deterministic
+        self.index = index
+        self.cache = cache
+
+    def resolve_ward_map(self):
+        if isinstance(self.ward_map, str):
+            from .ward_map import WardMap
+            self.ward_map = WardMap.load(self.ward_map).build_index()
+        return self.ward_map
+
+    def resolve_calendar(self):
+        if isinstance(self.calendar, str):
+            from .resource_calendar import ResourceCalendar
+            self.calendar = ResourceCalendar.load_dir(self.calendar)
+        return self.calendar
+
+    def resolve_cache(self):
+        if isinstance(self.cache, str):
+            from .stage_cache import StageCache
+            self.cache = StageCache(self.cache)
+        return self.cache
+
+
+class TriageResult:
+    """
+    Attributes:
+        patients: DataFrame with patient_id, the vital columns, fuzzy_severity
+            and the PASSTHROUGH_COLUMNS found in the input (a projection, the
+            input frame is not copied or modified), None after run_streaming
+        elapsed_s: stage wall time
+        rows: patients triaged
+        mean_severity: mean fuzzy_severity
+        cache_stats: StageCache hits / carried / misses / hit_rate, or None
+    """
+
+    def __init__(self, patients, elapsed_s, rows=None, mean_severity=None, cache_stats=None):
+        self.patients = patients
+        self.elapsed_s = elapsed_s
+        self.cache_stats = cache_stats
+        self.rows = len(patients) if rows is None else rows
+        if mean_severity is None:
+            mean_severity = float(np.mean(patients["fuzzy_severity"])) if self.rows else float("nan")
+        self.mean_severity = mean_severity
+
+
+class AllocationResult:
+    """
+    Attributes:
+        allocations: allocate_beds records
+        ward_map: the WardMap used (None for the square grid)
+        mode_report: compare_allocation_modes output, or None
+        total_patients: patients considered
+        elapsed_s: stage wall time
+        cached: True when read from the StageCache
+    """
+
+    def __init__(self, allocations, ward_map, mode_report, total_patients, elapsed_s, cached=False):
+        self.allocations = allocations
+        self.ward_map = ward_map
+        self.mode_report = mode_report
+        self.total_patients = total_patients
+        self.elapsed_s = elapsed_s
+        self.cached = cached
+
+
+class ScheduleResult:
+    """
+    Attributes:
+        schedule: build_schedule records ([{"Error": ...}] when infeasible)
+        calendar: the ResourceCalendar used, or None
+        elapsed_s: stage wall time
+    """
+
+    def __init__(self, schedule, calendar, elapsed_s):
+        self.schedule = schedule
+        self.calendar = calendar
+        self.elapsed_s = elapsed_s
+
+    @property
+    def feasible(self):
+        return bool(self.schedule) and "Error" not in self.schedule[0]
+
+
+class SummaryResult:
+    """
+    Attributes:
+        summaries: {"bed" / "schedule" / "combined": text}
+        timings: per-summary ttft_s / total_s from AsyncRAGSummarizer
+        elapsed_s: stage wall time
+    """
+
+    def __init__(self, summaries, timings, elapsed_s):
+        self.summaries = summaries
+        self.timings = timings
+        self.elapsed_s = elapsed_s
+
+
+# ---------------------- Stages ----------------------
+
+def load_patients(path, columns=None):
+    """Read a CSV or Parquet patient file (optionally only some columns)."""
+    if os.path.splitext(path)[1] in (".parquet", ".pq"):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+_fuzzy_systems = {}
+
+
+def fuzzy_system(kind="exact"):
+    """Compiled fuzzy system (or its lookup table / learned surrogate), built once per process."""
+    if kind not in _fuzzy_systems:
+        compiled = fuzzy_triage.cached_fuzzy_system()
+        if kind == "lut":
+            _fuzzy_systems[kind] = fuzzy_triage.build_severity_lut(compiled)
+        elif kind == "surrogate":
+            _fuzzy_systems[kind] = fuzzy_triage.build_severity_surrogate(compiled)
+        elif kind == "exact":
+            _fuzzy_systems[kind] = compiled
+        else:
+            raise ValueError(f"Unknown fuzzy mode: {kind}")
+    return _fuzzy_systems[kind]
+
+
+def _score(df, config):
+    """Fuzzy severity for a frame, through config.cache when set; returns (severity, cache stats or None)."""
+    system = fuzzy_system(config.fuzzy)
+    cache = config.resolve_cache()
+    if cache is None:
+        return fuzzy_triage.compute_severity_batch(df, system, chunk_size=config.chunk_size), None
+    severity = cache.severity(df, system, chunk_size=config.chunk_size)
+    return severity, cache.last_stats
+
+
+@instrumentation.stage("triage")
+def triage_stage(df, config=None):
+    """
+    Fuzzy severity for every row.
+
+    Args:
+        df: patient DataFrame with the vital sign columns
+        config: PipelineConfig (fuzzy, chunk_size, cache)
+
+    Returns:
+        TriageResult
+    """
+    config = config or PipelineConfig()
+    started = time.perf_counter()
+    missing = [c for c in fuzzy_triage.VITAL_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    severity, cache_stats = _score(df, config)
+    columns = {"patient_id": df["patient_id"] if "patient_id" in df.columns else pd.RangeIndex(1, len(df) + 1)}
+    columns.update({c: df[c] for c in fuzzy_triage.VITAL_COLUMNS})
+    columns["fuzzy_severity"] = severity
+    columns.update({c: df[c] for c in PASSTHROUGH_COLUMNS if c in df.columns})
+    patients = pd.DataFrame(columns, index=df.index, copy=False)
+    return TriageResult(patients, time.perf_counter() - started, cache_stats=cache_stats)
+
+
+@instrumentation.stage("allocate")
+def allocation_stage(triage, config=None):
+    """
+    Bed allocation for the triaged patients.
+
+    Args:
+        triage: TriageResult (or a DataFrame with patient_id, fuzzy_severity)
+        config: PipelineConfig (ward_map, grid_size, alloc_mode, compare_modes, cache)
+
+    Returns:
+        AllocationResult
+    """
+    config = config or PipelineConfig()
+    started = time.perf_counter()
+    patients_df = triage.patients if isinstance(triage, TriageResult) else triage
+    ward_map = config.resolve_ward_map()
+    cols = ["patient_id", "fuzzy_severity"]
+    if ward_map is not None and "recommended_bed_type" in patients_df.columns:
+        cols.append("recommended_bed_type")
+
+    cache = config.resolve_cache()
+    if cache is not None:
+        key = _allocation_key(patients_df[cols], ward_map, config)
+        cached = cache.get_result("allocate", key)
+        if cached is not None and (cached["mode_report"] is not None or not config.compare_modes):
+            return AllocationResult(cached["allocations"], ward_map, cached["mode_report"] if config.compare_modes else None,
+                                    len(patients_df), time.perf_counter() - started, cached=True)
+
+    patients = PatientStore.from_frame(patients_df[cols])
+    allocations = bed_alloc.allocate_beds(patients, grid_size=config.grid_size, ward_map=ward_map, mode=config.alloc_mode)
+    mode_report = None
+    if config.compare_modes:
+        mode_report = bed_alloc.compare_allocation_modes(patients, grid_size=config.grid_size, ward_map=ward_map)
+    if cache is not None:
+        cache.set_result("allocate", key, {"allocations": allocations, "mode_report": mode_report})
+    return AllocationResult(allocations, ward_map, mode_report, len(patients), time.perf_counter() - started)
+
+
+def _allocation_key(patients_df, ward_map, config):
+    """Content key of the allocation inputs: patient rows (in order), ward map, grid size and mode."""
+    from .stage_cache import ward_map_fingerprint
+
+    h = hashlib.sha256(pd.util.hash_pandas_object(patients_df, index=False).to_numpy().tobytes())
+    h.update(f"{ward_map_fingerprint(ward_map)}|{config.grid_size}|{config.alloc_mode}".encode())
+    return h.hexdigest()
+
+
+@instrumentation.stage("schedule")
+def schedule_stage(triage, config=None):
+    """
+    Surgery schedule for the most severe patients.
+
+    Only the config.max_cases most severe rows are selected from the
+    frame (ties keep row order) and put into a PatientStore, so the
+    stage cost does not grow with the input size. With max_cases="auto"
+    that is the first case_capacity() rows, of which max_schedulable()
+    keeps as many as the resources can hold. A frame without
+    fuzzy_severity is scheduled in row order, every patient at severity 0.
+    Missing (NaN) severities rank as 0, as in PatientStore.
+
+    Args:
+        triage: TriageResult (or a DataFrame with patient_id, fuzzy_severity)
+        config: PipelineConfig (schedule_engine, max_cases, calendar)
+
+    Returns:
+        ScheduleResult
+    """
+    config = config or PipelineConfig()
+    started = time.perf_counter()
+    patients_df = triage.patients if isinstance(triage, TriageResult) else triage
+    calendar = config.resolve_calendar()
+    cols = [c for c in ("patient_id", "fuzzy_severity", "diagnosis") if c in patients_df.columns]
+    max_cases = config.max_cases
+    if max_cases == "auto":
+        max_cases = csp.case_capacity(calendar=calendar)
+    if "fuzzy_severity" in cols:
+        if max_cases is not None:
+            severity = pd.to_numeric(patients_df["fuzzy_severity"], errors="coerce").fillna(0)
+            patients_df = patients_df.iloc[severity.reset_index(drop=True).nlargest(int(max_cases), keep="first").index]
+        patients = PatientStore.from_frame(patients_df[cols])
+    else:
+        if max_cases is not None:
+            patients_df = patients_df.head(int(max_cases))
+        patients = patients_df[cols].to_dict(orient="records")
+    if config.max_cases == "auto":
+        max_cases = csp.max_schedulable(patients, calendar=calendar)
+
+    engine = config.schedule_engine
+    if calendar is not None and engine == "reference":
+        engine = "propagate"
+    schedule = csp.build_schedule(patients, max_cases=max_cases, engine=engine, calendar=calendar)
+    return ScheduleResult(schedule, calendar, time.perf_counter() - started)
+
+
+@instrumentation.stage("summarize")
+def summary_stage(allocation=None, schedule=None, config=None, summarizer=None, on_token=None):
+    """
+    LLM summaries of the results (needs network access / GROQ_API_KEY).
+
+    Args:
+        allocation: AllocationResult or None
+        schedule: ScheduleResult or None
+        config: PipelineConfig (deterministic, index)
+        summarizer: AsyncRAGSummarizer to use instead of a new one
+        on_token: streaming callback (kind, delta), called from the
+            summarizer's event loop thread
+
+    Returns:
+        SummaryResult
+    """
+    from .rag_summarizer import AsyncRAGSummarizer, run_summaries
+
+    config = config or PipelineConfig()
+    started = time.perf_counter()
+    summarizer = summarizer or AsyncRAGSummarizer(deterministic=config.deterministic, index=config.index)
+    summaries = run_summaries(
+        allocation.allocations if allocation is not None else None,
+        schedule.schedule if schedule is not None else None,
+        allocation.total_patients if allocation is not None else 0,
+        summarizer=summarizer, on_token=on_token,
+    )
+    if config.index is not None:
+        config.index.save()
+    return SummaryResult(summaries, dict(summarizer.timings), time.perf_counter() - started)
+
+
+def run_pipeline(df, config=None, stages=DEFAULT_STAGES):
+    """
+    Run the selected stages in order.
+
+    Returns:
+        dict: stage name -> result object, plus "timings" {stage: seconds}
+    """
+    config = config or PipelineConfig()
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    results = {"timings": {}}
+    triage = None
+    if "triage" in stages:
+        triage = results["triage"] = triage_stage(df, config)
+    source = triage if triage is not None else df
+    if "allocate" in stages:
+        results["allocate"] = allocation_stage(source, config)
+    if "schedule" in stages:
+        results["schedule"] = schedule_stage(source, config)
+    if "summarize" in stages:
+        results["summarize"] = summary_stage(results.get("allocate"), results.get("schedule"), config)
+    results["timings"] = {name: round(r.elapsed_s, 4) for name, r in results.items() if name != "timings"}
+    return results
+
+
+# ---------------------- Streaming ----------------------
+# For inputs larger than memory: batches flow from modules.ingest through
+# triage into bounded collectors, so memory is set by the batch size and
+# the number of beds / cases, not by the number of rows.
+
+class TopSeverity:
+    """
+    Running top-k rows by fuzzy_severity, per group, over a stream of batches.
+
+    Ties are broken by arrival order, like the stable severity sorts in
+    allocate_beds / build_schedule, so greedy allocation and scheduling
+    on the kept rows give the same result as on the whole input.
+
+    Args:
+        columns: columns to keep (missing ones are ignored)
+        limits: {group value: k}; default_limit applies to other groups
+        default_limit: k for groups not in limits (None: keep everything)
+        group_column: column to group by (None, or absent: one group)
+    """
+
+    def __init__(self, columns, limits=None, default_limit=None, group_column=None):
+        self.columns = list(columns)
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.group_column = group_column
+        self.kept = {}
+        self.present = None
+
+    def update(self, batch, offset):
+        """Merge one triaged batch; offset is the global row number of its first row."""
+        if self.present is None:
+            self.present = [c for c in self.columns if c in batch.columns]
+        frame = batch[self.present].reset_index(drop=True)
+        frame["_row"] = np.arange(offset, offset + len(frame))
+        if self.group_column in frame.columns:
+            key = frame[self.group_column].astype(object)
+            groups = {None: frame[key.isna()]}
+            groups.update({g: part for g, part in frame[key.notna()].groupby(key[key.notna()], sort=False)})
+        else:
+            groups = {None: frame}
+        for group, part in groups.items():
+            k = self.limits.get(group, self.default_limit)
+            if len(part) == 0 or k == 0:
+                continue
+            if group in self.kept:
+                part = pd.concat([self.kept[group], part], ignore_index=True)
+            if k is not None and len(part) > k:
+                part = part.iloc[np.lexsort((part["_row"].to_numpy(), -part["fuzzy_severity"].to_numpy()))[:k]]
+            self.kept[group] = part
+
+    def frame(self):
+        """Kept rows in arrival order."""
+        if not self.kept:
+            return pd.DataFrame(columns=self.present or self.columns)
+        return pd.concat(list(self.kept.values()), ignore_index=True).sort_values("_row").drop(columns="_row")
+
+
+def triage_batches(batches, config=None):
+    """
+    Generator stage: fuzzy severity for each incoming batch.
+
+    Yields DataFrames with patient_id, fuzzy_severity and the
+    PASSTHROUGH_COLUMNS present in the batch (vitals are dropped).
+    """
+    config = config or PipelineConfig()
+    offset = 0
+    for batch in batches:
+        out = pd.DataFrame({
+            "patient_id": batch["patient_id"] if "patient_id" in batch.columns
+            else pd.RangeIndex(offset + 1, offset + len(batch) + 1),
+            "fuzzy_severity": _score(batch, config)[0],
+        }, index=batch.index)
+        for c in PASSTHROUGH_COLUMNS:
+            if c in batch.columns:
+                out[c] = batch[c]
+        offset += len(batch)
+        yield out
+
+
+def _bed_limits(config):
+    """TopSeverity arguments for the allocation: one group per bed type, k = beds of that type."""
+    ward_map = config.resolve_ward_map()
+    if ward_map is None:
+        return {}, config.grid_size ** 2, None
+    types, counts = np.unique(np.asarray(ward_map.bed_types).astype(str), return_counts=True)
+    limits = dict(zip(types.tolist(), counts.tolist()))
+    limits[None] = len(ward_map.bed_types)  # untyped patients may take any bed
+    return limits, 0, "recommended_bed_type"  # types without beds never get one
+
+
+def _case_limit(config):
+    """
+    Rows the schedule collector keeps: config.max_cases, or with None /
+    "auto" one more than the resources could ever hold (beyond that, all
+    cases is infeasible either way and "auto" never picks more).
+    """
+    if config.max_cases is not None and config.max_cases != "auto":
+        return int(config.max_cases)
+    return csp.case_capacity(calendar=config.resolve_calendar()) + 1
+
+
+def run_streaming(path, config=None, stages=DEFAULT_STAGES, batch_rows=None, output_dir=None, use_cache=True):
+    """
+    One pass over a large CSV / Parquet file: triage every batch, keep
+    only the patients that can still win a bed or an operating slot, then
+    run allocation and scheduling on those.
+
+    Only patient_id, the vitals and the columns the later stages need are
+    decoded, and memory is bounded by batch_rows plus the bed / case
+    counts. Greedy allocation and the schedule match run_pipeline on the
+    whole file (with fuzzy="exact", severities equal up to float rounding
+    may swap order); allocation records only list the candidates, while
+    AllocationResult.total_patients is the full row count.
+
+    Args:
+        path: patient file (.csv or .parquet)
+        config: PipelineConfig
+        stages: subset of STAGES ("triage" always runs)
+        batch_rows: rows per batch, defaults to ingest.BATCH_ROWS
+        output_dir: if set, triaged rows are written to triage.parquet as they stream
+        use_cache: read CSV input through the Parquet cache (converted on first use)
+
+    Returns:
+        dict like run_pipeline; TriageResult.patients is None and its
+        rows / mean_severity attributes hold the totals
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from . import ingest
+    from .stage_cache import merge_stats
+
+    config = config or PipelineConfig()
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    batch_rows = batch_rows or ingest.BATCH_ROWS
+    started = time.perf_counter()
+    source = ingest.cached_parquet(path) if use_cache else path
+
+    columns = ["patient_id", *fuzzy_triage.VITAL_COLUMNS]
+    collectors = {}
+    if "allocate" in stages:
+        limits, default_limit, group = _bed_limits(config)
+        collectors["allocate"] = TopSeverity(["patient_id", "fuzzy_severity", "recommended_bed_type"],
+                                             limits, default_limit, group)
+        if group:
+            columns.append(group)
+    if "schedule" in stages:
+        collectors["schedule"] = TopSeverity(["patient_id", "fuzzy_severity", "diagnosis"],
+                                             default_limit=_case_limit(config))
+        if config.calendar is not None:
+            columns.append("diagnosis")
+
+    cache = config.resolve_cache()
+    writer = None
+    rows, severity_sum, cache_stats = 0, 0.0, None
+    try:
+        with instrumentation.stage("triage"):
+            for batch in triage_batches(ingest.read_batches(source, columns=columns, batch_rows=batch_rows), config):
+                if cache is not None:
+                    cache_stats = merge_stats(cache_stats, cache.last_stats)
+                for collector in collectors.values():
+                    collector.update(batch, rows)
+                rows += len(batch)
+                severity_sum += float(batch["fuzzy_severity"].sum())
+                if output_dir:
+                    table = pa.Table.from_pandas(batch, preserve_index=False)
+                    if writer is None:
+                        os.makedirs(output_dir, exist_ok=True)
+                        writer = pq.ParquetWriter(os.path.join(output_dir, "triage.parquet"), table.schema)
+                    writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    mean_severity = severity_sum / rows if rows else float("nan")
+    results = {"triage": TriageResult(None, time.perf_counter() - started, rows, mean_severity, cache_stats)}
+    if "allocate" in collectors:
+        allocation = allocation_stage(collectors["allocate"].frame(), config)
+        allocation.total_patients = rows
+        results["allocate"] = allocation
+    if "schedule" in collectors:
+        results["schedule"] = schedule_stage(collectors["schedule"].frame(), config)
+    if "summarize" in stages:
+        results["summarize"] = summary_stage(results.get("allocate"), results.get("schedule"), config)
+    results["timings"] = {name: round(r.elapsed_s, 4) for name, r in results.items()}
+    return results
+
+
+# ---------------------- CLI ----------------------
+
+def write_outputs(results, output_dir):
+    """
+    Write stage outputs (triage.parquet, allocations.csv, schedule.csv,
+    summaries.json, timings.json). run_streaming writes triage.parquet
+    itself while it reads the input.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if "triage" in results and results["triage"].patients is not None:
+        results["triage"].patients.to_parquet(os.path.join(output_dir, "triage.parquet"), index=False)
+    if "allocate" in results:
+        pd.DataFrame(results["allocate"].allocations).to_csv(os.path.join(output_dir, "allocations.csv"), index=False)
+    if "schedule" in results:
+        pd.DataFrame(results["schedule"].schedule).to_csv(os.path.join(output_dir, "schedule.csv"), index=False)
+    if "summarize" in results:
+        with open(os.path.join(output_dir, "summaries.json"), "w", encoding="utf-8") as fh:
+            json.dump(results["summarize"].summaries, fh, indent=2)
+    with open(os.path.join(output_dir, "timings.json"), "w", encoding="utf-8") as fh:
+        json.dump(results["timings"], fh, indent=2)
+
+
+def _max_cases(value):
+    if value in ("all", "auto"):
+        return None if value == "all" else value
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.pipeline",
+                                     description="Batch triage, bed allocation and surgery scheduling.")
+    parser.add_argument("input", help="patient CSV or Parquet file")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--output-dir", help="write stage outputs here")
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="exact")
+    parser.add_argument("--ward-map", help="ward floor plan (.txt / .npz)")
+    parser.add_argument("--grid-size", type=int, default=6)
+    parser.add_argument("--alloc-mode", choices=["greedy", "optimal"], default="greedy")
+    parser.add_argument("--schedule-engine", choices=["propagate", "portfolio", "reference"], default="propagate")
+    parser.add_argument("--max-cases", type=_max_cases, default="auto",
+                        help="most severe cases to schedule: a number, 'all', or 'auto' (default: as many "
+                             "as the doctors, rooms and slots can hold)")
+    parser.add_argument("--calendar", help="resource calendar directory")
+    parser.add_argument("--deterministic", action="store_true", help="temperature 0 summaries")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the input in batches (for files larger than memory)")
+    parser.add_argument("--batch-rows", type=int, help="rows per batch with --stream")
+    parser.add_argument("--no-cache", action="store_true", help="with --stream, do not convert CSV input to Parquet")
+    parser.add_argument("--stage-cache", nargs="?", const="", metavar="DIR",
+                        help="reuse severities / allocations from earlier runs (default dir: .cache/stage_cache)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="collect timers / counters and write them here (.prom: Prometheus text, else JSON)")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="write one profile per stage")
+    parser.add_argument("--profile-dir", default=instrumentation.PROFILE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        instrumentation.enable()
+    if args.profile:
+        instrumentation.set_profiler(args.profile, out_dir=args.profile_dir)
+
+    config = PipelineConfig(fuzzy=args.fuzzy, ward_map=args.ward_map, grid_size=args.grid_size,
+                            alloc_mode=args.alloc_mode, schedule_engine=args.schedule_engine,
+                            max_cases=args.max_cases, calendar=args.calendar, deterministic=args.deterministic)
+    if args.stage_cache is not None:
+        from .stage_cache import STAGE_CACHE_DIR
+        config.cache = args.stage_cache or STAGE_CACHE_DIR
+    stages = tuple(s.strip() for s in args.stages.split(",") if s.strip())
+
+    with instrumentation.capture() as metrics:
+        if args.stream:
+            results = run_streaming(args.input, config, stages, batch_rows=args.batch_rows,
+                                    output_dir=args.output_dir, use_cache=not args.no_cache)
+        else:
+            started = time.perf_counter()
+            df = load_patients(args.input)
+            load_s = time.perf_counter() - started
+            results = run_pipeline(df, config, stages)
+            results["timings"] = dict({"load": round(load_s, 4)}, **results["timings"])
+    if args.metrics:
+        instrumentation.write_metrics(args.metrics, metrics)
+
+    if args.output_dir:
+        write_outputs(results, args.output_dir)
+    report = {"timings_s": results["timings"]}
+    if "triage" in results:
+        report["rows"] = results["triage"].rows
+        report["mean_severity"] = round(results["triage"].mean_severity, 4)
+        if results["triage"].cache_stats is not None:
+            report["triage_cache"] = results["triage"].cache_stats
+    if "allocate" in results:
+        report["beds_allocated"] = sum(a.get("Assigned_Bed") != "None" for a in results["allocate"].allocations)
+        if config.cache is not None:
+            report["allocation_cached"] = results["allocate"].cached
+    if "schedule" in results:
+        report["surgeries_scheduled"] = len(results["schedule"].schedule) if results["schedule"].feasible else 0
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
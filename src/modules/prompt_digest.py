@@ -0,0 +1,206 @@
+"""
+Statistical digests of allocation and schedule results for LLM prompts.
+
+Instead of pasting result rows into the prompt, each result set is
+reduced with pandas / NumPy to a few fixed-size aggregates (severity
+histogram, occupancy by bed type, distance-cost percentiles, surgeon and
+room utilisation). Sections are then packed into a token budget by
+priority, so prompt size stays the same for 500 or 500k patients.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .retrieval_index import estimate_tokens
+
+SEVERITY_BINS = np.array([0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
+DISTANCE_PERCENTILES = (50, 90, 99)
+TOP_ROWS = 5
+DIGEST_TOKEN_BUDGET = 600
+
+# lower number = packed first
+PRIORITY_TOTALS = 0
+PRIORITY_SEVERITY = 1
+PRIORITY_RESOURCES = 2
+PRIORITY_DISTANCE = 3
+PRIORITY_EXAMPLES = 4
+
+
+def _frame(data):
+    if data is None:
+        return pd.DataFrame()
+    if isinstance(data, pd.DataFrame):
+        return data
+    return pd.DataFrame(list(data))
+
+
+def _minutes(labels):
+    """"HH:MM" labels to minutes since midnight (NaN when not parseable)."""
+    parts = labels.astype(str).str.extract(r"^(\d{1,2}):(\d{2})$").astype(float)
+    return parts[0] * 60 + parts[1]
+
+
+def severity_histogram(severity, bins=SEVERITY_BINS):
+    """One line per severity band: count and share."""
+    severity = np.asarray(severity, dtype=np.float64)
+    severity = severity[~np.isnan(severity)]
+    counts, edges = np.histogram(np.clip(severity, bins[0], bins[-1]), bins=bins)
+    total = max(len(severity), 1)
+    return [f"{edges[i]:.1f}-{edges[i + 1]:.1f}: {c} ({c / total:.0%})" for i, c in enumerate(counts)]
+
+
+def allocation_digest(allocation_data, total_patients=None):
+    """
+    Digest sections for bed allocation results.
+
+    Args:
+        allocation_data: allocate_beds records (list of dicts or DataFrame)
+        total_patients: patients considered, defaults to the record count
+
+    Returns:
+        list of (priority, title, lines)
+    """
+    df = _frame(allocation_data)
+    n = len(df)
+    if n == 0:
+        return [(PRIORITY_TOTALS, "Bed allocation", ["No patients were allocated."])]
+    severity = pd.to_numeric(df.get("Severity", pd.Series(np.nan, index=df.index)), errors="coerce").to_numpy()
+    cost = pd.to_numeric(df.get("Distance_Cost", pd.Series(np.nan, index=df.index)), errors="coerce").to_numpy(dtype=np.float64)
+    assigned = df.get("Assigned_Bed", pd.Series("None", index=df.index)).astype(str).ne("None").to_numpy()
+    reachable = np.isfinite(cost) & assigned
+
+    # streamed allocations only carry the patients that competed for a bed,
+    # so the waiting count comes from the total rather than the records
+    total = total_patients if total_patients is not None else n
+    sections = [(PRIORITY_TOTALS, "Bed allocation totals", [
+        f"Patients: {total}",
+        f"Beds allocated: {int(assigned.sum())}",
+        f"Without a bed: {total - int(assigned.sum())}",
+        f"Mean severity: {np.nanmean(severity):.2f}" if np.isfinite(severity).any() else "Mean severity: n/a",
+    ])]
+
+    sections.append((PRIORITY_SEVERITY, "Severity histogram (band: patients)", severity_histogram(severity)))
+
+    if "Bed_Type" in df:
+        types = df["Bed_Type"].fillna("Unknown").astype(str)
+        table = pd.crosstab(types, np.where(assigned, "allocated", "waiting"))
+        lines = [f"{t}: {int(row.get('allocated', 0))} allocated, {int(row.get('waiting', 0))} waiting"
+                 for t, row in table.iterrows()]
+        sections.append((PRIORITY_RESOURCES, "Bed occupancy by type", lines))
+
+    if reachable.any():
+        pct = np.percentile(cost[reachable], DISTANCE_PERCENTILES)
+        lines = [f"p{p}: {v:.1f}" for p, v in zip(DISTANCE_PERCENTILES, pct)]
+        lines.append(f"max: {cost[reachable].max():.1f}")
+        sections.append((PRIORITY_DISTANCE, "Distance cost from entrance (percentiles)", lines))
+
+    top = np.argsort(-np.nan_to_num(severity, nan=-1.0), kind="stable")[:TOP_ROWS]
+    rows = df.iloc[top]
+    lines = [f"Patient {r.get('Patient', 'Unknown')} (severity {r.get('Severity', 0):.2f}) → "
+             f"{r.get('Assigned_Bed', 'N/A')}, distance {r.get('Distance_Cost', 'N/A')}"
+             for r in rows.to_dict(orient="records")]
+    sections.append((PRIORITY_EXAMPLES, "Highest-severity patients", lines))
+    return sections
+
+
+def _utilization(df, key, busy, day_minutes):
+    counts = df.groupby(key).size()
+    lines = []
+    if busy is not None:
+        minutes = busy.groupby(df[key]).sum()
+        for name in counts.sort_values(ascending=False).index:
+            share = f", {minutes[name] / day_minutes:.0%} of the day" if day_minutes else ""
+            lines.append(f"{name}: {counts[name]} cases, {minutes[name]:.0f} min{share}")
+    else:
+        for name, c in counts.sort_values(ascending=False).items():
+            lines.append(f"{name}: {c} cases ({c / len(df):.0%})")
+    return lines
+
+
+def schedule_digest(schedule_data):
+    """
+    Digest sections for surgery schedules (build_schedule records).
+
+    Utilisation is in minutes when entries carry an "End" time (calendar
+    mode), otherwise in cases.
+
+    Returns:
+        list of (priority, title, lines)
+    """
+    df = _frame(schedule_data)
+    if len(df) == 0 or "Error" in df.columns:
+        return [(PRIORITY_TOTALS, "Surgery scheduling", ["No feasible schedule."])]
+
+    severity = pd.to_numeric(df.get("Severity", pd.Series(np.nan, index=df.index)), errors="coerce").to_numpy()
+    start = _minutes(df["Time"]) if "Time" in df else pd.Series(np.nan, index=df.index)
+    busy = None
+    day_minutes = None
+    if "End" in df:
+        busy = (_minutes(df["End"]) - start).clip(lower=0)
+        if start.notna().any():
+            day_minutes = float(_minutes(df["End"]).max() - start.min())
+
+    totals = [f"Surgeries scheduled: {len(df)}"]
+    if "Doctor" in df:
+        totals.append(f"Surgeons used: {df['Doctor'].nunique()}")
+    if "Room" in df:
+        totals.append(f"Rooms used: {df['Room'].nunique()}")
+    if start.notna().any():
+        last = _minutes(df["End"]).max() if "End" in df else start.max()
+        totals.append(f"Day span: {int(start.min()) // 60:02d}:{int(start.min()) % 60:02d}"
+                      f"-{int(last) // 60:02d}:{int(last) % 60:02d}")
+    sections = [(PRIORITY_TOTALS, "Surgery scheduling totals", totals)]
+    sections.append((PRIORITY_SEVERITY, "Severity histogram (band: surgeries)", severity_histogram(severity)))
+
+    if "Doctor" in df:
+        sections.append((PRIORITY_RESOURCES, "Surgeon utilisation", _utilization(df, "Doctor", busy, day_minutes)))
+    if "Room" in df:
+        sections.append((PRIORITY_RESOURCES, "Room utilisation", _utilization(df, "Room", busy, day_minutes)))
+
+    if start.notna().any() and np.isfinite(severity).any():
+        order = np.argsort(-np.nan_to_num(severity, nan=-1.0), kind="stable")
+        k = max(1, len(df) // 4)
+        lines = [f"Top quarter by severity: mean start {start.iloc[order[:k]].mean() / 60:.1f} h",
+                 f"Remaining cases: mean start {start.iloc[order[k:]].mean() / 60:.1f} h" if len(df) > k else ""]
+        sections.append((PRIORITY_DISTANCE, "Severity vs start time", [l for l in lines if l]))
+
+    first = np.argsort(start.fillna(np.inf).to_numpy(), kind="stable")[:TOP_ROWS]
+    lines = [f"{r.get('Patient_ID', 'Unknown')} (severity {r.get('Severity', 0):.2f}) with {r.get('Doctor', 'N/A')} "
+             f"in {r.get('Room', 'N/A')} at {r.get('Time', 'N/A')}"
+             for r in df.iloc[first].to_dict(orient="records")]
+    sections.append((PRIORITY_EXAMPLES, "First surgeries of the day", lines))
+    return sections
+
+
+def pack_sections(sections, max_tokens=DIGEST_TOKEN_BUDGET):
+    """
+    Fill a token budget with digest sections, highest priority first.
+
+    A section that does not fit whole keeps its title and as many of its
+    lines as fit; sections with no room left are dropped.
+
+    Args:
+        sections: list of (priority, title, lines)
+        max_tokens: budget (estimated tokens)
+
+    Returns:
+        str: packed text
+    """
+    out, used = [], 0
+    for priority, title, lines in sorted(sections, key=lambda s: s[0]):
+        header = f"{title}:"
+        cost = estimate_tokens(header)
+        if used + cost > max_tokens:
+            continue
+        kept = []
+        for line in lines:
+            line = f"- {line}"
+            line_cost = estimate_tokens(line)
+            if used + cost + line_cost > max_tokens:
+                break
+            kept.append(line)
+            cost += line_cost
+        if kept:
+            out.append("\n".join([header] + kept))
+            used += cost
+    return "\n\n".join(out)
@@ -3,15 +3,409 @@ RAG-based Summarizer using Groq API
 Converts technical results from A* and CSP into simple English explanations
 """
 
+import asyncio
+import hashlib
+import heapq
+import json
 import os
-from groq import Groq
+import queue
+import random
+import sqlite3
+import threading
+import time
+import weakref
+
+from cachetools import TTLCache
+
+from . import instrumentation
+from .prompt_digest import DIGEST_TOKEN_BUDGET, allocation_digest, pack_sections, schedule_digest
+from .retrieval_index import estimate_tokens, pack_context
+
+MODEL = "llama-3.3-70b-versatile"  # Using available Groq model
+
+CONTEXT_TOKEN_BUDGET = 400  # retrieved records / past summaries per prompt
+RETRIEVAL_K = 20
+COMBINED_DIGEST_TOKEN_BUDGET = 900
+
+CACHE_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "llm_responses.sqlite"))
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for chat completions.
+
+    Keys are a SHA-256 of the model, the messages and the sampling
+    parameters. Every response is kept in an in-memory LRU with TTL;
+    persistent entries (deterministic, temperature 0 calls) are also
+    written to a SQLite file so they survive restarts. The file is only
+    created by the first persistent write.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, db_path=CACHE_DB_PATH):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_path = db_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self, create=False):
+        """Connection to the SQLite file, or None if it does not exist yet and create is False."""
+        if not self.db_path:
+            return None
+        if not self._db_ready:
+            if not create and not os.path.exists(self.db_path):
+                return None
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db_ready = True
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key, persistent=False):
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+        conn = self._connect() if persistent else None
+        if conn is not None:
+            with conn:
+                row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                with self._lock:
+                    self.memory[key] = row[0]
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, persistent=False):
+        with self._lock:
+            self.memory[key] = value
+        conn = self._connect(create=True) if persistent else None
+        if conn is not None:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                             (key, value, time.time()))
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        conn = self._connect()
+        if conn is not None:
+            with conn:
+                conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Process-wide cache shared by all summarizers."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache(db_path=CACHE_DB_PATH)
+    return _default_cache
+
+
+class FakeChatClient:
+    """
+    Offline stand-in for the Groq client (same chat.completions.create
+    shape). Returns a canned reply and counts calls; for tests and demos
+    without network access.
+    """
+
+    def __init__(self, reply="Offline summary."):
+        self.reply = reply
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, messages, model, **params):
+        self.calls += 1
+        content = self.reply(messages) if callable(self.reply) else self.reply
+        message = type("Message", (), {"content": content})()
+        choice = type("Choice", (), {"message": message})()
+        return type("ChatCompletion", (), {"choices": [choice]})()
+
+
+class FakeAsyncChatClient(FakeChatClient):
+    """
+    Async, streaming FakeChatClient for AsyncRAGSummarizer: the reply is
+    streamed word by word after latency seconds, the first fail_first
+    requests raise ConnectionError, and max_in_flight records the most
+    requests that were open at once.
+    """
+
+    def __init__(self, reply="Offline summary.", latency=0.0, fail_first=0):
+        super().__init__(reply)
+        self.latency = latency
+        self.fail_first = fail_first
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, messages, model, **params):
+        self.calls += 1
+        content = self.reply(messages) if callable(self.reply) else self.reply
+        latency = self.latency(messages) if callable(self.latency) else self.latency
+        failing = self.calls <= self.fail_first
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            self.in_flight -= 1
+        if failing:
+            raise ConnectionError("mock server unavailable")
+        return self._stream(content.split(" "))
+
+    async def _stream(self, words):
+        for i, word in enumerate(words):
+            delta = type("Delta", (), {"content": word if i == 0 else " " + word})()
+            yield type("Chunk", (), {"choices": [type("Choice", (), {"delta": delta})()]})()
+            await asyncio.sleep(0)
+
+
+NO_SCHEDULE_MESSAGE = "⚠️ No feasible schedule could be created with the current constraints."
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key=None, base_url=None):
+    """
+    One pooled Groq client per (api_key, base_url) per process, so the
+    HTTP connection pool is reused across summaries instead of being set
+    up again on every call.
+    """
+    api_key = api_key or os.getenv("GROQ_API_KEY", "your-api-key-here")
+    with _shared_clients_lock:
+        key = (api_key, base_url)
+        if key not in _shared_clients:
+            from groq import Groq  # the SDK takes ~0.3s to import, so only when a client is needed
+            _shared_clients[key] = Groq(api_key=api_key, base_url=base_url)
+        return _shared_clients[key]
+
+
+# ---------------------- Retrieval ----------------------
+
+def retrieve_context(index, allocation_data=None, schedule_data=None, max_tokens=CONTEXT_TOKEN_BUDGET, k=RETRIEVAL_K):
+    """
+    Records and past summaries most similar to the highest-severity
+    patients in the results, packed into max_tokens.
+
+    Args:
+        index: retrieval_index.RetrievalIndex (None disables retrieval)
+        allocation_data, schedule_data: result dicts ("Patient" / "Patient_ID")
+
+    Returns:
+        str: one line per retrieved document, "" when nothing matched
+    """
+    if index is None:
+        return ""
+    ids = [a.get("Patient") for a in heapq.nlargest(5, allocation_data or [], key=lambda x: x.get("Severity", 0))]
+    ids += [s.get("Patient_ID") for s in (schedule_data or [])[:5] if "Error" not in s]
+    ids = [str(i) for i in ids if i is not None]
+    query = " ".join(t for t in index.get_texts(ids) if t)
+    if not query:
+        return ""
+    return pack_context(index.search(query, k=k, exclude=ids), max_tokens)
+
+
+def _with_context(prompt, context):
+    if not context:
+        return prompt
+    return prompt + f"""
+Relevant patient records and past summaries (retrieved, most similar first):
+{context}
+"""
+
+
+# ---------------------- Prompts ----------------------
+# Each builder returns (system_prompt, user_prompt, max_tokens) so the
+# sync and async summarizers send byte-identical requests (and share
+# cache entries). Results are reduced to fixed-size digests
+# (prompt_digest), so prompt size does not grow with patient count.
+
+def bed_allocation_prompt(allocation_data, total_patients, context=""):
+    digest = pack_sections(allocation_digest(allocation_data, total_patients), DIGEST_TOKEN_BUDGET)
+    prompt = f"""
+You are a hospital administrator assistant. Explain the following bed allocation results in simple, easy-to-understand English.
+
+ALLOCATION RESULTS:
+{digest}
+
+Please provide:
+1. A brief overview of what was done
+2. How patients were prioritized
+3. What the distance cost means
+4. Any important insights
+
+Keep the explanation simple, as if explaining to someone without technical knowledge.
+"""
+    return (
+        "You are a helpful hospital assistant who explains medical resource allocation in simple, clear language. Avoid technical jargon.",
+        _with_context(prompt, context),
+        500,
+    )
+
+
+def schedule_prompt(schedule_data, context=""):
+    """None when there is no feasible schedule to explain."""
+    if not schedule_data or (len(schedule_data) == 1 and "Error" in schedule_data[0]):
+        return None
+
+    digest = pack_sections(schedule_digest(schedule_data), DIGEST_TOKEN_BUDGET)
+    prompt = f"""
+You are a hospital administrator assistant. Explain the following surgery scheduling results in simple, easy-to-understand English.
+
+SCHEDULING RESULTS:
+{digest}
+
+Please provide:
+1. A brief overview of the surgery schedule
+2. How the scheduling was optimized
+3. Key constraints that were satisfied (no double-booking, etc.)
+4. Any important insights about the schedule
+
+Keep the explanation simple and clear.
+"""
+    return (
+        "You are a helpful hospital assistant who explains surgery scheduling in simple, clear language. Avoid technical jargon.",
+        _with_context(prompt, context),
+        500,
+    )
+
+
+def combined_prompt(allocation_data, schedule_data, total_patients, context=""):
+    # one budget for both digests: totals and histograms of both result sets go in before any examples
+    sections = [(p, f"Bed allocation (A* search) - {title}", lines)
+                for p, title, lines in allocation_digest(allocation_data, total_patients)]
+    sections += [(p, f"Surgery scheduling (CSP) - {title}", lines) for p, title, lines in schedule_digest(schedule_data)]
+    digest = pack_sections(sections, COMBINED_DIGEST_TOKEN_BUDGET)
+    prompt = f"""
+You are a hospital administrator assistant. Provide a comprehensive summary of the hospital resource management system's results.
+
+{digest}
+
+Please provide a comprehensive yet simple summary that:
+1. Explains what the system accomplished
+2. Highlights how critical patients were prioritized
+3. Explains the scheduling optimization
+4. Provides actionable insights for hospital staff
+5. Uses simple language that anyone can understand
+
+Format the response with clear sections and bullet points.
+"""
+    return (
+        "You are a helpful hospital administrator assistant who explains complex hospital management results in simple, actionable language. Use clear sections and bullet points.",
+        _with_context(prompt, context),
+        800,
+    )
+
+
+def _record_request(kind, messages, content, total_s, ttft_s=None, cached=False, attempts=1, usage=None):
+    """Instrumentation for one completion; token counts come from the API usage when it reports them."""
+    if not instrumentation.enabled():
+        return
+    instrumentation.count("llm_requests_total", kind=kind, cached=cached)
+    instrumentation.observe("llm_request_seconds", total_s, kind=kind, cached=cached)
+    if cached:
+        return
+    if ttft_s is not None:
+        instrumentation.observe("llm_ttft_seconds", ttft_s, kind=kind)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or sum(estimate_tokens(m["content"]) for m in messages)
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(content or "")
+    instrumentation.count("llm_prompt_tokens_total", prompt_tokens, kind=kind)
+    instrumentation.count("llm_completion_tokens_total", completion_tokens, kind=kind)
+    instrumentation.count("llm_retries_total", attempts - 1, kind=kind)
+
+
+def _messages(system_prompt, user_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
 
 class RAGSummarizer:
-    def __init__(self, api_key=None):
-        """Initialize Groq client with API key"""
+    def __init__(self, api_key=None, client=None, cache=None, deterministic=False, index=None,
+                 context_tokens=CONTEXT_TOKEN_BUDGET):
+        """
+        Initialize Groq client with API key
+
+        Args:
+            api_key: Groq API key, defaults to $GROQ_API_KEY
+            client: injected chat client (e.g. FakeChatClient), defaults
+                to the process-wide pooled Groq client
+            cache: ResponseCache, defaults to the shared process cache;
+                pass False to disable caching
+            deterministic: use temperature 0 and persist responses to disk
+                so repeat summaries survive restarts
+            index: RetrievalIndex; similar records and past summaries are
+                added to prompts, and new summaries are indexed
+            context_tokens: token budget for the retrieved context
+        """
         self.api_key = api_key or os.getenv("GROQ_API_KEY", "your-api-key-here")
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama-3.3-70b-versatile"  # Using available Groq model
+        self.client = client if client is not None else get_shared_client(self.api_key)
+        self.index = index
+        self.context_tokens = context_tokens
+        self.model = MODEL
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        self.deterministic = deterministic
+        self.temperature = 0 if deterministic else 0.7
+
+    def _complete(self, system_prompt, user_prompt, max_tokens):
+        """One chat completion, served from the cache when the same request was seen before."""
+        started = time.perf_counter()
+        messages = _messages(system_prompt, user_prompt)
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.make_key(self.model, messages, temperature=self.temperature, max_tokens=max_tokens)
+            cached = self.cache.get(key, persistent=self.deterministic)
+            if cached is not None:
+                _record_request("sync", messages, cached, time.perf_counter() - started, cached=True)
+                return cached
+
+        chat_completion = self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=max_tokens
+        )
+        content = chat_completion.choices[0].message.content
+        _record_request("sync", messages, content, time.perf_counter() - started,
+                        usage=getattr(chat_completion, "usage", None))
+
+        if key is not None:
+            self.cache.set(key, content, persistent=self.deterministic)
+        return content
+
+    def _remember(self, kind, text):
+        """Index a generated summary so later prompts can retrieve it."""
+        if self.index is not None and text:
+            self.index.add_summary(text, label=kind)
+        return text
     
     def create_bed_allocation_summary(self, allocation_data, total_patients):
         """
@@ -24,49 +418,9 @@ class RAGSummarizer:
         Returns:
             str: Simple English summary
         """
-        # Prepare context from allocation data
-        context = f"""
-You are a hospital administrator assistant. Explain the following bed allocation results in simple, easy-to-understand English.
-
-ALLOCATION RESULTS:
-- Total Patients: {total_patients}
-- Beds Allocated: {len(allocation_data)}
-
-Sample Allocations:
-"""
-        for alloc in allocation_data[:5]:  # First 5 for context
-            context += f"\n- Patient {alloc.get('Patient', 'Unknown')} (Severity: {alloc.get('Severity', 0):.2f}) → {alloc.get('Assigned_Bed', 'N/A')} (Distance: {alloc.get('Distance_Cost', 'N/A')})"
-        
-        context += """
-
-Please provide:
-1. A brief overview of what was done
-2. How patients were prioritized
-3. What the distance cost means
-4. Any important insights
-
-Keep the explanation simple, as if explaining to someone without technical knowledge.
-"""
-        
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful hospital assistant who explains medical resource allocation in simple, clear language. Avoid technical jargon."
-                    },
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            return chat_completion.choices[0].message.content
-        
+            context = retrieve_context(self.index, allocation_data, max_tokens=self.context_tokens)
+            return self._remember("bed", self._complete(*bed_allocation_prompt(allocation_data, total_patients, context)))
         except Exception as e:
             return f"Error generating summary: {str(e)}"
     
@@ -80,51 +434,11 @@ Keep the explanation simple, as if explaining to someone without technical knowl
         Returns:
             str: Simple English summary
         """
-        if not schedule_data or (len(schedule_data) == 1 and "Error" in schedule_data[0]):
-            return "⚠️ No feasible schedule could be created with the current constraints."
-        
-        # Prepare context from schedule data
-        context = f"""
-You are a hospital administrator assistant. Explain the following surgery scheduling results in simple, easy-to-understand English.
-
-SCHEDULING RESULTS:
-- Total Surgeries Scheduled: {len(schedule_data)}
-
-Surgery Schedule:
-"""
-        for sched in schedule_data:
-            context += f"\n- Patient {sched.get('Patient_ID', 'Unknown')} (Severity: {sched.get('Severity', 0):.2f}) → {sched.get('Doctor', 'N/A')} in {sched.get('Room', 'N/A')} at {sched.get('Time', 'N/A')}"
-        
-        context += """
-
-Please provide:
-1. A brief overview of the surgery schedule
-2. How the scheduling was optimized
-3. Key constraints that were satisfied (no double-booking, etc.)
-4. Any important insights about the schedule
-
-Keep the explanation simple and clear.
-"""
-        
+        if schedule_prompt(schedule_data) is None:
+            return NO_SCHEDULE_MESSAGE
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful hospital assistant who explains surgery scheduling in simple, clear language. Avoid technical jargon."
-                    },
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            return chat_completion.choices[0].message.content
-        
+            context = retrieve_context(self.index, schedule_data=schedule_data, max_tokens=self.context_tokens)
+            return self._remember("schedule", self._complete(*schedule_prompt(schedule_data, context)))
         except Exception as e:
             return f"Error generating summary: {str(e)}"
     
@@ -140,66 +454,240 @@ Keep the explanation simple and clear.
         Returns:
             str: Comprehensive simple English summary
         """
-        # Prepare comprehensive context
-        context = f"""
-You are a hospital administrator assistant. Provide a comprehensive summary of the hospital resource management system's results.
+        try:
+            context = retrieve_context(self.index, allocation_data, schedule_data, max_tokens=self.context_tokens)
+            return self._remember("combined", self._complete(*combined_prompt(allocation_data, schedule_data, total_patients, context)))
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
 
-BED ALLOCATION (A* Algorithm):
-- Total Patients: {total_patients}
-- Beds Allocated: {len(allocation_data)}
-- Top 3 High-Severity Patients:
-"""
-        sorted_allocs = sorted(allocation_data, key=lambda x: x.get('Severity', 0), reverse=True)
-        for alloc in sorted_allocs[:3]:
-            context += f"\n  • Patient {alloc.get('Patient', 'Unknown')} - Severity {alloc.get('Severity', 0):.2f} → {alloc.get('Assigned_Bed', 'N/A')}"
-        
-        context += f"""
 
-SURGERY SCHEDULING (CSP):
-- Surgeries Scheduled: {len(schedule_data) if schedule_data and 'Error' not in schedule_data[0] else 0}
-"""
-        if schedule_data and 'Error' not in schedule_data[0]:
-            context += "- Schedule:\n"
-            for sched in schedule_data[:5]:
-                context += f"  • {sched.get('Patient_ID', 'Unknown')} with {sched.get('Doctor', 'N/A')} at {sched.get('Time', 'N/A')} in {sched.get('Room', 'N/A')}\n"
-        
-        context += """
+# ---------------------- Async / concurrent summaries ----------------------
 
-Please provide a comprehensive yet simple summary that:
-1. Explains what the system accomplished
-2. Highlights how critical patients were prioritized
-3. Explains the scheduling optimization
-4. Provides actionable insights for hospital staff
-5. Uses simple language that anyone can understand
+def retryable_errors():
+    """Errors worth retrying before the first token (imports groq on first use)."""
+    from groq import APIConnectionError, InternalServerError, RateLimitError
+    return (APIConnectionError, RateLimitError, InternalServerError, ConnectionError, TimeoutError)
 
-Format the response with clear sections and bullet points.
-"""
-        
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {(api_key, base_url): client}
+_background_loop = None
+_background_lock = threading.Lock()
+
+
+def get_async_client(api_key=None, base_url=None):
+    """
+    Pooled AsyncGroq client for the running event loop.
+
+    httpx connection pools are bound to the loop that opened them, so
+    clients are kept per loop; summaries started through run_summaries /
+    stream_summaries all run on one background loop, which makes this one
+    client per process in practice. The SDK's own retries are disabled,
+    AsyncRAGSummarizer does its own.
+    """
+    api_key = api_key or os.getenv("GROQ_API_KEY", "your-api-key-here")
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if (api_key, base_url) not in clients:
+        from groq import AsyncGroq
+        clients[(api_key, base_url)] = AsyncGroq(api_key=api_key, base_url=base_url, max_retries=0)
+    return clients[(api_key, base_url)]
+
+
+def _get_background_loop():
+    """Long-lived event loop on a daemon thread, shared by the sync entry points."""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="summarizer-loop", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+class AsyncRAGSummarizer:
+    """
+    asyncio summarizer: the bed, schedule and combined prompts go out
+    concurrently (at most max_concurrency in flight), tokens are streamed
+    to on_token as they arrive, and connection errors, 429s and 5xx
+    responses are retried with exponential backoff.
+
+    Prompts and cache keys are the same as RAGSummarizer's, so the two
+    share the ResponseCache.
+    """
+
+    def __init__(self, api_key=None, client=None, base_url=None, cache=None, deterministic=False,
+                 max_concurrency=3, max_retries=3, backoff=0.5, index=None, context_tokens=CONTEXT_TOKEN_BUDGET):
+        """
+        Args:
+            api_key: Groq API key, defaults to $GROQ_API_KEY
+            client: injected async chat client; defaults to the pooled
+                AsyncGroq client of the running loop
+            base_url: API endpoint override (e.g. a local mock server)
+            cache, deterministic, index, context_tokens: as for RAGSummarizer
+            max_concurrency: concurrent requests per summarizer
+            max_retries: retries per request after the first attempt
+            backoff: first retry delay in seconds, doubled per attempt
+        """
+        self.api_key = api_key or os.getenv("GROQ_API_KEY", "your-api-key-here")
+        self.base_url = base_url
+        self._client = client
+        self.index = index
+        self.context_tokens = context_tokens
+        self.model = MODEL
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        self.deterministic = deterministic
+        self.temperature = 0 if deterministic else 0.7
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timings = {}
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_async_client(self.api_key, self.base_url)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _complete(self, kind, system_prompt, user_prompt, max_tokens, on_token=None):
+        """
+        Stream one chat completion, calling on_token(kind, delta) per chunk.
+
+        A request is only retried if it failed before the first token, so
+        the UI never sees a duplicated prefix.
+        """
+        started = time.perf_counter()
+        messages = _messages(system_prompt, user_prompt)
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.make_key(self.model, messages, temperature=self.temperature, max_tokens=max_tokens)
+            cached = self.cache.get(key, persistent=self.deterministic)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(kind, cached)
+                elapsed = time.perf_counter() - started
+                self.timings[kind] = {"ttft_s": elapsed, "total_s": elapsed, "attempts": 0, "cached": True}
+                _record_request(kind, messages, cached, elapsed, cached=True)
+                return cached
+
+        retryable = retryable_errors()
+        async with self._semaphore():
+            for attempt in range(self.max_retries + 1):
+                parts = []
+                first_token = usage = None
+                try:
+                    stream = await self.client.chat.completions.create(
+                        messages=messages,
+                        model=self.model,
+                        temperature=self.temperature,
+                        max_tokens=max_tokens,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        # Groq reports token usage on the last chunk
+                        usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        parts.append(delta)
+                        if on_token is not None:
+                            on_token(kind, delta)
+                    break
+                except retryable:
+                    if parts or attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random() / 2))
+
+        content = "".join(parts)
+        finished = time.perf_counter()
+        self.timings[kind] = {"ttft_s": (first_token or finished) - started, "total_s": finished - started,
+                              "attempts": attempt + 1, "cached": False}
+        _record_request(kind, messages, content, finished - started, ttft_s=self.timings[kind]["ttft_s"],
+                        attempts=attempt + 1, usage=usage)
+        if key is not None:
+            self.cache.set(key, content, persistent=self.deterministic)
+        return content
+
+    _remember = RAGSummarizer._remember
+
+    async def _summary(self, kind, prompt, on_token):
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful hospital administrator assistant who explains complex hospital management results in simple, actionable language. Use clear sections and bullet points."
-                    },
-                    {
-                        "role": "user",
-                        "content": context
-                    }
-                ],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=800
-            )
-            
-            return chat_completion.choices[0].message.content
-        
+            return self._remember(kind, await self._complete(kind, *prompt, on_token=on_token))
         except Exception as e:
             return f"Error generating summary: {str(e)}"
 
+    async def summarize_all(self, allocation_data=None, schedule_data=None, total_patients=0, on_token=None):
+        """
+        Generate every summary the data allows, concurrently.
+
+        Returns:
+            dict: kind ("bed", "schedule", "combined") -> summary text
+        """
+        results, jobs = {}, {}
+        budget = self.context_tokens
+        if allocation_data:
+            context = retrieve_context(self.index, allocation_data, max_tokens=budget)
+            jobs["bed"] = bed_allocation_prompt(allocation_data, total_patients, context)
+        if schedule_data:
+            context = retrieve_context(self.index, schedule_data=schedule_data, max_tokens=budget)
+            prompt = schedule_prompt(schedule_data, context)
+            if prompt is None:
+                results["schedule"] = NO_SCHEDULE_MESSAGE
+            else:
+                jobs["schedule"] = prompt
+        if allocation_data and schedule_data:
+            context = retrieve_context(self.index, allocation_data, schedule_data, max_tokens=budget)
+            jobs["combined"] = combined_prompt(allocation_data, schedule_data, total_patients, context)
+
+        texts = await asyncio.gather(*(self._summary(kind, prompt, on_token) for kind, prompt in jobs.items()))
+        results.update(zip(jobs, texts))
+        return results
+
+
+def run_summaries(allocation_data=None, schedule_data=None, total_patients=0, summarizer=None, on_token=None):
+    """
+    Blocking wrapper around AsyncRAGSummarizer.summarize_all on the shared
+    background loop (safe to call from Streamlit or any sync code).
+    """
+    summarizer = summarizer or AsyncRAGSummarizer()
+    future = asyncio.run_coroutine_threadsafe(
+        summarizer.summarize_all(allocation_data, schedule_data, total_patients, on_token=on_token),
+        _get_background_loop(),
+    )
+    return future.result()
+
+
+def stream_summaries(allocation_data=None, schedule_data=None, total_patients=0, summarizer=None):
+    """
+    Generator over streamed summary events, for rendering in a sync UI.
+
+    Yields:
+        (kind, delta, None) for each token chunk as it arrives, then
+        (None, None, results) once with the {kind: text} dict
+    """
+    summarizer = summarizer or AsyncRAGSummarizer()
+    events = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        summarizer.summarize_all(allocation_data, schedule_data, total_patients,
+                                 on_token=lambda kind, delta: events.put((kind, delta))),
+        _get_background_loop(),
+    )
+    future.add_done_callback(lambda f: events.put(None))
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        yield event[0], event[1], None
+    yield None, None, future.result()
+
 
 # Standalone function for easy import
-def summarize_results(allocation_data=None, schedule_data=None, total_patients=0):
+def summarize_results(allocation_data=None, schedule_data=None, total_patients=0, deterministic=False, client=None,
+                      index=None):
     """
     Convenience function to generate summaries
     
@@ -207,11 +695,14 @@ def summarize_results(allocation_data=None, schedule_data=None, total_patients=0
         allocation_data: Bed allocation results
         schedule_data: Surgery schedule results
         total_patients: Total number of patients
+        deterministic: temperature 0, cached across restarts
+        client: optional injected chat client
+        index: optional RetrievalIndex for retrieved context
     
     Returns:
         str: Summary text
     """
-    summarizer = RAGSummarizer()
+    summarizer = RAGSummarizer(client=client, deterministic=deterministic, index=index)
     
     if allocation_data and schedule_data:
         return summarizer.create_combined_summary(allocation_data, schedule_data, total_patients)
@@ -0,0 +1,134 @@
+"""
+Resource calendars for surgery scheduling.
+
+Loads surgeon availability windows and shift limits, room opening hours
+and equipment, and procedure durations / equipment needs by diagnosis
+from CSV or Parquet, and compiles them into boolean availability masks
+(resource x slot) and equipment bitmasks that csp_scheduler.solve_schedule
+consumes directly.
+
+Expected columns:
+
+    surgeons:   surgeon, start, end[, max_minutes]   one row per window
+    rooms:      room, start, end[, equipment]        equipment ";"-separated
+    procedures: diagnosis, duration_minutes[, equipment]
+
+Times are "HH:MM" within the scheduling day.
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DURATION_MINUTES = 60
+
+
+def _read_table(path):
+    if os.path.splitext(path)[1] in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _minutes(hhmm):
+    h, m = str(hhmm).strip().split(":")
+    return int(h) * 60 + int(m)
+
+
+def _split_equipment(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return []
+    return [e.strip() for e in str(value).split(";") if e.strip()]
+
+
+class ResourceCalendar:
+    """
+    Compiled day calendar.
+
+    Attributes:
+        timeslots: slot labels ("HH:MM" start times)
+        surgeons, rooms: resource names, index = row in the masks
+        surgeon_avail, room_avail: bool arrays (resources, n_slots)
+        surgeon_limit: int array, max operating slots per surgeon
+        room_equipment: int array, bit i set if the room has equipment i
+        equipment: equipment names, index = bit position
+        procedures: {diagnosis: (duration_slots, equipment bitmask)}
+    """
+
+    def __init__(self, surgeons, rooms, procedures, day_start="07:00", day_end="19:00", slot_minutes=15):
+        self.slot_minutes = int(slot_minutes)
+        self.day_start = _minutes(day_start)
+        n_slots = (_minutes(day_end) - self.day_start) // self.slot_minutes
+        self.timeslots = [f"{m // 60:02d}:{m % 60:02d}"
+                          for m in range(self.day_start, self.day_start + n_slots * self.slot_minutes, self.slot_minutes)]
+
+        self.equipment = sorted({e for v in rooms.get("equipment", pd.Series(dtype=object)) for e in _split_equipment(v)}
+                                | {e for v in procedures.get("equipment", pd.Series(dtype=object)) for e in _split_equipment(v)})
+        bit = {e: 1 << i for i, e in enumerate(self.equipment)}
+
+        self.surgeons = list(dict.fromkeys(surgeons["surgeon"].astype(str)))
+        self.surgeon_avail = self._windows(surgeons, "surgeon", self.surgeons)
+        limit = np.full(len(self.surgeons), n_slots, dtype=np.int64)
+        if "max_minutes" in surgeons:
+            per_surgeon = surgeons.groupby(surgeons["surgeon"].astype(str))["max_minutes"].min()
+            for i, name in enumerate(self.surgeons):
+                if not pd.isna(per_surgeon.get(name)):
+                    limit[i] = int(per_surgeon[name]) // self.slot_minutes
+        self.surgeon_limit = limit
+
+        self.rooms = list(dict.fromkeys(rooms["room"].astype(str)))
+        self.room_avail = self._windows(rooms, "room", self.rooms)
+        self.room_equipment = np.zeros(len(self.rooms), dtype=np.int64)
+        if "equipment" in rooms:
+            for name, value in zip(rooms["room"].astype(str), rooms["equipment"]):
+                for e in _split_equipment(value):
+                    self.room_equipment[self.rooms.index(name)] |= bit[e]
+
+        self.procedures = {}
+        for _, row in procedures.iterrows():
+            mask = 0
+            for e in _split_equipment(row.get("equipment")):
+                mask |= bit[e]
+            self.procedures[str(row["diagnosis"])] = (self.duration_slots(row["duration_minutes"]), mask)
+
+    def _windows(self, table, key, names):
+        avail = np.zeros((len(names), len(self.timeslots)), dtype=bool)
+        index = {n: i for i, n in enumerate(names)}
+        for name, start, end in zip(table[key].astype(str), table["start"], table["end"]):
+            a = max(0, math.ceil((_minutes(start) - self.day_start) / self.slot_minutes))
+            b = min(len(self.timeslots), (_minutes(end) - self.day_start) // self.slot_minutes)
+            avail[index[name], a:b] = True
+        return avail
+
+    @classmethod
+    def load(cls, surgeons_path, rooms_path, procedures_path, **kwargs):
+        """Load the three tables from CSV or Parquet files."""
+        return cls(_read_table(surgeons_path), _read_table(rooms_path), _read_table(procedures_path), **kwargs)
+
+    @classmethod
+    def load_dir(cls, directory, ext=".csv", **kwargs):
+        """Load surgeons / rooms / procedures{ext} from one directory."""
+        return cls.load(*(os.path.join(directory, name + ext) for name in ("surgeons", "rooms", "procedures")), **kwargs)
+
+    def duration_slots(self, minutes):
+        return max(1, math.ceil(float(minutes) / self.slot_minutes))
+
+    def case_requirements(self, patients):
+        """
+        Per-case duration (slots) and eligible-room mask.
+
+        A patient's own duration_slots wins over the procedure table;
+        unknown diagnoses get DEFAULT_DURATION_MINUTES and no equipment.
+        Room eligibility is one bitwise AND per case: the room must have
+        every equipment bit the procedure needs.
+        """
+        default = (self.duration_slots(DEFAULT_DURATION_MINUTES), 0)
+        durations = np.empty(len(patients), dtype=np.int64)
+        needs = np.zeros(len(patients), dtype=np.int64)
+        for i, p in enumerate(patients):
+            slots, mask = self.procedures.get(str(p.get("diagnosis")), default)
+            durations[i] = int(p.get("duration_slots") or slots)
+            needs[i] = mask
+        room_ok = (self.room_equipment[None, :] & needs[:, None]) == needs[:, None]
+        return durations, room_ok
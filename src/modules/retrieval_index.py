@@ -0,0 +1,369 @@
+"""
+Local retrieval index for the RAG summarizer.
+
+Patient records (diagnosis, symptoms, pre-existing conditions) and past
+summaries are indexed as hashed TF-IDF vectors, so the summarizer can
+put the most relevant records into its prompt instead of head rows. No
+network access and no fitted vocabulary are needed.
+
+Layout: the index is a list of immutable segments, each a sparse
+(docs x features) CSC matrix of length-normalised sublinear term weights
+plus the document ids, kinds and texts. Adding documents creates a new
+in-memory segment; save() writes it next to the others as .npy files,
+and load() memory-maps them. IDF comes from a global document-frequency
+vector and is applied at query time, so older segments never need to be
+rewritten when new patients arrive. compact() merges segments.
+"""
+
+import functools
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# scipy.sparse is imported where a matrix is built, so the prompt helpers
+# that only need estimate_tokens / pack_context do not pay for it
+
+INDEX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "retrieval_index"))
+
+N_FEATURES = 2 ** 18
+MAX_SEGMENTS = 8
+MAX_DF = 0.5  # query terms in more than this share of documents are skipped
+RECORD_FIELDS = ("diagnosis", "symptoms", "pre_existing_conditions")
+
+KINDS = ("patient", "summary")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the this to was were with".split())
+TOKEN_CACHE_SIZE = 2 ** 16  # hashed tokens kept in memory; bounded for long-running app processes
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(str(text).lower()) if t not in _STOPWORDS]
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _token_hash(token):
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def _features(text, n_features):
+    """(feature ids, weights) for one text: sublinear tf, L2-normalised."""
+    ids = [_token_hash(token) % n_features for token in tokenize(text)]
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    ids, counts = np.unique(np.asarray(ids, dtype=np.int64), return_counts=True)
+    weights = 1.0 + np.log(counts)
+    return ids, (weights / np.sqrt(np.sum(weights ** 2))).astype(np.float32)
+
+
+def record_texts(df):
+    """One searchable text per patient row."""
+    parts = [df[c].astype(object).fillna("").astype(str) if c in df else pd.Series("", index=df.index)
+             for c in RECORD_FIELDS]
+    return (parts[0] + ". Symptoms: " + parts[1] + ". History: " + parts[2]).tolist()
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class _Segment:
+    """One immutable block of documents (arrays may be memory-mapped)."""
+
+    def __init__(self, indptr, indices, weights, ids, kinds, offsets, text, name=None):
+        # CSC layout of the (n_docs, n_features) weight matrix: the docs
+        # containing feature f are indices[indptr[f]:indptr[f + 1]]
+        self.indptr = indptr
+        self.indices = indices      # int32 doc positions
+        self.weights = weights      # float16
+        self.ids = ids              # bytes array (n_docs,)
+        self.kinds = kinds          # int8 index into KINDS
+        self.offsets = offsets      # int64 (n_docs + 1,) into text
+        self.text = text            # uint8 utf-8 blob
+        self.name = name            # directory name once saved
+        self._order = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, texts, kind, n_features):
+        texts = list(texts)
+        # patient texts repeat a lot; featurise each distinct text once
+        inverse, unique = pd.factorize(pd.Series(texts, dtype=object).astype(str))
+        feats = [_features(t, n_features) for t in unique]
+        unique_lengths = np.array([len(f[0]) for f in feats], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(unique_lengths)])
+        all_ids = np.concatenate([f[0] for f in feats] + [np.empty(0, dtype=np.int64)])
+        all_weights = np.concatenate([f[1] for f in feats] + [np.empty(0, dtype=np.float32)])
+
+        # expand the per-text features to every document that has that text
+        lengths = unique_lengths[inverse]
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        doc_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(texts) else np.empty(0, dtype=np.int64)
+        take = np.arange(int(lengths.sum())) + np.repeat(starts[inverse] - doc_starts, lengths)
+        from scipy import sparse
+        matrix = sparse.csc_matrix((all_weights[take], (rows, all_ids[take])), shape=(len(texts), n_features))
+
+        encoded = [t.encode("utf-8") for t in unique]
+        byte_lengths = np.array([len(b) for b in encoded], dtype=np.int64)[inverse]
+        offsets = np.concatenate([[0], np.cumsum(byte_lengths)]).astype(np.int64)
+        text = np.frombuffer(b"".join(encoded[u] for u in inverse), dtype=np.uint8)
+        return cls(matrix.indptr.astype(np.int64), matrix.indices.astype(np.int32), matrix.data.astype(np.float16),
+                   np.asarray([str(i) for i in ids], dtype=bytes), np.full(len(texts), KINDS.index(kind), dtype=np.int8),
+                   offsets, text)
+
+    def to_matrix(self, n_features):
+        from scipy import sparse
+        return sparse.csc_matrix((np.asarray(self.weights, dtype=np.float32), self.indices, self.indptr),
+                                 shape=(len(self), n_features))
+
+    def doc_text(self, i):
+        return bytes(self.text[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def find(self, ids):
+        """Positions of ids in this segment (-1 when absent)."""
+        if self._order is None:
+            self._order = np.argsort(self.ids, kind="stable")
+        ids = np.asarray(ids, dtype=self.ids.dtype if len(self.ids) else bytes)
+        pos = np.searchsorted(self.ids, ids, sorter=self._order)
+        pos = np.minimum(pos, max(len(self.ids) - 1, 0))
+        found = self._order[pos] if len(self.ids) else np.zeros(len(ids), dtype=np.int64)
+        hit = (self.ids[found] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+        return np.where(hit, found, -1)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name, arr in (("indptr", self.indptr), ("indices", self.indices), ("weights", self.weights), ("ids", self.ids),
+                          ("kinds", self.kinds), ("offsets", self.offsets), ("text", self.text)):
+            np.save(os.path.join(path, name + ".npy"), arr)
+
+    @classmethod
+    def load(cls, path, name):
+        arr = {n: np.load(os.path.join(path, n + ".npy"), mmap_mode="r")
+               for n in ("indptr", "indices", "weights", "ids", "kinds", "offsets", "text")}
+        return cls(arr["indptr"], arr["indices"], arr["weights"], np.asarray(arr["ids"]), arr["kinds"],
+                   arr["offsets"], arr["text"], name=name)
+
+
+class RetrievalIndex:
+    """
+    Append-only TF-IDF index over patient records and past summaries.
+
+    Example:
+        index = RetrievalIndex.load()              # empty if nothing saved yet
+        index.add_records(df)                      # only new patient_ids are added
+        hits = index.search("stroke seizures", k=10)
+        index.save()
+    """
+
+    def __init__(self, path=INDEX_DIR, n_features=N_FEATURES):
+        self.path = path
+        self.n_features = n_features
+        self.segments = []
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self._lock = threading.RLock()  # summaries may be added from the async summarizer's thread
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    # ---------------------- Persistence ----------------------
+
+    @classmethod
+    def load(cls, path=INDEX_DIR):
+        """Open a saved index with memory-mapped segments (empty index if none)."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return cls(path)
+        with open(meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        index = cls(path, meta["n_features"])
+        index.doc_freq = np.load(os.path.join(path, "doc_freq.npy"))
+        index.segments = [_Segment.load(os.path.join(path, name), name) for name in meta["segments"]]
+        return index
+
+    def save(self):
+        """Write unsaved segments and the metadata; compacts when segments pile up."""
+        with self._lock:
+            return self._save()
+
+    def _save(self):
+        if len(self.segments) > MAX_SEGMENTS:
+            # merge the small tail (new patients, summaries), leave the big base segment alone
+            largest = max(range(len(self.segments)), key=lambda i: len(self.segments[i]))
+            self._compact([i for i in range(len(self.segments)) if i != largest])
+        os.makedirs(self.path, exist_ok=True)
+        taken = {s.name for s in self.segments if s.name}
+        counter = 0
+        for segment in self.segments:
+            if segment.name is None:
+                while f"seg_{counter:05d}" in taken or os.path.exists(os.path.join(self.path, f"seg_{counter:05d}")):
+                    counter += 1
+                segment.name = f"seg_{counter:05d}"
+                taken.add(segment.name)
+                segment.save(os.path.join(self.path, segment.name))
+        np.save(os.path.join(self.path, "doc_freq.npy"), self.doc_freq)
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"n_features": self.n_features, "segments": [s.name for s in self.segments],
+                       "n_docs": len(self)}, fh)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        # drop segment directories no longer referenced (merged by compact)
+        for name in os.listdir(self.path):
+            if name.startswith("seg_") and name not in taken:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        return self
+
+    def compact(self):
+        """Merge all segments into one in-memory segment (written on the next save)."""
+        with self._lock:
+            return self._compact(range(len(self.segments)))
+
+    def _compact(self, positions):
+        positions = sorted(positions)
+        if len(positions) <= 1:
+            return self
+        segs = [self.segments[i] for i in positions]
+        from scipy import sparse
+        matrix = sparse.vstack([s.to_matrix(self.n_features) for s in segs], format="csc")
+        sizes = np.array([len(s.text) for s in segs], dtype=np.int64)
+        offsets = np.concatenate([np.asarray(s.offsets[:-1]) + base for s, base in zip(segs, np.concatenate([[0], np.cumsum(sizes)[:-1]]))]
+                                 + [[int(sizes.sum())]]).astype(np.int64)
+        merged = _Segment(matrix.indptr.astype(np.int64), matrix.indices.astype(np.int32),
+                          matrix.data.astype(np.float16), np.concatenate([s.ids for s in segs]),
+                          np.concatenate([np.asarray(s.kinds) for s in segs]), offsets,
+                          np.concatenate([np.asarray(s.text) for s in segs]))
+        rest = [s for i, s in enumerate(self.segments) if i not in set(positions)]
+        self.segments = rest[:positions[0]] + [merged] + rest[positions[0]:]
+        return self
+
+    # ---------------------- Updates ----------------------
+
+    def contains(self, ids):
+        """Bool mask: which ids are already indexed."""
+        ids = np.asarray([str(i) for i in ids], dtype=bytes)
+        found = np.zeros(len(ids), dtype=bool)
+        for segment in self.segments:
+            if len(segment):
+                found |= segment.find(ids) >= 0
+        return found
+
+    def add_texts(self, ids, texts, kind="patient"):
+        """Index new documents; ids already present are skipped. Returns the number added."""
+        with self._lock:
+            return self._add_texts(list(ids), list(texts), kind)
+
+    def _add_texts(self, ids, texts, kind):
+        if not ids:
+            return 0
+        new = ~self.contains(ids)
+        _, first = np.unique(np.asarray([str(i) for i in ids]), return_index=True)
+        keep = np.zeros(len(ids), dtype=bool)
+        keep[first] = True
+        keep &= new
+        if not keep.any():
+            return 0
+        segment = _Segment.build([i for i, k in zip(ids, keep) if k], [t for t, k in zip(texts, keep) if k],
+                                 kind, self.n_features)
+        self.doc_freq += np.diff(segment.indptr)
+        self.segments = self.segments + [segment]
+        return int(keep.sum())
+
+    def add_records(self, df, id_column="patient_id"):
+        """Index patient rows (diagnosis, symptoms, history) not seen before."""
+        return self.add_texts(df[id_column].astype(str).tolist(), record_texts(df), kind="patient")
+
+    def add_summary(self, text, label="summary"):
+        """Index a generated summary; identical summaries are stored once."""
+        digest = zlib.crc32(text.encode("utf-8"))
+        return self.add_texts([f"{label}:{digest:08x}"], [text], kind="summary")
+
+    def get_texts(self, ids):
+        """Stored text for each id (None when missing)."""
+        ids = np.asarray([str(i) for i in ids], dtype=bytes)
+        out = [None] * len(ids)
+        for segment in self.segments:
+            if not len(segment):
+                continue
+            for j, pos in enumerate(segment.find(ids)):
+                if pos >= 0 and out[j] is None:
+                    out[j] = segment.doc_text(pos)
+        return out
+
+    # ---------------------- Search ----------------------
+
+    def idf(self):
+        n = len(self)
+        return np.log((1.0 + n) / (1.0 + self.doc_freq)) + 1.0
+
+    def search(self, query, k=10, kind=None, exclude=()):
+        """
+        Top-k documents by TF-IDF cosine-style score.
+
+        Args:
+            query: text
+            k: number of hits
+            kind: "patient" / "summary" to restrict, None for both
+            exclude: ids to leave out (e.g. the patients the query came from)
+
+        Returns:
+            list of {"id", "kind", "score", "text"}, best first
+        """
+        q_ids, q_weights = _features(query, self.n_features)
+        if not len(q_ids) or not len(self):
+            return []
+        # near-universal terms ("symptoms", "history" in every record) barely
+        # change the ranking but would touch every posting list
+        selective = self.doc_freq[q_ids] <= MAX_DF * len(self)
+        if selective.any():
+            q_ids, q_weights = q_ids[selective], q_weights[selective]
+        q_weights = q_weights * self.idf()[q_ids] ** 2
+        excluded = np.asarray([str(i) for i in exclude], dtype=bytes)
+
+        candidates = []  # (score, segment index, doc index)
+        for s_idx, segment in enumerate(self.segments):
+            starts, ends = segment.indptr[q_ids], segment.indptr[q_ids + 1]
+            if not np.any(ends > starts):
+                continue
+            docs = np.concatenate([segment.indices[a:b] for a, b in zip(starts, ends)])
+            weights = np.concatenate([np.asarray(segment.weights[a:b], dtype=np.float32) * w
+                                      for a, b, w in zip(starts, ends, q_weights)])
+            scores = np.bincount(docs, weights=weights, minlength=len(segment))
+            if kind is not None:
+                scores[np.asarray(segment.kinds) != KINDS.index(kind)] = 0
+            if len(excluded):
+                pos = segment.find(excluded)
+                scores[pos[pos >= 0]] = 0
+            top = min(k, int(np.count_nonzero(scores)))
+            if top == 0:
+                continue
+            best = np.argpartition(-scores, top - 1)[:top]
+            candidates.extend((float(scores[d]), s_idx, int(d)) for d in best)
+
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        hits = []
+        for score, s_idx, d in candidates[:k]:
+            segment = self.segments[s_idx]
+            hits.append({"id": segment.ids[d].decode("utf-8"), "kind": KINDS[segment.kinds[d]],
+                         "score": score, "text": segment.doc_text(d)})
+        return hits
+
+
+def pack_context(hits, max_tokens):
+    """Greedily take hits (best first) while they fit in max_tokens; returns the context text."""
+    lines, used = [], 0
+    for hit in hits:
+        line = f"- [{hit['kind']} {hit['id']}] {hit['text']}"
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            continue
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -0,0 +1,223 @@
+"""
+Parallel portfolio solving for the surgery scheduler.
+
+Several solver configurations (variable orderings, value orderings,
+seeded random restarts, and a min-conflicts local search) run side by
+side in a ProcessPoolExecutor on the same integer-encoded problem. The
+caller gets the first feasible schedule or the best one found within a
+wall-clock budget, so one unlucky ordering no longer sets the latency.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .csp_scheduler import solve_schedule
+
+MIN_CONFLICTS_STEPS = 20_000
+
+
+def default_configs(seed=0, restarts=4):
+    """Portfolio members, in tie-break priority order."""
+    configs = [
+        {"name": "severity/earliest", "solver": "backtrack", "order": "severity", "values": "earliest"},
+        {"name": "severity/balanced", "solver": "backtrack", "order": "severity", "values": "balanced"},
+        {"name": "longest-first/earliest", "solver": "backtrack", "order": "longest", "values": "earliest"},
+        {"name": "most-constrained/earliest", "solver": "backtrack", "order": "constrained", "values": "earliest"},
+    ]
+    for k in range(restarts):
+        configs.append({"name": f"restart-{k}", "solver": "backtrack", "order": "severity",
+                        "values": "random", "seed": seed * 1000 + k})
+    configs.append({"name": "min-conflicts", "solver": "min_conflicts", "seed": seed})
+    return configs
+
+
+def schedule_objective(durations, severity, start_idx):
+    """Severity-weighted completion time (lower is better: severe cases first)."""
+    return float(np.sum(severity * (start_idx + durations)))
+
+
+def _variable_order(problem, order):
+    durations, room_ok = problem["durations"], problem["room_ok"]
+    n = len(durations)
+    if order == "longest":
+        return np.argsort(-durations, kind="stable")
+    if order == "constrained":
+        return np.lexsort((np.arange(n), -durations, room_ok.sum(axis=1)))
+    return np.arange(n)  # cases arrive in severity order
+
+
+def _min_conflicts(problem, seed, deadline, max_steps=MIN_CONFLICTS_STEPS):
+    """
+    Local search: start from a random complete assignment and repeatedly
+    move a conflicting case to its least-conflicting (start, doctor, room).
+    Conflicts are overlapping slots on a doctor or room, unavailable slots
+    and shift-limit overruns.
+    """
+    rng = np.random.default_rng(seed)
+    durations = problem["durations"]
+    n = len(durations)
+    n_doctors, n_rooms, n_slots = problem["n_doctors"], problem["n_rooms"], problem["n_slots"]
+    doctor_ok = problem["doctor_ok"]
+    room_ok = problem["room_ok"]
+    doc_blocked = problem["doctor_busy"].astype(np.int32)
+    room_blocked = problem["room_busy"].astype(np.int32)
+    doc_limit = problem["doctor_limit"]
+
+    doc_use = np.zeros((n_doctors, n_slots), dtype=np.int32)
+    room_use = np.zeros((n_rooms, n_slots), dtype=np.int32)
+    doc_load = np.zeros(n_doctors, dtype=np.int64)
+    assign = np.zeros((n, 3), dtype=np.int64)
+
+    def place(c, t, d, r, sign):
+        doc_use[d, t:t + durations[c]] += sign
+        room_use[r, t:t + durations[c]] += sign
+        doc_load[d] += sign * durations[c]
+
+    def window_sum(use, length):
+        csum = np.zeros((use.shape[0], n_slots + 1), dtype=np.int64)
+        np.cumsum(use, axis=1, out=csum[:, 1:])
+        return csum[:, length:] - csum[:, :n_slots - length + 1]
+
+    def best_value(c):
+        length = durations[c]
+        if length > n_slots:
+            return None
+        doc_cost = window_sum(doc_use + doc_blocked, length).astype(float)
+        doc_cost += ((doc_load + length) > doc_limit)[:, None] * length
+        doc_cost[~doctor_ok[c]] = np.inf
+        room_cost = window_sum(room_use + room_blocked, length).astype(float)
+        room_cost[~room_ok[c]] = np.inf
+        cost = doc_cost.min(axis=0) + room_cost.min(axis=0)
+        if np.isinf(cost.min()):
+            return None
+        t = int(rng.choice(np.flatnonzero(cost == cost.min())))
+        d = int(rng.choice(np.flatnonzero(doc_cost[:, t] == doc_cost[:, t].min())))
+        r = int(rng.choice(np.flatnonzero(room_cost[:, t] == room_cost[:, t].min())))
+        return t, d, r
+
+    def conflicted(c):
+        t, d, r = assign[c]
+        sl = slice(t, t + durations[c])
+        return (doc_use[d, sl].max() > 1 or room_use[r, sl].max() > 1 or doc_blocked[d, sl].any()
+                or room_blocked[r, sl].any() or doc_load[d] > doc_limit[d])
+
+    for c in range(n):
+        value = best_value(c)
+        if value is None:
+            return None
+        assign[c] = value
+        place(c, *value, 1)
+
+    for _ in range(max_steps):
+        if time.monotonic() > deadline:
+            return None
+        bad = [c for c in range(n) if conflicted(c)]
+        if not bad:
+            return assign[:, 1], assign[:, 2], assign[:, 0]
+        c = int(rng.choice(bad))
+        place(c, *assign[c], -1)
+        value = best_value(c)
+        if value is None:
+            return None
+        assign[c] = value
+        place(c, *value, 1)
+    return None
+
+
+def _run_config(config, problem, budget):
+    """Worker entry point: solve with one configuration, return (doctor, room, start) arrays in case order."""
+    started = time.monotonic()
+    deadline = started + budget
+    if config["solver"] == "min_conflicts":
+        result = _min_conflicts(problem, config.get("seed", 0), deadline)
+    else:
+        order = _variable_order(problem, config.get("order", "severity"))
+        result = solve_schedule(
+            problem["durations"][order], problem["n_doctors"], problem["n_rooms"], problem["n_slots"],
+            doctor_ok=problem["doctor_ok"][order], room_ok=problem["room_ok"][order],
+            doctor_busy=problem["doctor_busy"], room_busy=problem["room_busy"],
+            doctor_limit=problem["doctor_limit"], value_order=config.get("values", "earliest"),
+            seed=config.get("seed"), deadline=deadline,
+        )
+        if result is not None:
+            inverse = np.argsort(order)
+            result = tuple(a[inverse] for a in result)
+    return result, time.monotonic() - started
+
+
+def solve_portfolio(durations, severity, n_doctors, n_rooms, n_slots, doctor_ok=None, room_ok=None,
+                    doctor_busy=None, room_busy=None, doctor_limit=None, time_budget=5.0,
+                    strategy="best", seed=0, configs=None, workers=None):
+    """
+    Run a portfolio of scheduler configurations in parallel.
+
+    Args:
+        durations, severity: per-case arrays, cases in descending severity
+        doctor_ok ... doctor_limit: as for csp_scheduler.solve_schedule
+        time_budget: wall-clock seconds for the whole portfolio
+        strategy: "first" returns the first feasible schedule and cancels
+            the rest (lowest latency); "best" waits up to the budget and
+            returns the lowest schedule_objective (ties broken by config
+            order), which is deterministic for a given seed as long as the
+            configurations finish inside the budget
+        seed: base seed for the randomised members
+        configs: list of config dicts, defaults to default_configs(seed)
+        workers: process count, defaults to os.cpu_count()
+
+    Returns:
+        dict: "result" ((doctor_idx, room_idx, start_idx) or None),
+        "config" (winning config name), "objective", "elapsed_s",
+        "finished" (configs that completed in time)
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    severity = np.asarray(severity, dtype=np.float64)
+    n = len(durations)
+    problem = {
+        "durations": durations,
+        "n_doctors": n_doctors, "n_rooms": n_rooms, "n_slots": n_slots,
+        "doctor_ok": np.ones((n, n_doctors), dtype=bool) if doctor_ok is None else np.asarray(doctor_ok, dtype=bool),
+        "room_ok": np.ones((n, n_rooms), dtype=bool) if room_ok is None else np.asarray(room_ok, dtype=bool),
+        "doctor_busy": np.zeros((n_doctors, n_slots), dtype=bool) if doctor_busy is None else np.asarray(doctor_busy, dtype=bool),
+        "room_busy": np.zeros((n_rooms, n_slots), dtype=bool) if room_busy is None else np.asarray(room_busy, dtype=bool),
+        "doctor_limit": np.full(n_doctors, n_slots) if doctor_limit is None else np.asarray(doctor_limit, dtype=np.int64),
+    }
+    configs = configs or default_configs(seed)
+    started = time.monotonic()
+    deadline = started + time_budget
+
+    best = None  # (objective, config index, result)
+    finished = 0
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    try:
+        futures = {executor.submit(_run_config, cfg, problem, time_budget): i for i, cfg in enumerate(configs)}
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished += 1
+                result, _ = future.result()
+                if result is None:
+                    continue
+                objective = schedule_objective(durations, severity, result[2])
+                candidate = (objective, futures[future], result)
+                if best is None or candidate[:2] < best[:2]:
+                    best = candidate
+            if best is not None and strategy == "first":
+                break
+    finally:
+        # members stop at their own deadline; don't wait for stragglers
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {
+        "result": None if best is None else best[2],
+        "config": None if best is None else configs[best[1]]["name"],
+        "objective": None if best is None else best[0],
+        "elapsed_s": time.monotonic() - started,
+        "finished": finished,
+    }
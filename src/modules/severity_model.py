@@ -0,0 +1,212 @@
+"""
+RandomForest baseline for severity_category / recommended_bed_type.
+
+Models are trained on all cores (n_jobs=-1) and saved with joblib
+together with their LabelEncoder, feature list and hold-out metrics.
+The file name is keyed by a hash of the training data and the
+hyperparameters, so training the same data twice loads the saved model
+instead of fitting again. Saved models are loaded lazily, on the first
+prediction.
+
+    model = train_model(df)                      # fit or load
+    labels = predict_severity_category(new_df)   # latest saved model
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "models"))
+
+TARGETS = ("severity_category", "recommended_bed_type")
+DEFAULT_PARAMS = {"n_estimators": 100, "max_depth": None, "random_state": 42, "test_size": 0.2}
+PREDICT_BATCH_ROWS = 65_536
+SMALL_BATCH_ROWS = 1_000  # below this, prediction runs on one core (thread start-up dominates)
+
+
+def feature_columns(df, target):
+    """Numeric columns used as features (the target and the other label columns excluded)."""
+    return [c for c in df.select_dtypes(include=[np.number]).columns if c != target and c not in TARGETS]
+
+
+def feature_matrix(df, features):
+    """float32 feature matrix in the given column order; missing columns and values are 0, as in training."""
+    if len(df) == 0:
+        return np.empty((0, len(features)), dtype=np.float32)
+    return np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").fillna(0).to_numpy(dtype=np.float32) if c in df.columns
+        else np.zeros(len(df), dtype=np.float32)
+        for c in features
+    ])
+
+
+def dataset_hash(df, features, target):
+    """Hash of the feature and target values, in row order."""
+    frame = df[features + [target]]
+    h = hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    h.update(json.dumps([features, target]).encode())
+    return h.hexdigest()
+
+
+def model_key(data_hash, params):
+    payload = json.dumps({"data": data_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class SeverityModel:
+    """
+    A fitted classifier with everything needed to score new rows.
+
+    Attributes:
+        classifier: RandomForestClassifier
+        label_encoder: LabelEncoder for the target
+        features: feature columns, in training order
+        target: target column
+        params: hyperparameters (the model key is derived from them)
+        metrics: {"accuracy", "report", "train_s", "rows"} from the hold-out split
+        key: file key (dataset hash + params)
+        cached: True when loaded from disk rather than fitted
+    """
+
+    def __init__(self, classifier, label_encoder, features, target, params, metrics, key, cached=False):
+        self.classifier = classifier
+        self.label_encoder = label_encoder
+        self.features = features
+        self.target = target
+        self.params = params
+        self.metrics = metrics
+        self.key = key
+        self.cached = cached
+        self._lock = threading.Lock()
+
+    def predict(self, df, batch_rows=PREDICT_BATCH_ROWS):
+        """Class labels for every row, predicted batch_rows at a time."""
+        out = []
+        for start in range(0, len(df), batch_rows):
+            X = feature_matrix(df.iloc[start:start + batch_rows], self.features)
+            with self._lock:
+                self.classifier.n_jobs = 1 if len(X) < SMALL_BATCH_ROWS else -1
+                codes = self.classifier.predict(X)
+            out.append(self.label_encoder.inverse_transform(codes))
+        return np.concatenate(out) if out else np.empty(0, dtype=object)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump({
+            "classifier": self.classifier, "label_encoder": self.label_encoder, "features": self.features,
+            "target": self.target, "params": self.params, "metrics": self.metrics, "key": self.key,
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = joblib.load(path)
+        return cls(data["classifier"], data["label_encoder"], data["features"], data["target"],
+                   data["params"], data["metrics"], data["key"], cached=True)
+
+
+def _model_path(target, key, model_dir):
+    return os.path.join(model_dir, f"{target}-{key}.joblib")
+
+
+def train_model(df, target="severity_category", n_jobs=-1, model_dir=MODEL_DIR, **params):
+    """
+    Fit a RandomForest for target, or load the one already saved for the
+    same data and hyperparameters.
+
+    Args:
+        df: patient DataFrame
+        target: label column
+        n_jobs: cores for fitting (-1: all); not part of the model key
+        model_dir: where models are saved (None: do not save)
+        **params: overrides for DEFAULT_PARAMS
+
+    Returns:
+        SeverityModel
+    """
+    params = dict(DEFAULT_PARAMS, **params)
+    features = feature_columns(df, target)
+    if not features:
+        raise ValueError("No numeric columns found for training.")
+    key = model_key(dataset_hash(df, features, target), params)
+    path = _model_path(target, key, model_dir) if model_dir else None
+    if path and os.path.exists(path):
+        return _remember(SeverityModel.load(path))
+
+    X = feature_matrix(df, features)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df[target].astype(str).fillna("unknown"))
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=params["test_size"], random_state=params["random_state"], stratify=y)
+    classifier = RandomForestClassifier(n_estimators=params["n_estimators"], max_depth=params["max_depth"],
+                                        random_state=params["random_state"], n_jobs=n_jobs)
+    started = time.perf_counter()
+    classifier.fit(X_train, y_train)
+    train_s = time.perf_counter() - started
+    preds = classifier.predict(X_test)
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, preds)),
+        "report": classification_report(y_test, preds, labels=np.arange(len(label_encoder.classes_)),
+                                        target_names=label_encoder.classes_, zero_division=0),
+        "train_s": round(train_s, 3),
+        "rows": len(X_train),
+    }
+    model = SeverityModel(classifier, label_encoder, features, target, params, metrics, key)
+    if path:
+        model.save(path)
+    return _remember(model)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _remember(model):
+    with _models_lock:
+        _models[model.target] = model
+    return model
+
+
+def load_model(target="severity_category", model_dir=MODEL_DIR):
+    """
+    The model for target: the one trained or loaded last in this process,
+    otherwise the newest saved file (read on first use, then kept).
+
+    Raises:
+        FileNotFoundError: no model has been trained for target
+    """
+    with _models_lock:
+        if target in _models:
+            return _models[target]
+    paths = glob.glob(_model_path(target, "*", model_dir))
+    if not paths:
+        raise FileNotFoundError(f"No saved {target} model in {model_dir}; run train_model first")
+    return _remember(SeverityModel.load(max(paths, key=os.path.getmtime)))
+
+
+def predict_severity_category(df, model=None, batch_rows=PREDICT_BATCH_ROWS):
+    """
+    Predicted severity_category for every row of df.
+
+    Args:
+        df: patient rows (missing feature columns count as 0)
+        model: SeverityModel, defaults to load_model("severity_category")
+        batch_rows: rows per predict call, bounds memory on large inputs
+
+    Returns:
+        np.ndarray of labels
+    """
+    model = model or load_model("severity_category")
+    return model.predict(df, batch_rows=batch_rows)
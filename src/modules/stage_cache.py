@@ -0,0 +1,295 @@
+"""
+Persistent cache for pipeline stage results.
+
+Fuzzy severities are stored per row, keyed by a hash of the row's four
+vitals and by the fuzzy system that scored them, so re-running triage on
+an updated dataset only scores new or changed rows. When a membership
+function changes, entries are carried over from the previous version of
+the system for every row whose inputs have zero membership in the
+changed terms under both the old and the new definition (their rule
+activations, and so their severity, are unchanged); only the affected
+rows are scored again.
+
+Severities live in Parquet part files (row hash, severity), one
+directory per fuzzy system, and are joined in memory on the sorted
+hashes. Whole-stage results (bed allocations) are JSON files named by a
+content key of their inputs and parameters.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import fuzzy_triage
+
+STAGE_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "stage_cache"))
+
+MAX_PARTS = 8  # part files per system before they are merged into one
+
+
+def row_hashes(inputs):
+    """64-bit hash of each row of the vitals arrays (vitals_to_arrays output), as int64."""
+    frame = pd.DataFrame({col: inputs[col] for col in fuzzy_triage.VITAL_COLUMNS})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+def term_fingerprints(compiled):
+    """
+    Fingerprints of a CompiledFuzzySystem split by part.
+
+    Returns:
+        ({"variable|term": hash of its universe and membership function},
+         hash of everything else: term names, output variable, rules)
+    """
+    terms = {}
+    for label, (universe, mfs) in compiled.antecedents.items():
+        for term_label, mf in mfs.items():
+            terms[f"{label}|{term_label}"] = hashlib.sha256(universe.tobytes() + mf.tobytes()).hexdigest()
+    h = hashlib.sha256(",".join(sorted(terms)).encode())
+    h.update(compiled.output_label.encode())
+    h.update(compiled.output_universe.tobytes())
+    h.update(",".join(compiled.output_terms).encode())
+    h.update(compiled.output_mfs.tobytes())
+    for antecedent, targets, and_func, or_func in compiled.rules:
+        h.update(f"{antecedent}|{targets}|{and_func.__name__}|{or_func.__name__}".encode())
+    return terms, h.hexdigest()
+
+
+def ward_map_fingerprint(ward_map):
+    """Content hash of a WardMap (None for the square grid)."""
+    if ward_map is None:
+        return None
+    h = hashlib.sha256()
+    for array in (ward_map.obstacles, ward_map.weights, ward_map.bed_cells):
+        h.update(np.ascontiguousarray(array).tobytes())
+    h.update(json.dumps([ward_map.entrances, [str(t) for t in ward_map.bed_types]]).encode())
+    return h.hexdigest()
+
+
+def _write_json(path, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(value, fh, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+    os.replace(tmp_path, path)
+
+
+def merge_stats(a, b):
+    """Sum two stats dicts (from StageCache.last_stats)."""
+    if a is None:
+        return dict(b)
+    out = {k: a[k] + b[k] for k in ("rows", "hits", "carried", "misses")}
+    out["hit_rate"] = (out["hits"] + out["carried"]) / out["rows"] if out["rows"] else 0.0
+    return out
+
+
+class StageCache:
+    """
+    On-disk cache of fuzzy severities and stage results.
+
+    Args:
+        path: cache directory, created on first use
+    """
+
+    def __init__(self, path=STAGE_CACHE_DIR):
+        self.path = path
+        self.hits = 0
+        self.carried = 0
+        self.misses = 0
+        self.last_stats = None
+        self._tables = {}  # system key -> (sorted hashes, severities)
+        self._lock = threading.RLock()
+
+    # ---------------------- Fuzzy severities ----------------------
+
+    def _system_key(self, system):
+        """Directory name for the system, writing its metadata on first use."""
+        if isinstance(system, fuzzy_triage.SeverityLookupTable):
+            key, meta, arrays = f"lut-{system.key}", {"rest": None, "terms": None}, None
+        elif isinstance(system, fuzzy_triage.SeveritySurrogate):
+            key, meta, arrays = f"surrogate-{system.key}", {"rest": None, "terms": None}, None
+        else:
+            fingerprint = fuzzy_triage.fuzzy_system_fingerprint(system)
+            terms, rest = term_fingerprints(system)
+            key, meta = fingerprint[:16], {"fingerprint": fingerprint, "rest": rest, "terms": terms}
+            arrays = {label: universe for label, (universe, mfs) in system.antecedents.items()}
+            arrays.update({f"{label}|{term}": mf for label, (universe, mfs) in system.antecedents.items()
+                           for term, mf in mfs.items()})
+        directory = os.path.join(self.path, "severity", key)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            os.makedirs(directory, exist_ok=True)
+            if arrays is not None:
+                np.savez(os.path.join(directory, "membership.npz"), **arrays)
+            _write_json(os.path.join(directory, "meta.json"), dict(meta, created=time.time()))
+        return key
+
+    def _table(self, key):
+        """(sorted hashes, severities) stored for a system, read once per process."""
+        if key not in self._tables:
+            parts = sorted(glob.glob(os.path.join(self.path, "severity", key, "part-*.parquet")))
+            if parts:
+                table = pa.concat_tables([pq.read_table(p) for p in parts])
+                hashes = table.column("row_hash").to_numpy()
+                values = table.column("severity").to_numpy()
+                order = np.argsort(hashes, kind="stable")
+                hashes, values = hashes[order], values[order]
+                # a row scored twice (concurrent runs) keeps its last value
+                last = np.append(hashes[1:] != hashes[:-1], True)
+                self._tables[key] = (hashes[last], values[last])
+            else:
+                self._tables[key] = (np.empty(0, dtype=np.int64), np.empty(0))
+            if len(parts) > MAX_PARTS:
+                self._compact(key, parts)
+        return self._tables[key]
+
+    def _compact(self, key, parts):
+        hashes, values = self._tables[key]
+        self._write_part(key, hashes, values)
+        for p in parts:
+            os.remove(p)
+
+    def _write_part(self, key, hashes, values):
+        directory = os.path.join(self.path, "severity", key)
+        path = os.path.join(directory, f"part-{time.time_ns()}-{os.getpid()}.parquet")
+        table = pa.table({"row_hash": pa.array(hashes, pa.int64()), "severity": pa.array(values, pa.float64())})
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def _append(self, key, hashes, values):
+        """Persist new entries and merge them into the in-memory table."""
+        if len(hashes) == 0:
+            return
+        self._write_part(key, hashes, values)
+        old_hashes, old_values = self._table(key)
+        all_hashes = np.concatenate([old_hashes, hashes])
+        order = np.argsort(all_hashes, kind="stable")
+        self._tables[key] = (all_hashes[order], np.concatenate([old_values, values])[order])
+
+    def _lookup(self, key, hashes):
+        """Cached severity for each hash, NaN where missing."""
+        stored, values = self._table(key)
+        out = np.full(len(hashes), np.nan)
+        if len(stored) == 0 or len(hashes) == 0:
+            return out
+        pos = np.minimum(np.searchsorted(stored, hashes), len(stored) - 1)
+        found = stored[pos] == hashes
+        out[found] = values[pos[found]]
+        return out
+
+    def _carry_over(self, system, key, hashes, inputs):
+        """
+        Severities from the latest older version of the system (same rules
+        and terms, different membership functions) for rows that no changed
+        term touches. NaN where nothing can be reused.
+        """
+        values = np.full(len(hashes), np.nan)
+        if not isinstance(system, fuzzy_triage.CompiledFuzzySystem) or len(hashes) == 0:
+            return values
+        terms, rest = term_fingerprints(system)
+        previous = None
+        for meta_path in glob.glob(os.path.join(self.path, "severity", "*", "meta.json")):
+            old_key = os.path.basename(os.path.dirname(meta_path))
+            with open(meta_path, encoding="utf-8") as fh:
+                meta = json.load(fh)
+            if old_key != key and meta["rest"] == rest and (previous is None or meta["created"] > previous[1]["created"]):
+                previous = (old_key, meta)
+        if previous is None:
+            return values
+        old_key, old_terms = previous[0], previous[1]["terms"]
+        old_arrays = np.load(os.path.join(self.path, "severity", old_key, "membership.npz"))
+
+        affected = np.zeros(len(hashes), dtype=bool)
+        for term_key in (k for k in terms if terms[k] != old_terms.get(k)):
+            label, term = term_key.split("|", 1)
+            universe, mfs = system.antecedents[label]
+            for u, mf in ((universe, mfs[term]), (old_arrays[label], old_arrays[term_key])):
+                x = np.clip(inputs[label], u[0], u[-1])
+                affected |= np.interp(x, u, mf) > 0
+        keep = ~affected
+        values[keep] = self._lookup(old_key, hashes[keep])
+        return values
+
+    def severity(self, df, system, chunk_size=fuzzy_triage.BATCH_CHUNK_SIZE):
+        """
+        compute_severity_batch with the cache in front of it.
+
+        Args:
+            df: DataFrame (or dict of arrays) with the vital sign columns
+            system: CompiledFuzzySystem, SeverityLookupTable or SeveritySurrogate
+            chunk_size: rows per inference block for the rows scored
+
+        Returns:
+            np.ndarray: severity per row; last_stats holds this call's
+            rows / hits / carried / misses / hit_rate
+        """
+        if not isinstance(system, (fuzzy_triage.SeverityLookupTable, fuzzy_triage.SeveritySurrogate)):
+            system = fuzzy_triage.compile_fuzzy_system(system)
+        inputs, _ = fuzzy_triage.vitals_to_arrays(df)
+        hashes, first, inverse = np.unique(row_hashes(inputs), return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        unique_inputs = {col: values[first] for col, values in inputs.items()}
+
+        with self._lock:
+            key = self._system_key(system)
+            values = self._lookup(key, hashes)
+            miss = np.flatnonzero(np.isnan(values))
+            values[miss] = self._carry_over(system, key, hashes[miss], {col: v[miss] for col, v in unique_inputs.items()})
+            todo = np.flatnonzero(np.isnan(values))
+            if len(todo):
+                values[todo] = fuzzy_triage.compute_severity_batch(
+                    pd.DataFrame({col: v[todo] for col, v in unique_inputs.items()}), system, chunk_size=chunk_size)
+            self._append(key, hashes[miss], values[miss])
+
+            counts = np.bincount(inverse, minlength=len(hashes))
+            misses = int(counts[todo].sum())
+            carried = int(counts[miss].sum()) - misses
+            stats = {"rows": len(inverse), "hits": len(inverse) - misses - carried, "carried": carried, "misses": misses}
+            stats["hit_rate"] = (stats["hits"] + carried) / stats["rows"] if stats["rows"] else 0.0
+            self.hits += stats["hits"]
+            self.carried += carried
+            self.misses += misses
+            self.last_stats = stats
+        return values[inverse]
+
+    # ---------------------- Stage results ----------------------
+
+    def _result_path(self, stage, key):
+        return os.path.join(self.path, "results", stage, f"{key}.json")
+
+    def get_result(self, stage, key):
+        """JSON value stored for (stage, key), or None."""
+        path = self._result_path(stage, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def set_result(self, stage, key, value):
+        path = self._result_path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_json(path, value)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.carried = self.misses = 0
+            self.last_stats = None
+            self._tables.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def stats(self):
+        """Cumulative severity lookups: hits, carried over, misses, hit_rate."""
+        total = self.hits + self.carried + self.misses
+        return {
+            "hits": self.hits,
+            "carried": self.carried,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.carried) / total if total else 0.0,
+        }
@@ -0,0 +1,241 @@
+"""
+Seeded synthetic patient datasets with the schema of
+data/hospital_patients_dataset.csv, from a thousand to tens of millions
+of rows.
+
+A profile is fitted once from the bundled CSV, per severity_category:
+class priors, a multivariate normal over the numeric columns (so vitals
+stay correlated with each other and with the class), and class
+conditional frequencies for the categorical columns and symptoms.
+Samples are clipped to the observed ranges and rounded to each column's
+precision. Missing values are injected per column at MISSING_RATES.
+
+Rows are produced in chunks, each from its own seed derived from
+(seed, chunk index), so the same seed and chunk size always give the
+same file and memory stays bounded:
+
+    python -m modules.synthetic_data --rows 10000000 --out ../data/synthetic_10m.parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv"))
+
+CHUNK_ROWS = 250_000
+CLASS_COLUMN = "severity_category"
+
+NUMERIC_COLUMNS = [
+    "age", "heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic", "spo2", "respiratory_rate",
+    "temperature", "glasgow_coma_scale", "pain_level", "hemoglobin", "white_blood_cell_count", "platelet_count",
+    "blood_sugar", "creatinine", "previous_hospitalizations", "time_since_symptoms_hours", "severity_score",
+]
+CATEGORICAL_COLUMNS = [
+    "gender", "blood_group", "consciousness_level", "diagnosis", "pre_existing_conditions", "arrival_mode",
+    "has_insurance", "recommended_bed_type",
+]
+
+# share of missing values per column, on top of what the class profile
+# produces (pre_existing_conditions is already ~8% empty in the reference);
+# vitals are occasionally not charted, labs are often still pending
+MISSING_RATES = {
+    "heart_rate": 0.01, "spo2": 0.02, "temperature": 0.02, "respiratory_rate": 0.03,
+    "blood_pressure_systolic": 0.02, "blood_pressure_diastolic": 0.02,
+    "hemoglobin": 0.08, "white_blood_cell_count": 0.08, "platelet_count": 0.08,
+    "blood_sugar": 0.05, "creatinine": 0.10,
+}
+
+_profiles = {}
+
+
+def _decimals(values):
+    """Decimal places used by a numeric column (0 for integer columns)."""
+    if pd.api.types.is_integer_dtype(values):
+        return 0
+    text = values.dropna().astype(str)
+    return int(text.str.split(".").str[1].str.len().max()) if text.str.contains(".", regex=False).any() else 0
+
+
+def fit_profile(df):
+    """
+    Per-class distributions of a reference dataset.
+
+    Returns:
+        dict with "classes", "priors", "columns" (all output columns, in
+        order) and per-class "numeric" (mean, cov), "categorical"
+        ({column: (values, probabilities)}) and "symptoms" (vocabulary
+        probabilities and symptoms-per-patient counts)
+    """
+    counts = df[CLASS_COLUMN].value_counts()
+    numeric = [c for c in NUMERIC_COLUMNS if c in df.columns]
+    symptom_lists = df["symptoms"].fillna("").str.split(r",\s*")
+    vocabulary = sorted({s for items in symptom_lists for s in items if s})
+    timestamps = pd.to_datetime(df["timestamp"])
+    profile = {
+        "classes": counts.index.tolist(),
+        "priors": (counts / counts.sum()).to_numpy(),
+        "columns": df.columns.tolist(),
+        "numeric_columns": numeric,
+        "low": df[numeric].min().to_numpy(dtype=np.float64),
+        "high": df[numeric].max().to_numpy(dtype=np.float64),
+        "decimals": [_decimals(df[c]) for c in numeric],
+        "time_range": (timestamps.min().value, timestamps.max().value),
+        "vocabulary": vocabulary,
+        "per_class": {},
+    }
+    for cls in profile["classes"]:
+        part = df[df[CLASS_COLUMN] == cls]
+        values = part[numeric].to_numpy(dtype=np.float64)
+        cov = np.cov(values, rowvar=False) if len(part) > 1 else np.zeros((len(numeric), len(numeric)))
+        categorical = {}
+        for col in (c for c in CATEGORICAL_COLUMNS if c in df.columns):
+            freq = part[col].value_counts(dropna=False, normalize=True)
+            categorical[col] = (freq.index.to_numpy(dtype=object), freq.to_numpy())
+        items = symptom_lists[part.index]
+        per_symptom = np.array([sum(s in row for row in items) for s in vocabulary], dtype=np.float64)
+        per_count = items.str.len().value_counts(normalize=True).sort_index()
+        profile["per_class"][cls] = {
+            "mean": values.mean(axis=0),
+            "cov": cov,
+            "categorical": categorical,
+            "symptom_p": per_symptom / per_symptom.sum(),
+            "symptom_counts": (per_count.index.to_numpy(), per_count.to_numpy()),
+        }
+    return profile
+
+
+def reference_profile(path=REFERENCE_PATH):
+    """fit_profile of a reference CSV, computed once per process."""
+    if path not in _profiles:
+        _profiles[path] = fit_profile(pd.read_csv(path))
+    return _profiles[path]
+
+
+def _symptoms(rng, n, profile, cls):
+    info = profile["per_class"][cls]
+    counts = rng.choice(info["symptom_counts"][0], size=n, p=info["symptom_counts"][1])
+    vocabulary = np.array(profile["vocabulary"], dtype=object)
+    # Gumbel top-k: k distinct symptoms per patient, weighted by class frequency
+    keys = np.log(np.maximum(info["symptom_p"], 1e-12)) + rng.gumbel(size=(n, len(vocabulary)))
+    order = np.argsort(-keys, axis=1)
+    return [", ".join(vocabulary[order[i, :counts[i]]]) for i in range(n)]
+
+
+def generate_chunk(n, rng, profile, start_index=0, id_width=4, missing_rates=MISSING_RATES):
+    """n synthetic rows (patient ids start after start_index)."""
+    classes = rng.choice(len(profile["classes"]), size=n, p=profile["priors"])
+    numeric = profile["numeric_columns"]
+    columns = {}
+    num = np.empty((n, len(numeric)))
+    cat = {col: np.empty(n, dtype=object) for col in profile["per_class"][profile["classes"][0]]["categorical"]}
+    symptoms = np.empty(n, dtype=object)
+    for k, cls in enumerate(profile["classes"]):
+        rows = np.flatnonzero(classes == k)
+        if len(rows) == 0:
+            continue
+        info = profile["per_class"][cls]
+        num[rows] = rng.multivariate_normal(info["mean"], info["cov"], size=len(rows), method="eigh")
+        for col, (values, p) in info["categorical"].items():
+            cat[col][rows] = values[rng.choice(len(values), size=len(rows), p=p)]
+        symptoms[rows] = _symptoms(rng, len(rows), profile, cls)
+
+    num = np.clip(num, profile["low"], profile["high"])
+    time_low, time_high = profile["time_range"]
+    for col in profile["columns"]:
+        if col == "patient_id":
+            columns[col] = [f"P{i:0{id_width}d}" for i in range(start_index + 1, start_index + n + 1)]
+        elif col == "timestamp":
+            stamps = rng.integers(time_low, time_high + 1, size=n) // 10 ** 9 * 10 ** 9
+            columns[col] = pd.to_datetime(stamps).strftime("%Y-%m-%d %H:%M:%S")
+        elif col == CLASS_COLUMN:
+            columns[col] = np.array(profile["classes"], dtype=object)[classes]
+        elif col == "symptoms":
+            columns[col] = symptoms
+        elif col in numeric:
+            j = numeric.index(col)
+            decimals = profile["decimals"][j]
+            values = np.round(num[:, j], decimals)
+            columns[col] = values.astype(np.int64) if decimals == 0 else values
+        elif col in cat:
+            columns[col] = cat[col]
+    df = pd.DataFrame(columns, columns=profile["columns"])
+    if "has_insurance" in df:
+        df["has_insurance"] = df["has_insurance"].astype(bool)
+    for col, rate in (missing_rates or {}).items():
+        if col in df and rate > 0:
+            mask = rng.random(n) < rate
+            if mask.any():
+                df[col] = df[col].astype(np.float64) if pd.api.types.is_integer_dtype(df[col]) else df[col]
+                df.loc[mask, col] = np.nan
+    return df
+
+
+def iter_patients(n_rows, seed=0, chunk_rows=CHUNK_ROWS, profile=None, missing_rates=MISSING_RATES):
+    """
+    Generator of DataFrames that together hold n_rows synthetic patients.
+
+    Args:
+        n_rows: total rows
+        seed: base seed; chunk i uses SeedSequence(seed).spawn(...)[i]
+        chunk_rows: rows per chunk (part of what the seed reproduces)
+        profile: fit_profile output, defaults to the bundled dataset
+        missing_rates: {column: share of missing values}, None for none
+    """
+    profile = profile or reference_profile()
+    n_chunks = -(-n_rows // chunk_rows) if n_rows else 0
+    id_width = max(4, len(str(n_rows)))
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        start = i * chunk_rows
+        yield generate_chunk(min(chunk_rows, n_rows - start), np.random.default_rng(child), profile,
+                             start_index=start, id_width=id_width, missing_rates=missing_rates)
+
+
+def generate_patients(n_rows, seed=0, chunk_rows=CHUNK_ROWS, profile=None, missing_rates=MISSING_RATES):
+    """All of iter_patients as one DataFrame (for sizes that fit in memory)."""
+    chunks = list(iter_patients(n_rows, seed, chunk_rows, profile, missing_rates))
+    if not chunks:
+        return generate_chunk(0, np.random.default_rng(seed), profile or reference_profile())
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_patients(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS, missing_rates=MISSING_RATES):
+    """Stream a synthetic dataset to .csv or .parquet without holding it in memory."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    parquet = os.path.splitext(path)[1] in (".parquet", ".pq")
+    writer = None
+    try:
+        for i, chunk in enumerate(iter_patients(n_rows, seed, chunk_rows, missing_rates=missing_rates)):
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.synthetic_data",
+                                     description="Write a seeded synthetic patient dataset (.csv or .parquet).")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--no-missing", action="store_true", help="only the missing values of the reference data")
+    args = parser.parse_args(argv)
+    write_patients(args.out, args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+                   missing_rates=None if args.no_missing else MISSING_RATES)
+    print(f"Wrote {args.rows} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""
+Real-time triage of a stream of monitor readings.
+
+Each event is one JSON object per line:
+
+    {"patient_id": "P0001", "heart_rate": 112, "spo2": 91, "temperature": 100.9, "respiratory_rate": 25, "ts": 1718000000.0}
+
+Vitals may be left out (a monitor that only reports SpO2): the patient's
+last reading of that vital is carried forward, and one never reported
+uses VITAL_DEFAULTS. "ts" (epoch seconds) is optional, the arrival time
+is used without it.
+
+Lines come from stdin, a followed file or a local socket and are queued
+in a bounded buffer; a producer that gets more than max_pending lines
+ahead waits, which for sockets stops reading and lets TCP flow control
+slow the sender. The consumer takes micro-batches of up to max_batch
+lines, waiting at most max_wait seconds for a batch to fill (latency vs
+throughput), parses the whole batch with one json.loads and scores it
+with the vectorized fuzzy engine.
+
+PatientWindows keeps the last `window` readings and severities of every
+patient in preallocated ring buffers. A band-change event is emitted
+whenever a patient's severity moves into another band of BANDS:
+
+    {"patient_id": "P0001", "ts": ..., "severity": 0.71, "band": "high", "previous_band": "medium",
+     "window_mean": 0.58, "window_readings": 12}
+
+    python -m modules.triage_stream --fuzzy lut < readings.jsonl
+    python -m modules.triage_stream --tail /var/log/monitors.jsonl
+    python -m modules.triage_stream --socket /tmp/triage.sock --max-wait-ms 2
+"""
+
+import argparse
+import asyncio
+import collections
+import inspect
+import json
+import operator
+import os
+import sys
+import time
+
+import numpy as np
+
+from . import fuzzy_triage
+from . import instrumentation
+
+# (upper bound, name); the bounds sit where the low / medium / high output
+# terms of build_fuzzy_system cross
+BANDS = ((0.35, "low"), (0.65, "medium"), (float("inf"), "high"))
+
+WINDOW = 16
+MAX_BATCH = 4096
+MAX_WAIT = 0.005
+MAX_PENDING = 4 * MAX_BATCH  # bounds queueing delay to a few batches
+READ_BYTES = 1 << 16
+LATENCY_SAMPLES = 10000
+
+VITALS = fuzzy_triage.VITAL_COLUMNS
+
+try:  # optional, about 3x faster than json on these small objects
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+
+class PatientWindows:
+    """
+    The last `window` readings of every patient, in preallocated arrays.
+
+    readings[slot, i] holds the vitals (VITALS order) and the severity as
+    float32 and times[slot, i] the event time, with i = reading number %
+    window. head[slot] counts the readings written so far, last[slot] the
+    last known value of each vital and band[slot] the current band (-1
+    before the first reading). Patient ids map to slots through a dict;
+    a discharged patient's slot is reused. Memory is about 450 bytes per
+    patient for the default window of 16.
+    """
+
+    def __init__(self, window=WINDOW, capacity=1024, band_edges=tuple(b for b, _ in BANDS[:-1])):
+        self.window = window
+        self.band_edges = np.asarray(band_edges, dtype=np.float64)
+        self.slots = {}   # patient id -> slot
+        self.ids = []     # slot -> patient id
+        self._free = []
+        self.readings = np.full((0, window, len(VITALS) + 1), np.nan, dtype=np.float32)
+        self.times = np.zeros((0, window))
+        self.head = np.zeros(0, dtype=np.int64)
+        self.last = np.full((0, len(VITALS)), np.nan)
+        self.band = np.zeros(0, dtype=np.int8)
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _grow(self, capacity):
+        n = len(self.head)
+        self.readings = np.concatenate([self.readings, np.full((capacity - n,) + self.readings.shape[1:], np.nan,
+                                                               dtype=np.float32)])
+        self.times = np.concatenate([self.times, np.zeros((capacity - n, self.window))])
+        self.head = np.concatenate([self.head, np.zeros(capacity - n, dtype=np.int64)])
+        self.last = np.concatenate([self.last, np.full((capacity - n, len(VITALS)), np.nan)])
+        self.band = np.concatenate([self.band, np.full(capacity - n, -1, dtype=np.int8)])
+
+    def slots_for(self, ids):
+        """Slot of every id, adding the patients seen for the first time."""
+        get = self.slots.get
+        slots = np.fromiter((get(pid, -1) for pid in ids), dtype=np.int64, count=len(ids))
+        for i in np.flatnonzero(slots < 0):
+            pid = ids[i]
+            slot = self.slots.get(pid)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self.ids)
+                    self.ids.append(None)
+                    if slot >= len(self.head):
+                        self._grow(2 * len(self.head))
+                self.slots[pid] = slot
+                self.ids[slot] = pid
+            slots[i] = slot
+        return slots
+
+    def discharge(self, patient_id):
+        """Forget a patient; returns False if unknown."""
+        slot = self.slots.pop(patient_id, None)
+        if slot is None:
+            return False
+        self.ids[slot] = None
+        self.readings[slot] = np.nan
+        self.head[slot] = 0
+        self.last[slot] = np.nan
+        self.band[slot] = -1
+        self._free.append(slot)
+        return True
+
+    def update(self, ids, vitals, times, score):
+        """
+        Append one batch of readings.
+
+        Args:
+            ids: patient id per reading, in arrival order
+            vitals: float64 array (n, len(VITALS)), NaN where not reported
+            times: float64 array (n,) of event times
+            score: callable({vital: array}) -> severity array
+
+        Returns:
+            (slots, severity, band, previous band), arrays in the order of
+            ids; previous band is -1 for a patient's first reading
+        """
+        n = len(ids)
+        slots = self.slots_for(ids)
+        # group each patient's readings together, keeping arrival order within a patient
+        order = np.argsort(slots, kind="stable")
+        s = slots[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = s[1:] != s[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+        positions = np.arange(n)
+        starts = np.maximum.accumulate(np.where(first, positions, 0))
+
+        # carry each vital forward from the patient's previous reading (in
+        # this batch if there is one, else from the window), then default
+        filled = vitals[order]
+        for j, col in enumerate(VITALS):
+            v = filled[:, j]
+            known = np.maximum.accumulate(np.where(np.isnan(v), -1, positions))
+            in_batch = known >= starts
+            v = np.where(in_batch, v[np.maximum(known, 0)], self.last[s, j])
+            filled[:, j] = np.where(np.isnan(v), fuzzy_triage.VITAL_DEFAULTS[col], v)
+        self.last[s[last]] = filled[last]
+
+        severity = np.asarray(score({col: filled[:, j] for j, col in enumerate(VITALS)}), dtype=np.float64)
+
+        ring = (self.head[s] + positions - starts) % self.window
+        self.readings[s, ring, :len(VITALS)] = filled
+        self.readings[s, ring, len(VITALS)] = severity
+        self.times[s, ring] = times[order]
+        self.head[s[last]] += (positions - starts + 1)[last]
+
+        band = np.searchsorted(self.band_edges, severity, side="right").astype(np.int8)
+        previous = np.where(first, self.band[s], np.roll(band, 1))
+        self.band[s[last]] = band[last]
+
+        out = np.empty(n, dtype=np.int64)
+        out[order] = positions
+        return slots, severity[out], band[out], previous[out]
+
+    def window_stats(self, slots):
+        """(mean severity, readings held) of the windows of slots."""
+        held = np.minimum(self.head[slots], self.window)
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(self.readings[slots, :, len(VITALS)], axis=1) if len(slots) else np.empty(0)
+        return mean, held
+
+
+class TriageStream:
+    """
+    Bounded micro-batching front end of PatientWindows.
+
+    Args:
+        system: fuzzy engine for compute_severity_batch, default
+            pipeline.fuzzy_system(fuzzy)
+        fuzzy: "exact", "lut" or "surrogate" when system is None
+        max_batch: most lines scored together
+        max_wait: seconds the consumer waits for a batch to fill (0 scores
+            whatever is queued right away)
+        max_pending: queued lines at which put() starts waiting
+        window: readings kept per patient
+        bands: ((upper bound, name), ...), ascending
+        on_change: called with each batch's list of band-change events; may
+            be a coroutine function (awaited, so a slow sink slows intake)
+        emit_initial: also emit an event for a patient's first reading
+    """
+
+    def __init__(self, system=None, fuzzy="exact", max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_pending=MAX_PENDING,
+                 window=WINDOW, bands=BANDS, on_change=None, emit_initial=False):
+        if system is None:
+            from .pipeline import fuzzy_system
+            system = fuzzy_system(fuzzy)
+        self.system = system
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.band_names = [name for _, name in bands]
+        self.windows = PatientWindows(window, band_edges=[b for b, _ in bands[:-1]])
+        self.on_change = on_change
+        self.emit_initial = emit_initial
+        self.stats = {"events": 0, "bad_events": 0, "batches": 0, "band_changes": 0, "backpressure_waits": 0,
+                      "max_pending": 0, "max_latency_s": 0.0}
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)  # queue-to-scored seconds of recent batches
+        self._chunks = collections.deque()  # [lines, enqueue time]
+        self._pending = 0
+        self._closed = False
+        self._has_data = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+
+    # ---------------------- Intake ----------------------
+
+    async def put(self, lines):
+        """Queue a list of lines (bytes or str), waiting while max_pending lines are queued."""
+        if not lines:
+            return
+        while self._pending >= self.max_pending:
+            self.stats["backpressure_waits"] += 1
+            self._has_room.clear()
+            await self._has_room.wait()
+        self._chunks.append([lines, time.perf_counter()])
+        self._pending += len(lines)
+        self.stats["max_pending"] = max(self.stats["max_pending"], self._pending)
+        self._has_data.set()
+
+    def close(self):
+        """No more input: run() scores what is queued and returns."""
+        self._closed = True
+        self._has_data.set()
+
+    def _take(self, n):
+        """Up to n queued lines and the enqueue time of the oldest."""
+        lines, oldest = [], self._chunks[0][1]
+        while self._chunks and len(lines) < n:
+            chunk = self._chunks[0]
+            need = n - len(lines)
+            if len(chunk[0]) <= need:
+                lines.extend(chunk[0])
+                self._chunks.popleft()
+            else:
+                lines.extend(chunk[0][:need])
+                chunk[0] = chunk[0][need:]
+        self._pending -= len(lines)
+        self._has_room.set()
+        return lines, oldest
+
+    async def _next_batch(self):
+        while not self._pending:
+            if self._closed:
+                return None, None
+            self._has_data.clear()
+            await self._has_data.wait()
+        if self._pending < self.max_batch and self.max_wait > 0 and not self._closed:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.max_wait
+            while self._pending < self.max_batch and not self._closed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._has_data.clear()
+                try:
+                    await asyncio.wait_for(self._has_data.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return self._take(self.max_batch)
+
+    async def run(self):
+        """Score batches until close() and an empty queue; returns stats."""
+        while True:
+            lines, oldest = await self._next_batch()
+            if lines is None:
+                return self.stats
+            events = self.process(lines)
+            latency = time.perf_counter() - oldest
+            self.latencies.append(latency)
+            self.stats["max_latency_s"] = max(self.stats["max_latency_s"], latency)
+            instrumentation.observe("stream_batch_latency_seconds", latency)
+            if events and self.on_change is not None:
+                result = self.on_change(events)
+                if inspect.isawaitable(result):
+                    await result
+            await asyncio.sleep(0)  # let producers refill while the next batch would otherwise start at once
+
+    def latency_quantiles(self, qs=(0.5, 0.99)):
+        """Quantiles of the recent batch latencies (oldest queued line to scored), in seconds."""
+        if not self.latencies:
+            return {f"p{round(q * 100)}": None for q in qs}
+        values = np.quantile(np.fromiter(self.latencies, dtype=np.float64), qs)
+        return {f"p{round(q * 100)}": float(v) for q, v in zip(qs, values)}
+
+    # ---------------------- Scoring ----------------------
+
+    def parse(self, lines):
+        """(patient ids, vitals (n, 4) with NaN gaps, ts with NaN gaps) of the valid events in lines."""
+        if not lines:
+            return [], np.empty((0, len(VITALS))), np.empty(0)
+        text = b"[" + b",".join(lines) + b"]" if isinstance(lines[0], bytes) else "[" + ",".join(lines) + "]"
+        try:
+            events = _loads(text)
+            # fast path: every event is an object with an id and all four vitals
+            ids = list(map(_get_id, events))
+            vitals = np.array(list(map(_get_vitals, events)), dtype=np.float64).reshape(len(events), len(VITALS))
+            # ids must be hashable scalars, as _parse_slow checks one by one
+            if not set(map(type, ids)) <= _ID_TYPES:
+                raise KeyError("patient_id")
+        except (ValueError, TypeError, KeyError):
+            ids, vitals, events = self._parse_slow(lines)
+        ts = _floats([e.get("ts") for e in events])
+        return ids, vitals, ts
+
+    def _parse_slow(self, lines):
+        """parse() line by line, skipping (and counting) malformed events."""
+        events = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = _loads(line)
+            except ValueError:
+                event = None
+            if type(event) is dict and isinstance(event.get("patient_id"), (str, int)):
+                events.append(event)
+            else:
+                self.stats["bad_events"] += 1
+        ids = [e["patient_id"] for e in events]
+        vitals = np.empty((len(events), len(VITALS)))
+        for j, col in enumerate(VITALS):
+            vitals[:, j] = _floats([e.get(col) for e in events])
+        return ids, vitals, events
+
+    def _score(self, inputs):
+        return fuzzy_triage.compute_severity_batch(inputs, self.system)
+
+    def process(self, lines):
+        """Score one batch of lines synchronously; returns its band-change events."""
+        with instrumentation.timer("stream_batch"):
+            ids, vitals, ts = self.parse(lines)
+            if not ids:
+                return []
+            ts = np.where(np.isnan(ts), time.time(), ts)
+            slots, severity, band, previous = self.windows.update(ids, vitals, ts, self._score)
+            changed = np.flatnonzero(band != previous) if self.emit_initial else \
+                np.flatnonzero((band != previous) & (previous >= 0))
+            mean, held = self.windows.window_stats(slots[changed])
+        self.stats["events"] += len(ids)
+        self.stats["batches"] += 1
+        self.stats["band_changes"] += len(changed)
+        instrumentation.count("stream_events_total", len(ids))
+        instrumentation.count("stream_band_changes_total", len(changed))
+        names = self.band_names
+        return [{
+            "patient_id": ids[i], "ts": float(ts[i]), "severity": round(float(severity[i]), 4),
+            "band": names[band[i]], "previous_band": names[previous[i]] if previous[i] >= 0 else None,
+            "window_mean": round(float(m), 4), "window_readings": int(h),
+        } for i, m, h in zip(changed, mean, held)]
+
+
+_get_id = operator.itemgetter("patient_id")
+_get_vitals = operator.itemgetter(*VITALS)
+# patient id types the fast path accepts as is (anything else goes through _parse_slow)
+_ID_TYPES = {str, int}
+
+
+def _floats(values):
+    """float64 array of JSON values, NaN for missing or non-numeric ones."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+# ---------------------- Sources ----------------------
+
+async def feed_reader(stream, reader, read_bytes=READ_BYTES):
+    """Queue the lines of an asyncio StreamReader until EOF."""
+    rest = b""
+    while True:
+        data = await reader.read(read_bytes)
+        if not data:
+            break
+        lines = (rest + data).split(b"\n")
+        rest = lines.pop()
+        await stream.put(lines)
+    if rest.strip():
+        await stream.put([rest])
+
+
+async def feed_file(stream, path, follow=False, poll=0.1, read_bytes=READ_BYTES, from_start=True):
+    """
+    Queue the lines of a file; with follow=True keep reading what is
+    appended (tail -F style, a truncated file is read again from the top)
+    until cancelled.
+    """
+    rest = b""
+    with open(path, "rb") as fh:
+        if not from_start:
+            fh.seek(0, os.SEEK_END)
+        while True:
+            data = fh.read(read_bytes)
+            if data:
+                lines = (rest + data).split(b"\n")
+                rest = lines.pop()
+                await stream.put(lines)
+                continue
+            if not follow:
+                break
+            if os.stat(path).st_size < fh.tell():
+                fh.seek(0)
+                rest = b""
+            await asyncio.sleep(poll)
+    if rest.strip():
+        await stream.put([rest])
+
+
+async def feed_stdin(stream, read_bytes=READ_BYTES):
+    """Queue stdin: a pipe is read asynchronously, a redirected file directly."""
+    try:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=read_bytes)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+    except ValueError:  # regular file: not pollable
+        await feed_file(stream, sys.stdin.fileno(), read_bytes=read_bytes)
+        return
+    await feed_reader(stream, reader, read_bytes)
+
+
+async def serve(stream, path=None, host="127.0.0.1", port=None):
+    """
+    Accept readings on a Unix socket (path) or a local TCP port; every
+    connection is one JSON-lines stream. Returns the asyncio Server.
+    """
+    async def handle(reader, writer):
+        try:
+            await feed_reader(stream, reader)
+        finally:
+            writer.close()
+
+    if path is not None:
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(handle, path=path)
+    return await asyncio.start_server(handle, host=host, port=port)
+
+
+# ---------------------- CLI ----------------------
+
+async def _run_cli(args):
+    out = sys.stdout
+
+    def emit(events):
+        out.write("".join(json.dumps(e) + "\n" for e in events))
+        out.flush()
+
+    stream = TriageStream(fuzzy=args.fuzzy, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                          max_pending=args.max_pending, window=args.window, on_change=emit,
+                          emit_initial=args.emit_initial)
+    consumer = asyncio.create_task(stream.run())
+    if args.socket or args.port:
+        server = await serve(stream, path=args.socket, port=args.port)
+        print(f"Listening on {args.socket or f'127.0.0.1:{args.port}'}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    elif args.tail:
+        await feed_file(stream, args.tail, follow=True, from_start=args.from_start)
+    else:
+        await feed_stdin(stream)
+    stream.close()
+    await consumer
+    return dict(stream.stats, latency_s=stream.latency_quantiles())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.triage_stream",
+                                     description="Score a JSON-lines stream of vitals and print band changes.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--tail", help="follow this file (default: read stdin)")
+    source.add_argument("--socket", help="listen on this Unix socket")
+    source.add_argument("--port", type=int, help="listen on this local TCP port")
+    parser.add_argument("--from-start", action="store_true", help="with --tail, read the existing lines first")
+    parser.add_argument("--fuzzy", choices=["exact", "lut", "surrogate"], default="exact")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--emit-initial", action="store_true", help="also print each patient's first band")
+    parser.add_argument("--metrics", help="write metrics (.prom / .json) on exit")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        stats = asyncio.run(_run_cli(args))
+        print(json.dumps(stats), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.metrics:
+            instrumentation.write_metrics(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Ward floor-plan model used for bed routing.
+
+A ward is a 2-D grid with walls, weighted corridors, one or more triage
+entrances and typed beds. Distances from the entrances are computed once
+with Dijkstra and cached on the map, so bed allocation only reads them.
+
+Text format (one character per cell):
+
+    #      wall
+    .      corridor (cost 1)
+    1-9    slow corridor, cost = digit
+    L      elevator (cost ELEVATOR_COST)
+    E      triage entrance, numbered 0.. in row-major order
+    I/H/G  ICU / HDU / General Ward bed
+
+Blank lines and lines starting with ";" are ignored. The cost of a cell
+is paid when stepping onto it.
+"""
+
+import heapq
+import os
+
+import numpy as np
+
+from . import instrumentation
+
+ELEVATOR_COST = 3.0
+
+BED_CODES = {"I": "ICU", "H": "HDU", "G": "General Ward"}
+BED_LETTERS = {v: k for k, v in BED_CODES.items()}
+
+
+class WardMap:
+    def __init__(self, obstacles, weights, entrances, bed_cells, bed_types):
+        """
+        Args:
+            obstacles: bool array (rows, cols), True for walls
+            weights: float array (rows, cols), cost of stepping onto a cell
+            entrances: list of (row, col) entrance cells
+            bed_cells: int array (n_beds, 2) of bed coordinates
+            bed_types: array (n_beds,) of bed type names
+        """
+        self.obstacles = np.asarray(obstacles, dtype=bool)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.entrances = [tuple(int(v) for v in e) for e in entrances]
+        self.bed_cells = np.asarray(bed_cells, dtype=np.int32).reshape(-1, 2)
+        self.bed_types = np.asarray(bed_types, dtype=object)
+        if self.obstacles.shape != self.weights.shape:
+            raise ValueError("obstacles and weights must have the same shape")
+        if not self.entrances:
+            raise ValueError("Ward map needs at least one entrance")
+        self._fields = {}
+
+    @property
+    def shape(self):
+        return self.obstacles.shape
+
+    # ---------------------- Loading ----------------------
+
+    @classmethod
+    def from_text(cls, text):
+        rows = [line.rstrip("\n") for line in text.splitlines()]
+        rows = [r for r in rows if r.strip() and not r.lstrip().startswith(";")]
+        if not rows:
+            raise ValueError("Empty ward map")
+        width = max(len(r) for r in rows)
+
+        obstacles = np.zeros((len(rows), width), dtype=bool)
+        weights = np.ones((len(rows), width), dtype=np.float32)
+        entrances, bed_cells, bed_types = [], [], []
+
+        for i, row in enumerate(rows):
+            for j, ch in enumerate(row.ljust(width, "#")):
+                if ch == "#":
+                    obstacles[i, j] = True
+                elif ch.isdigit() and ch != "0":
+                    weights[i, j] = float(ch)
+                elif ch == "L":
+                    weights[i, j] = ELEVATOR_COST
+                elif ch == "E":
+                    entrances.append((i, j))
+                elif ch in BED_CODES:
+                    bed_cells.append((i, j))
+                    bed_types.append(BED_CODES[ch])
+                elif ch != ".":
+                    raise ValueError(f"Unknown ward map symbol {ch!r} at row {i}, col {j}")
+
+        return cls(obstacles, weights, entrances, bed_cells, bed_types)
+
+    @classmethod
+    def load(cls, path):
+        """Load a ward map from a .txt floor plan or a .npz saved with save()."""
+        if os.path.splitext(path)[1] == ".npz":
+            data = np.load(path, allow_pickle=False)
+            return cls(data["obstacles"], data["weights"], data["entrances"],
+                       data["bed_cells"], data["bed_types"].astype(object))
+        with open(path, encoding="utf-8") as fh:
+            return cls.from_text(fh.read())
+
+    @classmethod
+    def empty_grid(cls, grid_size, bed_type="General Ward"):
+        """The legacy layout: open square grid, every cell a bed, entrance at (0, 0)."""
+        cells = [(i, j) for i in range(grid_size) for j in range(grid_size)]
+        return cls(np.zeros((grid_size, grid_size), dtype=bool),
+                   np.ones((grid_size, grid_size), dtype=np.float32),
+                   [(0, 0)], cells, [bed_type] * len(cells))
+
+    def save(self, path):
+        np.savez_compressed(path, obstacles=self.obstacles, weights=self.weights,
+                            entrances=np.asarray(self.entrances, dtype=np.int32).reshape(-1, 2),
+                            bed_cells=self.bed_cells, bed_types=self.bed_types.astype(str))
+
+    # ---------------------- Distance index ----------------------
+
+    def distance_field(self, entrance=None):
+        """
+        Shortest-path cost from an entrance (index) to every cell, or from
+        the nearest entrance when entrance is None. Cached per map.
+        """
+        key = "any" if entrance is None else int(entrance)
+        if key not in self._fields:
+            sources = self.entrances if entrance is None else [self.entrances[key]]
+            field = _dijkstra(self.weights, self.obstacles, sources)
+            field.flags.writeable = False
+            self._fields[key] = field
+        return self._fields[key]
+
+    def build_index(self):
+        """Precompute the per-entrance and nearest-entrance fields up front."""
+        for e in range(len(self.entrances)):
+            self.distance_field(e)
+        self.distance_field(None)
+        return self
+
+    def bed_distances(self, entrance=None):
+        field = self.distance_field(entrance)
+        return field[self.bed_cells[:, 0], self.bed_cells[:, 1]]
+
+
+def _dijkstra(weights, obstacles, sources):
+    """Multi-source Dijkstra on a 4-connected grid with per-cell entry costs."""
+    rows, cols = weights.shape
+    w = weights.ravel().tolist()
+    blocked = obstacles.ravel().tolist()
+    inf = float("inf")
+    dist = [inf] * (rows * cols)
+
+    heap = []
+    for r, c in sources:
+        idx = r * cols + c
+        dist[idx] = 0.0
+        heap.append((0.0, idx))
+    heapq.heapify(heap)
+    expanded, pushes = 0, len(heap)
+
+    while heap:
+        d, idx = heapq.heappop(heap)
+        if d > dist[idx]:
+            continue
+        expanded += 1
+        r, c = divmod(idx, cols)
+        for nidx, ok in ((idx - cols, r > 0), (idx + cols, r < rows - 1),
+                         (idx - 1, c > 0), (idx + 1, c < cols - 1)):
+            if ok and not blocked[nidx]:
+                nd = d + w[nidx]
+                if nd < dist[nidx]:
+                    dist[nidx] = nd
+                    heapq.heappush(heap, (nd, nidx))
+                    pushes += 1
+
+    instrumentation.count("allocation_dijkstra_nodes_expanded_total", expanded)
+    instrumentation.count("allocation_dijkstra_heap_pushes_total", pushes)
+    return np.asarray(dist, dtype=np.float64).reshape(rows, cols)
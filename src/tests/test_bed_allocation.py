@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from modules import a_star_bed_allocation as bed_alloc
+from modules.ward_map import WardMap
+
+WARD = """
+E....
+.I#G.
+.H#G.
+.G..G
+"""
+
+
+def _assigned(allocations):
+    return sum(a["Assigned_Bed"] != "None" for a in allocations)
+
+
+def _patients(severities, **extra):
+    return [dict({"patient_id": f"P{i}", "fuzzy_severity": s}, **extra) for i, s in enumerate(severities)]
+
+
+@pytest.mark.parametrize("severities", [[0.0] * 6, [0.9, 0.0, 0.5, 0.0, 0.2, 0.7]])
+def test_optimal_assigns_as_many_as_greedy_including_zero_severity(severities):
+    patients = _patients(severities)
+    greedy = bed_alloc.allocate_beds(patients, grid_size=6, mode="greedy")
+    optimal = bed_alloc.allocate_beds(patients, grid_size=6, mode="optimal")
+    assert _assigned(greedy) == _assigned(optimal) == len(patients)
+    assert all(np.isfinite(a["Distance_Cost"]) for a in optimal)
+
+
+def test_optimal_missing_severity_is_still_assigned():
+    patients = [{"patient_id": "P0"}, {"patient_id": "P1", "fuzzy_severity": 0.4}]
+    optimal = bed_alloc.allocate_beds(patients, grid_size=3, mode="optimal")
+    assert _assigned(optimal) == 2
+
+
+def test_optimal_serves_most_severe_when_beds_run_out():
+    patients = _patients([0.1, 0.9, 0.0, 0.5, 0.3])
+    optimal = bed_alloc.allocate_beds(patients, grid_size=2, mode="optimal")
+    served = {a["Patient"] for a in optimal if a["Assigned_Bed"] != "None"}
+    assert served == {"P1", "P3", "P4", "P0"}
+
+
+def test_optimal_never_worse_than_greedy_on_ward_map():
+    ward = WardMap.from_text(WARD)
+    rng = np.random.default_rng(0)
+    patients = _patients(np.round(rng.random(7), 2).tolist())
+    for p, t in zip(patients, ["ICU", "HDU", "General Ward", None, "General Ward", "General Ward", "ICU"]):
+        if t is not None:
+            p["recommended_bed_type"] = t
+    report = bed_alloc.compare_allocation_modes(patients, ward_map=ward)
+    assert report["optimal"]["unassigned"] <= report["greedy"]["unassigned"]
+    if report["optimal"]["unassigned"] == report["greedy"]["unassigned"]:
+        assert report["optimal"]["objective"] <= report["greedy"]["objective"] + 1e-9
+
+
+def test_optimal_blocked_path_assigns_zero_severity(monkeypatch):
+    monkeypatch.setattr(bed_alloc, "OPTIMAL_DENSE_CELLS", 0)
+    patients = _patients([0.0] * 10 + [0.8] * 5)
+    optimal = bed_alloc._allocate_beds_optimal(patients, WardMap.empty_grid(5), respect_types=False, block_size=4)
+    assert _assigned(optimal) == len(patients)
+
+
+def test_bed_allocator_matches_greedy_except_unreachable_beds():
+    ward = WardMap.from_text("E.G.#G\n..G.##\n")
+    patients = _patients([0.9, 0.7, 0.5, 0.3], recommended_bed_type="General Ward")
+    greedy = bed_alloc.allocate_beds(patients, ward_map=ward)
+    allocator = bed_alloc.BedAllocator(ward_map=ward)
+    live = [allocator.admit(p) for p in patients]
+    # two reachable General Ward beds: same beds in the same order
+    assert [a["Assigned_Bed"] for a in live[:2]] == [a["Assigned_Bed"] for a in greedy[:2]]
+    # the walled-off bed goes to the third patient without a cost; the allocator queues them
+    assert greedy[2]["Assigned_Bed"] == "Bed-0-5" and np.isnan(greedy[2]["Distance_Cost"])
+    assert live[2] is None and live[3] is None
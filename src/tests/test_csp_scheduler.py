@@ -0,0 +1,206 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import csp_scheduler as csp
+from modules import pipeline
+from modules.resource_calendar import ResourceCalendar
+
+
+def _cases(n, seed=0, max_duration=4):
+    rng = np.random.default_rng(seed)
+    return [{"patient_id": f"P{i}", "fuzzy_severity": round(float(s), 3), "duration_slots": int(d)}
+            for i, (s, d) in enumerate(zip(rng.random(n), rng.integers(1, max_duration + 1, n)))]
+
+
+def _occupied(schedule, durations, timeslots):
+    """(resource, slot) -> patient ids, for doctors and rooms."""
+    used = {}
+    for entry in schedule:
+        start = timeslots.index(entry["Time"])
+        for t in range(start, start + durations[entry["Patient_ID"]]):
+            for resource in (entry["Doctor"], entry["Room"]):
+                used.setdefault((resource, t), []).append(entry["Patient_ID"])
+    return used
+
+
+def test_propagate_schedules_a_full_day_without_double_booking():
+    timeslots = csp.day_timeslots()
+    doctors = [f"Dr {i}" for i in range(12)]
+    rooms = [f"OR {i}" for i in range(10)]
+    cases = _cases(120)
+    schedule = csp.build_schedule(cases, doctors, rooms, timeslots, max_cases=None)
+    assert "Error" not in schedule[0] and len(schedule) == len(cases)
+    durations = {c["patient_id"]: c["duration_slots"] for c in cases}
+    assert all(len(ids) == 1 for ids in _occupied(schedule, durations, timeslots).values())
+    for entry in schedule:
+        assert timeslots.index(entry["Time"]) + durations[entry["Patient_ID"]] <= len(timeslots)
+
+
+def test_propagate_and_reference_agree_on_small_instances():
+    for n in (3, 5):
+        cases = [dict(c, duration_slots=1) for c in _cases(n, seed=n)]
+        propagate = csp.build_schedule(cases, max_cases=None)
+        reference = csp.build_schedule(cases, max_cases=None, engine="reference")
+        assert sorted(e["Patient_ID"] for e in propagate) == sorted(e["Patient_ID"] for e in reference)
+
+
+def test_infeasible_input_reports_an_error():
+    # 2 rooms x 4 slots cannot hold 9 one-slot cases
+    cases = [dict(c, duration_slots=1) for c in _cases(9)]
+    assert "Error" in csp.build_schedule(cases, max_cases=None)[0]
+
+
+def test_max_cases_takes_the_most_severe():
+    cases = _cases(30, seed=3, max_duration=1)
+    schedule = csp.build_schedule(cases, max_cases=5)
+    expected = [c["patient_id"] for c in sorted(cases, key=lambda c: c["fuzzy_severity"], reverse=True)[:5]]
+    assert [e["Patient_ID"] for e in schedule] == expected
+
+
+CALENDAR_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "calendar")
+DIAGNOSES = ["Fracture", "Stroke", "Appendicitis", "Gastrointestinal Bleeding", "Heart Attack", "Sepsis", "Burns"]
+
+
+def _assert_rooms_eligible(schedule, calendar):
+    for entry in schedule:
+        _, room_ok = calendar.case_requirements([{"diagnosis": entry["Diagnosis"]}])
+        assert room_ok[0, calendar.rooms.index(entry["Room"])], entry
+
+
+def _calendar_schedule(n=14):
+    calendar = ResourceCalendar.load_dir(CALENDAR_DIR)
+    cases = [dict(c, diagnosis=DIAGNOSES[i % len(DIAGNOSES)]) for i, c in enumerate(_cases(n, seed=5))]
+    for c in cases:
+        del c["duration_slots"]  # from the procedure table
+    schedule = csp.build_schedule(cases, max_cases=None, calendar=calendar)
+    assert "Error" not in schedule[0]
+    return calendar, schedule
+
+
+def test_schedule_entries_record_the_diagnosis():
+    calendar, schedule = _calendar_schedule()
+    assert {e["Diagnosis"] for e in schedule} == set(DIAGNOSES)
+    _assert_rooms_eligible(schedule, calendar)
+
+
+def test_reschedule_after_block_keeps_rooms_eligible():
+    calendar, schedule = _calendar_schedule()
+    changes = {"block": [{"room": "OR 1", "start": "07:00"}, {"room": "OR 2", "start": "10:00", "end": "12:00"}]}
+    repaired, diff = csp.reschedule(schedule, changes, calendar=calendar)
+    assert all(e["Room"] != "OR 1" for e in repaired)
+    _assert_rooms_eligible(repaired, calendar)
+    # diagnoses survive the repair, so a second one still sees them
+    again, _ = csp.reschedule(repaired, {"block": [{"room": "OR 3", "start": "07:00"}]}, calendar=calendar)
+    _assert_rooms_eligible(again, calendar)
+
+
+def test_reschedule_reopens_kept_case_whose_room_lost_eligibility():
+    calendar, schedule = _calendar_schedule()
+    entry = next(e for e in schedule if e["Diagnosis"] == "Appendicitis")
+    # switch the case to a procedure its room has no equipment for
+    update = {"patient_id": entry["Patient_ID"], "diagnosis": "Burns"}
+    repaired, diff = csp.reschedule(schedule, {"update": [update]}, calendar=calendar)
+    moved = next(e for e in repaired if e["Patient_ID"] == entry["Patient_ID"])
+    assert moved["Room"] == "Burns Unit"
+    _assert_rooms_eligible(repaired, calendar)
+
+
+def test_reschedule_emergency_with_diagnosis_gets_an_equipped_room():
+    calendar, schedule = _calendar_schedule()
+    emergency = {"patient_id": "EMERG", "fuzzy_severity": 0.99, "diagnosis": "Heart Attack"}
+    repaired, diff = csp.reschedule(schedule, {"add": [emergency]}, calendar=calendar)
+    added = next(e for e in repaired if e["Patient_ID"] == "EMERG")
+    assert added["Room"] == "OR 1"
+    _assert_rooms_eligible(repaired, calendar)
+
+
+def test_reschedule_without_calendar_keeps_multi_slot_cases_booked():
+    schedule = csp.build_schedule([{"patient_id": "P0", "fuzzy_severity": 0.9, "duration_slots": 4}],
+                                  doctors=["D1"], rooms=["R1"])
+    assert schedule[0]["Duration_Slots"] == 4
+    emergency = {"patient_id": "E", "fuzzy_severity": 0.95, "duration_slots": 2}
+    repaired, diff = csp.reschedule(schedule, {"add": [emergency]}, doctors=["D1"], rooms=["R1"])
+    # P0 fills the whole day on the only doctor and room, so the more severe E displaces it
+    assert [e["Patient_ID"] for e in repaired] == ["E"]
+    assert [(d["Patient_ID"], d["Change"]) for d in diff] == [("E", "added"), ("P0", "unscheduled")]
+
+
+def test_reschedule_without_calendar_places_around_multi_slot_cases():
+    cases = [{"patient_id": "P0", "fuzzy_severity": 0.9, "duration_slots": 2}]
+    schedule = csp.build_schedule(cases, doctors=["D1"], rooms=["R1"])
+    emergency = {"patient_id": "E", "fuzzy_severity": 0.5, "duration_slots": 2}
+    repaired, diff = csp.reschedule(schedule, {"add": [emergency]}, doctors=["D1"], rooms=["R1"])
+    by_id = {e["Patient_ID"]: e for e in repaired}
+    assert by_id["P0"]["Time"] == "9 AM" and by_id["E"]["Time"] == "11 AM"
+    assert by_id["E"]["Duration_Slots"] == 2
+    assert [d["Change"] for d in diff] == ["added"]
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+
+
+@pytest.fixture(scope="module")
+def dataset_cases():
+    triaged = pipeline.triage_stage(pd.read_csv(DATA_PATH)).patients
+    return triaged.nlargest(40, "fuzzy_severity")[["patient_id", "fuzzy_severity", "diagnosis"]].to_dict("records")
+
+
+@pytest.mark.parametrize("n", [20, 25])
+def test_shipped_calendar_schedules_the_top_dataset_cases_interactively(dataset_cases, n):
+    calendar = ResourceCalendar.load_dir(CALENDAR_DIR)
+    started = time.perf_counter()
+    schedule = csp.build_schedule(dataset_cases[:n], max_cases=None, calendar=calendar)
+    assert time.perf_counter() - started < 1.0
+    assert "Error" not in schedule[0] and len(schedule) == n
+    # still reported in severity order, with eligible rooms and no double booking
+    assert [e["Patient_ID"] for e in schedule] == [c["patient_id"] for c in dataset_cases[:n]]
+    _assert_rooms_eligible(schedule, calendar)
+    durations = {e["Patient_ID"]: e["Duration_Slots"] for e in schedule}
+    assert all(len(ids) == 1 for ids in _occupied(schedule, durations, calendar.timeslots).values())
+
+
+@pytest.mark.parametrize("n", [30, 40])
+def test_shipped_calendar_reports_infeasibility_without_searching(dataset_cases, n):
+    calendar = ResourceCalendar.load_dir(CALENDAR_DIR)
+    started = time.perf_counter()
+    schedule = csp.build_schedule(dataset_cases[:n], max_cases=None, calendar=calendar)
+    assert time.perf_counter() - started < 1.0
+    assert schedule[0]["Error"] == "No feasible schedule found" and "exceed" in schedule[0]["Reason"]
+
+
+def test_capacity_shortfall_names_the_equipped_rooms():
+    # two 3-slot cases that need room 0, which is open for 4 slots
+    reason = csp.capacity_shortfall([3, 3, 1], 3, 2, 8, room_ok=[[True, False], [True, False], [True, True]],
+                                    room_busy=[[False] * 4 + [True] * 4, [False] * 8], room_names=["OR A", "OR B"])
+    assert reason == "6 slots of cases that only fit in OR A exceed the 4 slots free there"
+    assert csp.solve_schedule([3, 3, 1], 3, 2, 8, room_ok=[[True, False], [True, False], [True, True]],
+                              room_busy=[[False] * 4 + [True] * 4, [False] * 8]) is None
+    assert csp.capacity_shortfall([3, 1], 3, 2, 8, room_ok=[[True, False], [True, True]]) is None
+    assert "fit no free doctor" in csp.capacity_shortfall([9], 1, 1, 8)
+
+
+def test_default_schedules_every_case():
+    cases = [dict(c, duration_slots=1) for c in _cases(7)]
+    schedule = csp.build_schedule(cases)
+    assert sorted(e["Patient_ID"] for e in schedule) == sorted(c["patient_id"] for c in cases)
+
+
+def test_max_schedulable_fits_the_resources(dataset_cases):
+    assert csp.case_capacity() == 8
+    assert csp.max_schedulable(dataset_cases) == 8
+    calendar = ResourceCalendar.load_dir(CALENDAR_DIR)
+    k = csp.max_schedulable(dataset_cases, calendar=calendar)
+    assert k == 25  # 26 fail capacity_shortfall, see above
+    assert "Error" not in csp.build_schedule(dataset_cases, max_cases=k, calendar=calendar)[0]
+
+
+def test_pipeline_schedules_as_many_cases_as_fit_by_default(dataset_cases):
+    frame = pd.DataFrame(dataset_cases)
+    assert pipeline.PipelineConfig().max_cases is None
+    result = pipeline.schedule_stage(frame, pipeline.PipelineConfig(max_cases="auto", calendar=CALENDAR_DIR))
+    assert result.feasible and len(result.schedule) == 25
+    assert not pipeline.schedule_stage(frame, pipeline.PipelineConfig()).feasible  # all 40 do not fit
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import fuzzy_triage
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+TOLERANCE = 1e-3
+
+# skfuzzy's own np.maximum call warns on recent NumPy
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+@pytest.fixture(scope="module")
+def system():
+    return fuzzy_triage.build_fuzzy_system()
+
+
+@pytest.fixture(scope="module")
+def compiled(system):
+    return fuzzy_triage.compile_fuzzy_system(system)
+
+
+def _scalar(df, system):
+    return df.apply(lambda row: fuzzy_triage.compute_severity(row, system), axis=1).to_numpy()
+
+
+def test_batch_matches_scalar_on_the_dataset(system, compiled):
+    df = pd.read_csv(DATA_PATH)
+    batch = fuzzy_triage.compute_severity_batch(df, compiled)
+    np.testing.assert_allclose(batch, _scalar(df, system), rtol=0, atol=TOLERANCE)
+
+
+def test_batch_matches_scalar_across_the_universes(system, compiled):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({col: rng.uniform(compiled.antecedents[col][0][0], compiled.antecedents[col][0][-1], 300)
+                       for col in fuzzy_triage.VITAL_COLUMNS})
+    batch = fuzzy_triage.compute_severity_batch(df, compiled)
+    np.testing.assert_allclose(batch, _scalar(df, system), rtol=0, atol=TOLERANCE)
+
+
+def test_missing_vitals_fall_back_to_neutral(system, compiled):
+    df = pd.DataFrame({
+        "heart_rate": [150, np.nan, 80, 150, None],
+        "spo2": [80, 95, np.nan, 80, 95],
+        "temperature": [101, 98.6, 98.6, "n/a", 98.6],
+        "respiratory_rate": [30, 18, 18, 30, 18],
+    })
+    batch = fuzzy_triage.compute_severity_batch(df, compiled)
+    assert batch[1:].tolist() == [0.5] * 4
+    assert batch[0] == pytest.approx(fuzzy_triage.compute_severity(df.iloc[0], system), abs=TOLERANCE)
+
+
+def test_absent_columns_use_the_scalar_defaults(system, compiled):
+    df = pd.DataFrame({"heart_rate": [150.0, 60.0], "spo2": [80.0, 97.0]})
+    batch = fuzzy_triage.compute_severity_batch(df, compiled)
+    np.testing.assert_allclose(batch, _scalar(df, system), rtol=0, atol=TOLERANCE)
+
+
+def test_chunking_does_not_change_the_result(compiled):
+    df = pd.read_csv(DATA_PATH)
+    whole = fuzzy_triage.compute_severity_batch(df, compiled)
+    # only the mat-vec rounding may differ between block sizes
+    np.testing.assert_allclose(fuzzy_triage.compute_severity_batch(df, compiled, chunk_size=7), whole, rtol=0, atol=1e-12)
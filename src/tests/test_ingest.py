@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from modules import ingest
+from modules.ingest import PATIENT_SCHEMA
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+
+COLUMNS = ["patient_id", "heart_rate", "spo2", "diagnosis", "age", "notes"]
+
+
+def _write_csv(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "patient_id": [f"P{i:04d}" for i in range(n)],
+        "heart_rate": rng.integers(40, 180, n),
+        "spo2": rng.uniform(80, 100, n).round(1),
+        "diagnosis": rng.choice(["Stroke", "Burns", "Fracture"], n),
+        "age": rng.integers(1, 99, n),
+        "notes": ["x"] * n,  # not in PATIENT_SCHEMA: keeps the inferred type
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_cached_parquet_is_reused_until_the_csv_changes(tmp_path):
+    src = _write_csv(tmp_path / "patients.csv", 50)
+    cache_dir = str(tmp_path / "cache")
+    first = ingest.cached_parquet(src, cache_dir)
+    written = os.stat(first).st_mtime_ns
+    assert ingest.cached_parquet(src, cache_dir) == first and os.stat(first).st_mtime_ns == written
+    assert pq.read_metadata(first).num_rows == 50
+
+    _write_csv(tmp_path / "patients.csv", 60, seed=1)
+    os.utime(src, ns=(written + 10 ** 9, written + 10 ** 9))
+    second = ingest.cached_parquet(src, cache_dir)
+    assert second != first and pq.read_metadata(second).num_rows == 60
+    assert pq.read_table(second)["patient_id"].to_pylist() == pd.read_csv(src)["patient_id"].tolist()
+    # Parquet input is used as is
+    assert ingest.cached_parquet(second, cache_dir) == second
+
+
+def test_conversion_uses_the_compact_schema(tmp_path):
+    src = _write_csv(tmp_path / "patients.csv", 20)
+    schema = pq.read_schema(ingest.cached_parquet(src, str(tmp_path / "cache")))
+    for name in COLUMNS[:-1]:
+        assert schema.field(name).type == PATIENT_SCHEMA[name]
+    assert schema.field("notes").type == pa.string()
+
+
+@pytest.mark.parametrize("parquet", [False, True])
+def test_projection_returns_only_the_requested_columns(tmp_path, parquet):
+    path = _write_csv(tmp_path / "patients.csv", 1000)
+    if parquet:
+        path = ingest.cached_parquet(path, str(tmp_path / "cache"))
+    wanted = ["heart_rate", "patient_id", "diagnosis"]
+    batches = list(ingest.iter_record_batches(path, columns=wanted + (["missing"] if not parquet else []),
+                                              batch_rows=256))
+    assert sum(b.num_rows for b in batches) == 1000
+    for batch in batches:
+        assert sorted(batch.schema.names) == sorted(wanted)
+        assert all(batch.schema.field(c).type == PATIENT_SCHEMA[c] for c in wanted)
+    if parquet:
+        assert max(b.num_rows for b in batches) == 256
+
+    frame = pd.concat(ingest.read_batches(path, columns=wanted), ignore_index=True)
+    expected = pd.read_csv(tmp_path / "patients.csv")
+    assert frame["diagnosis"].dtype == "category" and frame["heart_rate"].dtype == np.float32
+    np.testing.assert_array_equal(frame["heart_rate"], expected["heart_rate"].astype(np.float32))
+    assert frame["diagnosis"].astype(str).tolist() == expected["diagnosis"].tolist()
+
+
+def test_dataset_round_trips_through_the_cache(tmp_path):
+    path = ingest.cached_parquet(DATA_PATH, str(tmp_path))
+    columns = ["patient_id", "heart_rate", "spo2", "temperature", "respiratory_rate", "severity_category"]
+    frame = pq.read_table(path, columns=columns).to_pandas()
+    expected = pd.read_csv(DATA_PATH, usecols=columns)
+    assert frame["patient_id"].tolist() == expected["patient_id"].astype(str).tolist()
+    for col in columns[1:5]:
+        np.testing.assert_allclose(frame[col], expected[col], rtol=1e-6)
+    assert frame["severity_category"].dtype == "category"
+    assert frame["severity_category"].astype(object).fillna("").tolist() == expected["severity_category"].fillna("").tolist()
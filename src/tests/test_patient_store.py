@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import patient_store, pipeline
+from modules.patient_store import PatientStore, by_severity
+
+
+def _store(n, seed=0, levels=7):
+    # few distinct severities, so there are plenty of ties
+    rng = np.random.default_rng(seed)
+    return PatientStore({"patient_id": np.arange(n), "fuzzy_severity": rng.integers(0, levels, n) / levels})
+
+
+def _stable(severity):
+    return np.argsort(-severity, kind="stable")
+
+
+@pytest.mark.parametrize("k", [None, -5, -1, 0, 1, 5, 99, 100, 250, 1000, 1500])
+def test_top_indices_match_a_stable_argsort(k):
+    store = _store(1000)
+    expected = _stable(store.severity.copy())[:k] if k is None or k > 0 else []
+    # cold: partition; then again from the cached order
+    np.testing.assert_array_equal(store.top_indices(k), expected)
+    store.order()
+    np.testing.assert_array_equal(store.top_indices(k), expected)
+
+
+@pytest.mark.parametrize("m", [1, 3, 15, 200])
+def test_update_severity_keeps_the_order_of_a_fresh_sort(m):
+    store = _store(1000, seed=m)
+    store.order()
+    rng = np.random.default_rng(m)
+    for _ in range(5):
+        rows = rng.choice(len(store), m, replace=False)
+        store.update_severity(rows, rng.integers(0, 7, m) / 7)
+        np.testing.assert_array_equal(store.order(), _stable(store.severity.copy()))
+        np.testing.assert_array_equal(store.top_indices(20), _stable(store.severity.copy())[:20])
+
+
+def test_large_updates_drop_the_cached_order():
+    store = _store(640)
+    store.order()
+    store.update_severity(np.arange(10), 1.0)
+    assert store._order is not None
+    store.update_severity(np.arange(11), 0.5)  # 11 * REPAIR_DIVISOR > 640
+    assert store._order is None and len(store) // patient_store.REPAIR_DIVISOR == 10
+    np.testing.assert_array_equal(store.order(), _stable(store.severity.copy()))
+
+
+def test_records_decode_back_to_the_input_values():
+    patients = [
+        {"patient_id": "P1", "fuzzy_severity": 0.4, "diagnosis": "Stroke", "entrance": 2},
+        {"patient_id": "P2", "fuzzy_severity": None, "diagnosis": None, "entrance": None},
+        {"patient_id": "P3", "fuzzy_severity": 0.9, "diagnosis": "Burns", "entrance": 0},
+    ]
+    store = PatientStore.from_records(patients)
+    assert [dict(p) for p in store] == [
+        {"patient_id": "P1", "fuzzy_severity": 0.4, "diagnosis": "Stroke", "entrance": 2},
+        {"patient_id": "P2", "fuzzy_severity": 0.0},
+        {"patient_id": "P3", "fuzzy_severity": 0.9, "diagnosis": "Burns", "entrance": 0},
+    ]
+    record = store[1]
+    assert "diagnosis" not in record and record.get("diagnosis", "none") == "none" and record.index == 1
+    with pytest.raises(KeyError):
+        record["entrance"]
+    assert store.to_frame()["entrance"].isna().tolist() == [False, True, False]
+
+
+@pytest.mark.parametrize("k", [None, 1, 10, 40])
+def test_by_severity_store_and_list_agree(k):
+    store = _store(40, seed=4, levels=3)
+    patients = [dict(p) for p in store]
+    assert [p["patient_id"] for p in by_severity(store, k)] == [p["patient_id"] for p in by_severity(patients, k)]
+
+
+def test_schedule_stage_without_severity_keeps_row_order():
+    df = pd.DataFrame({"patient_id": [f"P{i}" for i in range(6)]})
+    result = pipeline.schedule_stage(df, pipeline.PipelineConfig(max_cases=3))
+    assert [e["Patient_ID"] for e in result.schedule] == ["P0", "P1", "P2"]
+
+
+def test_schedule_stage_takes_the_most_severe_rows():
+    df = pd.DataFrame({"patient_id": [f"P{i}" for i in range(8)],
+                       "fuzzy_severity": [0.2, 0.9, 0.5, 0.9, 0.1, 0.5, 0.7, 0.3]})
+    result = pipeline.schedule_stage(df, pipeline.PipelineConfig(max_cases=4))
+    assert [e["Patient_ID"] for e in result.schedule] == ["P1", "P3", "P6", "P2"]
+
+
+def test_schedule_stage_ranks_missing_severities_as_zero():
+    df = pd.DataFrame({"patient_id": [f"P{i}" for i in range(5)],
+                       "fuzzy_severity": [np.nan, 0.5, 0.0, 0.9, np.nan]}, index=[4, 4, 2, 1, 0])
+    result = pipeline.schedule_stage(df, pipeline.PipelineConfig(max_cases=3))
+    expected = [p["patient_id"] for p in by_severity(PatientStore.from_frame(df), 3)]
+    # P0 ties P2 at 0 and comes first in row order
+    assert [e["Patient_ID"] for e in result.schedule] == expected == ["P3", "P1", "P0"]
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from modules import rag_summarizer
+from modules.rag_summarizer import (AsyncRAGSummarizer, FakeAsyncChatClient, FakeChatClient, RAGSummarizer,
+                                    ResponseCache)
+
+ALLOCATION = [{"Patient": "P1", "Bed": (0, 1), "Severity": 0.9, "Distance_Cost": 3}]
+SCHEDULE = [{"Patient_ID": "P1", "Doctor": "Dr. A", "Room": "OR-1", "Time": "09:00", "Severity": 0.9,
+             "Duration_Slots": 1}]
+
+
+def _summarizer(tmp_path, deterministic, client=None):
+    cache = ResponseCache(db_path=str(tmp_path / "llm.sqlite"))
+    return RAGSummarizer(client=client or FakeChatClient(), cache=cache, deterministic=deterministic)
+
+
+def test_cache_hit_miss_and_stats(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "llm.sqlite"))
+    key = ResponseCache.make_key("m", [{"role": "user", "content": "hi"}], temperature=0)
+    assert key != ResponseCache.make_key("m", [{"role": "user", "content": "hi"}], temperature=0.7)
+    assert cache.get(key) is None
+    cache.set(key, "reply")
+    assert cache.get(key) == "reply"
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "hit_rate": 0.5, "memory_entries": 1}
+
+
+def test_memory_entries_expire_after_ttl(tmp_path):
+    cache = ResponseCache(ttl=0.05, db_path=str(tmp_path / "llm.sqlite"))
+    cache.set("k", "reply")
+    assert cache.get("k") == "reply"
+    time.sleep(0.1)
+    assert cache.get("k") is None and cache.stats()["memory_entries"] == 0
+
+
+def test_persistent_entries_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "nested" / "llm.sqlite")
+    ResponseCache(db_path=path).set("k", "reply", persistent=True)
+    cache = ResponseCache(db_path=path)
+    assert cache.get("k") is None  # memory-only lookup does not touch the file
+    assert cache.get("k", persistent=True) == "reply"
+    assert cache.stats()["disk_hits"] == 1
+    cache.clear()
+    assert ResponseCache(db_path=path).get("k", persistent=True) is None
+
+
+def test_database_is_created_on_first_persistent_write(tmp_path):
+    path = str(tmp_path / "nested" / "llm.sqlite")
+    cache = ResponseCache(db_path=path)
+    cache.set("k", "reply")
+    assert cache.get("other", persistent=True) is None
+    cache.clear()
+    assert not os.path.exists(os.path.dirname(path))
+    cache.set("k", "reply", persistent=True)
+    assert os.path.exists(path)
+
+
+def test_default_cache_does_not_create_the_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm.sqlite")
+    monkeypatch.setattr(rag_summarizer, "CACHE_DB_PATH", path)
+    monkeypatch.setattr(rag_summarizer, "_default_cache", None)
+    summarizer = RAGSummarizer(client=FakeChatClient())
+    assert summarizer.cache is rag_summarizer.get_default_cache()
+    summarizer.create_bed_allocation_summary(ALLOCATION, 1)
+    summarizer.create_bed_allocation_summary(ALLOCATION, 1)
+    assert summarizer.client.calls == 1 and not os.path.exists(path)
+
+
+@pytest.mark.parametrize("deterministic", [False, True])
+def test_only_deterministic_responses_are_persisted(tmp_path, deterministic):
+    first = _summarizer(tmp_path, deterministic)
+    assert first.create_bed_allocation_summary(ALLOCATION, 1) == "Offline summary."
+    assert first.create_bed_allocation_summary(ALLOCATION, 1) == "Offline summary."
+    assert first.client.calls == 1 and first.cache.stats()["hits"] == 1
+
+    # a restart: new memory cache, same file
+    second = _summarizer(tmp_path, deterministic)
+    second.create_bed_allocation_summary(ALLOCATION, 1)
+    assert second.client.calls == (0 if deterministic else 1)
+    assert second.cache.stats()["disk_hits"] == (1 if deterministic else 0)
+    assert os.path.exists(tmp_path / "llm.sqlite") == deterministic
+
+
+def test_disabled_cache_calls_the_client_every_time():
+    summarizer = RAGSummarizer(client=FakeChatClient(reply=lambda messages: messages[1]["content"][-20:]),
+                               cache=False)
+    first = summarizer.create_bed_allocation_summary(ALLOCATION, 1)
+    assert summarizer.create_bed_allocation_summary(ALLOCATION, 1) == first
+    assert summarizer.cache is None and summarizer.client.calls == 2
+
+
+def _kind(messages):
+    system = messages[0]["content"]
+    return "bed" if "allocation" in system else "schedule" if "scheduling" in system else "combined"
+
+
+def test_async_summaries_come_back_in_job_order_with_streamed_tokens():
+    # the bed summary is the slowest, so completion order is the reverse of job order
+    latency = {"bed": 0.06, "schedule": 0.03, "combined": 0.0}
+    client = FakeAsyncChatClient(reply=lambda m: f"{_kind(m)} summary text",
+                                 latency=lambda m: latency[_kind(m)])
+    tokens = []
+    summarizer = AsyncRAGSummarizer(client=client, cache=False)
+    results = asyncio.run(summarizer.summarize_all(ALLOCATION, SCHEDULE, 1, on_token=lambda k, d: tokens.append((k, d))))
+    assert list(results.items()) == [(k, f"{k} summary text") for k in ("bed", "schedule", "combined")]
+    assert [k for k, _ in tokens][:3] == ["combined"] * 3
+    assert "".join(d for k, d in tokens if k == "bed") == "bed summary text"
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2, 3])
+def test_async_requests_respect_the_concurrency_cap(max_concurrency):
+    client = FakeAsyncChatClient(reply=lambda m: m[1]["content"], latency=0.01)
+    summarizer = AsyncRAGSummarizer(client=client, cache=False, max_concurrency=max_concurrency)
+
+    async def main():
+        return await asyncio.gather(*(summarizer._complete("bed", "system", f"prompt {i}", 10) for i in range(8)))
+
+    assert asyncio.run(main()) == [f"prompt {i}" for i in range(8)]
+    assert client.max_in_flight == max_concurrency and client.calls == 8
+
+
+def test_async_retries_a_transient_error_before_the_first_token():
+    client = FakeAsyncChatClient(fail_first=2)
+    summarizer = AsyncRAGSummarizer(client=client, cache=False, max_retries=3, backoff=0.001)
+    assert asyncio.run(summarizer.summarize_all(ALLOCATION)) == {"bed": "Offline summary."}
+    assert client.calls == 3 and summarizer.timings["bed"]["attempts"] == 3
+
+    client = FakeAsyncChatClient(fail_first=5)
+    summarizer = AsyncRAGSummarizer(client=client, cache=False, max_retries=1, backoff=0.001)
+    assert asyncio.run(summarizer.summarize_all(ALLOCATION))["bed"].startswith("Error generating summary")
+    assert client.calls == 2
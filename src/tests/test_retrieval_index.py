@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import retrieval_index
+from modules.retrieval_index import MAX_SEGMENTS, RetrievalIndex
+
+DOCS = {
+    "P1": "Stroke. Symptoms: seizures, slurred speech. History: hypertension",
+    "P2": "Stroke. Symptoms: headache. History: diabetes",
+    "P3": "Fracture. Symptoms: leg pain. History: osteoporosis",
+    "P4": "Burns. Symptoms: blistering skin. History: none",
+    "P5": "Pneumonia. Symptoms: cough, fever. History: asthma",
+}
+
+
+def _index(path, docs=DOCS):
+    index = RetrievalIndex(str(path))
+    index.add_texts(list(docs), list(docs.values()))
+    return index
+
+
+def _ids(hits):
+    return [h["id"] for h in hits]
+
+
+def test_add_texts_skips_ids_already_indexed(tmp_path):
+    index = _index(tmp_path)
+    assert len(index) == 5 and len(index.segments) == 1
+    assert index.add_texts(["P1", "P6", "P6"], ["changed", "Sepsis. Symptoms: fever", "duplicate"]) == 1
+    assert index.add_texts(["P1", "P6"], ["again", "again"]) == 0
+    assert len(index) == 6 and len(index.segments) == 2
+    assert index.get_texts(["P1", "P6", "P9"]) == [DOCS["P1"], "Sepsis. Symptoms: fever", None]
+    assert index.contains(["P6", "P9"]).tolist() == [True, False]
+
+
+def test_add_records_and_summaries(tmp_path):
+    index = RetrievalIndex(str(tmp_path))
+    df = pd.DataFrame({"patient_id": [1, 2], "diagnosis": ["Stroke", None], "symptoms": ["seizures", "cough"]})
+    assert index.add_records(df) == 2 and index.add_records(df) == 0
+    assert index.get_texts([1]) == ["Stroke. Symptoms: seizures. History: "]
+    assert index.add_summary("Stroke patients were seen first.", label="bed") == 1
+    assert index.add_summary("Stroke patients were seen first.", label="bed") == 0
+    hits = index.search("stroke", kind="summary")
+    assert len(hits) == 1 and hits[0]["id"].startswith("bed:") and hits[0]["kind"] == "summary"
+    assert _ids(index.search("stroke", kind="patient")) == ["1"]
+
+
+def test_search_ranks_by_shared_selective_terms(tmp_path):
+    index = _index(tmp_path)
+    hits = index.search("stroke seizures hypertension", k=3)
+    assert _ids(hits) == ["P1", "P2"]  # P2 shares only "stroke"; nothing else matches
+    assert hits[0]["score"] > hits[1]["score"] > 0 and hits[0]["text"] == DOCS["P1"]
+    assert _ids(index.search("stroke seizures", k=1)) == ["P1"]
+    assert _ids(index.search("stroke", exclude=["P1"])) == ["P2"]
+    assert index.search("unknown words") == [] and RetrievalIndex(str(tmp_path)).search("stroke") == []
+
+
+def test_terms_above_max_df_are_skipped_unless_nothing_else_matches(tmp_path):
+    index = _index(tmp_path)
+    # "symptoms" and "history" are in every document
+    assert index.doc_freq[retrieval_index._features("symptoms", index.n_features)[0]] == [5]
+    assert _ids(index.search("symptoms history fever")) == ["P5"]
+    assert sorted(_ids(index.search("symptoms history"))) == sorted(DOCS)
+
+
+def test_compact_keeps_documents_and_ranking(tmp_path):
+    index = _index(tmp_path, dict(list(DOCS.items())[:2]))
+    for pid in list(DOCS)[2:]:
+        index.add_texts([pid], [DOCS[pid]])
+    before = index.search("stroke fever pain skin", k=5)
+    assert len(index.segments) == 4
+    index.compact()
+    assert len(index.segments) == 1 and len(index) == 5
+    after = index.search("stroke fever pain skin", k=5)
+    assert _ids(after) == _ids(before)
+    np.testing.assert_allclose([h["score"] for h in after], [h["score"] for h in before], rtol=1e-6)
+    assert index.get_texts(list(DOCS)) == list(DOCS.values())
+
+
+def test_save_and_memory_mapped_load_round_trip(tmp_path):
+    path = tmp_path / "index"
+    index = _index(path).save()
+    loaded = RetrievalIndex.load(str(path))
+    assert isinstance(loaded.segments[0].indices, np.memmap)
+    np.testing.assert_array_equal(loaded.doc_freq, index.doc_freq)
+    assert loaded.search("stroke seizures") == index.search("stroke seizures")
+    assert loaded.get_texts(list(DOCS)) == list(DOCS.values())
+
+    # appending writes a new segment next to the memory-mapped one
+    loaded.add_texts(["P6"], ["Sepsis. Symptoms: fever"])
+    loaded.save()
+    reloaded = RetrievalIndex.load(str(path))
+    assert len(reloaded) == 6 and [s.name for s in reloaded.segments] == ["seg_00000", "seg_00001"]
+    assert sorted(_ids(reloaded.search("fever"))) == ["P5", "P6"]
+
+
+def test_save_merges_small_segments_past_the_limit(tmp_path):
+    path = tmp_path / "index"
+    index = _index(path, {f"B{i}": f"base record {i}" for i in range(20)}).save()
+    for i in range(MAX_SEGMENTS):
+        index.add_texts([f"S{i}"], [f"small record {i} fever"])
+    index.save()
+    reloaded = RetrievalIndex.load(str(path))
+    assert len(reloaded.segments) == 2 and len(reloaded) == 20 + MAX_SEGMENTS
+    assert sorted(n for n in os.listdir(path) if n.startswith("seg_")) == sorted(s.name for s in reloaded.segments)
+    assert len(reloaded.search("fever", k=20)) == MAX_SEGMENTS
+
+
+def test_token_hash_cache_is_bounded():
+    info = retrieval_index._token_hash.cache_info()
+    assert info.maxsize == retrieval_index.TOKEN_CACHE_SIZE
+    retrieval_index._features(" ".join(f"tok{i}" for i in range(100)), 64)
+    assert retrieval_index._token_hash.cache_info().currsize <= retrieval_index.TOKEN_CACHE_SIZE
+
+
+@pytest.mark.parametrize("text", ["", "the and of", "Stroke stroke STROKE"])
+def test_features_are_l2_normalised(text):
+    ids, weights = retrieval_index._features(text, 1024)
+    assert len(ids) == len(weights)
+    if len(ids):
+        assert np.sum(weights.astype(np.float64) ** 2) == pytest.approx(1.0, abs=1e-6)
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import severity_model
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+
+FAST = {"n_estimators": 5, "max_depth": 6}
+
+
+@pytest.fixture(scope="module")
+def patients():
+    return pd.read_csv(DATA_PATH)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    # models trained or loaded in one test must not leak into the next
+    monkeypatch.setattr(severity_model, "_models", {})
+
+
+def _saved(model_dir):
+    return sorted(os.listdir(model_dir))
+
+
+def test_training_the_same_data_and_params_loads_the_saved_model(patients, tmp_path):
+    model = severity_model.train_model(patients, model_dir=str(tmp_path), **FAST)
+    assert not model.cached and _saved(tmp_path) == [f"severity_category-{model.key}.joblib"]
+    assert model.params == dict(severity_model.DEFAULT_PARAMS, **FAST)
+    assert 0 <= model.metrics["accuracy"] <= 1 and model.metrics["rows"] == 400
+
+    again = severity_model.train_model(patients, model_dir=str(tmp_path), n_jobs=1, **FAST)
+    assert again.cached and again.key == model.key and _saved(tmp_path) == [f"severity_category-{model.key}.joblib"]
+    np.testing.assert_array_equal(again.predict(patients), model.predict(patients))
+
+
+def test_model_key_is_the_dataset_hash_plus_params(patients, tmp_path):
+    features = severity_model.feature_columns(patients, "severity_category")
+    data_hash = severity_model.dataset_hash(patients, features, "severity_category")
+    model = severity_model.train_model(patients, model_dir=str(tmp_path), **FAST)
+    assert model.key == severity_model.model_key(data_hash, dict(severity_model.DEFAULT_PARAMS, **FAST))
+
+    changed = patients.copy()
+    changed.loc[0, "heart_rate"] += 1
+    keys = {
+        model.key,
+        severity_model.train_model(changed, model_dir=str(tmp_path), **FAST).key,
+        severity_model.train_model(patients, model_dir=str(tmp_path), **dict(FAST, n_estimators=6)).key,
+        severity_model.train_model(patients, model_dir=str(tmp_path), **dict(FAST, random_state=0)).key,
+    }
+    assert len(keys) == 4 and len(_saved(tmp_path)) == 4
+    # row order is part of the hash
+    assert severity_model.dataset_hash(patients[::-1], features, "severity_category") != data_hash
+
+
+def test_load_model_reads_the_newest_saved_file(patients, tmp_path, monkeypatch):
+    with pytest.raises(FileNotFoundError):
+        severity_model.load_model(model_dir=str(tmp_path))
+    old = severity_model.train_model(patients, model_dir=str(tmp_path), **FAST)
+    new = severity_model.train_model(patients, model_dir=str(tmp_path), **dict(FAST, n_estimators=6))
+    assert severity_model.load_model(model_dir=str(tmp_path)) is new  # the last one trained in this process
+
+    os.utime(tmp_path / f"severity_category-{old.key}.joblib", (2e9, 2e9))
+    monkeypatch.setattr(severity_model, "_models", {})
+    loaded = severity_model.load_model(model_dir=str(tmp_path))
+    assert loaded.cached and loaded.key == old.key
+    assert severity_model.load_model(model_dir=str(tmp_path)) is loaded  # read once, then kept
+
+
+@pytest.mark.parametrize("batch_rows", [1, 7, 128, severity_model.PREDICT_BATCH_ROWS])
+def test_batched_prediction_matches_single_rows(patients, tmp_path, batch_rows):
+    model = severity_model.train_model(patients, model_dir=str(tmp_path), **FAST)
+    rows = patients.sample(60, random_state=1)
+    single = [model.predict(rows.iloc[[i]])[0] for i in range(len(rows))]
+    assert severity_model.predict_severity_category(rows, model, batch_rows=batch_rows).tolist() == single
+    # the default model is the one just trained
+    assert severity_model.predict_severity_category(rows, batch_rows=batch_rows).tolist() == single
+
+
+def test_missing_feature_columns_count_as_zero(patients, tmp_path):
+    model = severity_model.train_model(patients, model_dir=str(tmp_path), **FAST)
+    rows = patients.head(20)
+    partial = rows[["heart_rate", "spo2", "temperature", "respiratory_rate"]]
+    zeroed = rows.copy()
+    zeroed[[c for c in model.features if c not in partial.columns]] = 0
+    np.testing.assert_array_equal(model.predict(partial), model.predict(zeroed))
+    assert model.predict(partial.iloc[:0]).tolist() == []
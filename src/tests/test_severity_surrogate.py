@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import fuzzy_triage
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return fuzzy_triage.compile_fuzzy_system(fuzzy_triage.build_fuzzy_system())
+
+
+@pytest.fixture(scope="module")
+def surrogate(compiled, tmp_path_factory):
+    # the shipped settings, trained once into a throwaway cache
+    return fuzzy_triage.build_severity_surrogate(compiled, cache_dir=str(tmp_path_factory.mktemp("surrogate")))
+
+
+def _uniform_inputs(compiled, n, seed):
+    rng = np.random.default_rng(seed)
+    return {col: rng.uniform(compiled.antecedents[col][0][0], compiled.antecedents[col][0][-1], n)
+            for col in fuzzy_triage.VITAL_COLUMNS}
+
+
+def test_served_error_within_tolerance_on_the_universes(compiled, surrogate):
+    report = fuzzy_triage.surrogate_accuracy_report(compiled, surrogate, n_samples=100_000, seed=1)
+    assert report["max_abs_error"] <= surrogate.tolerance
+    assert report["within_tolerance"] == 1.0
+    # the MLP alone is not that good: the fallback is what keeps the bound
+    assert report["mlp_only_max_abs_error"] > report["max_abs_error"]
+
+
+def test_served_error_within_tolerance_on_the_dataset(compiled, surrogate):
+    df = pd.read_csv(DATA_PATH)
+    exact = fuzzy_triage.compute_severity_batch(df, compiled)
+    served = fuzzy_triage.compute_severity_batch(df, surrogate)
+    assert np.max(np.abs(served - exact)) <= surrogate.tolerance
+
+
+def test_rows_without_a_firing_rule_get_the_fallback(compiled, surrogate):
+    inputs = _uniform_inputs(compiled, 20_000, seed=2)
+    cuts = compiled.activations(inputs)
+    none_fire = cuts.max(axis=0) == 0
+    if not none_fire.any():
+        pytest.skip("every sampled row fires a rule")
+    assert np.all(surrogate.compute(inputs, fallback=0.5)[none_fire] == 0.5)
+
+
+def test_fallback_share_covers_every_chunk(compiled, surrogate):
+    inputs = _uniform_inputs(compiled, 30_000, seed=3)
+    surrogate.reset_counts()
+    surrogate.compute(inputs)
+    whole = surrogate.fallback_share
+    assert surrogate.scored_rows == 30_000 and 0 < whole < 1
+
+    df = pd.DataFrame(inputs)
+    surrogate.reset_counts()
+    fuzzy_triage.compute_severity_batch(df, surrogate, chunk_size=4096)
+    assert surrogate.scored_rows == 30_000
+    assert surrogate.fallback_share == pytest.approx(whole)
@@ -0,0 +1,119 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import fuzzy_triage, pipeline
+from modules.stage_cache import StageCache
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "hospital_patients_dataset.csv")
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return fuzzy_triage.compile_fuzzy_system(fuzzy_triage.build_fuzzy_system())
+
+
+@pytest.fixture(scope="module")
+def vitals(compiled):
+    # the dataset (Celsius temperatures, clipped to the low end) plus rows spread over the universes
+    rng = np.random.default_rng(0)
+    spread = pd.DataFrame({col: rng.uniform(compiled.antecedents[col][0][0], compiled.antecedents[col][0][-1], 2000)
+                           for col in fuzzy_triage.VITAL_COLUMNS})
+    dataset = pd.read_csv(DATA_PATH)[fuzzy_triage.VITAL_COLUMNS]
+    return pd.concat([dataset, spread, dataset.head(50)], ignore_index=True)  # with repeated rows
+
+
+def _with_term(compiled, label, term, points):
+    """Copy of the system with one antecedent term redefined as trimf(points)."""
+    changed = copy.deepcopy(compiled)
+    universe, mfs = changed.antecedents[label]
+    a, b, c = points
+    mfs[term] = np.clip(np.minimum((universe - a) / (b - a), (c - universe) / (c - b)), 0, 1)
+    return changed
+
+
+def test_repeat_run_is_all_hits(tmp_path, compiled, vitals):
+    cache = StageCache(str(tmp_path))
+    first = cache.severity(vitals, compiled)
+    assert cache.last_stats["misses"] == len(vitals) and cache.last_stats["hits"] == 0
+    # a new instance reads the part files back
+    again = StageCache(str(tmp_path)).severity(vitals, compiled)
+    np.testing.assert_array_equal(again, first)
+    np.testing.assert_allclose(first, fuzzy_triage.compute_severity_batch(vitals, compiled), rtol=0, atol=1e-12)
+
+
+def test_only_new_rows_are_scored(tmp_path, compiled, vitals):
+    cache = StageCache(str(tmp_path))
+    cache.severity(vitals.head(1000), compiled)
+    cache.severity(vitals, compiled)
+    stats = cache.last_stats
+    new_rows = ~vitals.apply(tuple, axis=1).isin(set(vitals.head(1000).apply(tuple, axis=1)))
+    assert stats["misses"] == new_rows.sum() and stats["hits"] == len(vitals) - new_rows.sum()
+
+
+def test_membership_change_rescores_exactly_the_affected_rows(tmp_path, compiled, vitals):
+    cache = StageCache(str(tmp_path))
+    cache.severity(vitals, compiled)
+
+    # heart_rate "high" trimf(90, 130, 180) -> trimf(100, 140, 180): a row is affected when
+    # either definition gives it non-zero membership, i.e. 90 < heart rate < 180
+    changed = _with_term(compiled, "heart_rate", "high", (100, 140, 180))
+    warm = cache.severity(vitals, changed)
+    hr = np.clip(vitals["heart_rate"].to_numpy(), 40, 180)
+    affected = (hr > 90) & (hr < 180)
+    assert 0 < affected.sum() < len(vitals)
+    assert cache.last_stats["misses"] == affected.sum()
+    assert cache.last_stats["carried"] == len(vitals) - affected.sum()
+
+    cold = StageCache(str(tmp_path / "cold")).severity(vitals, changed)
+    np.testing.assert_allclose(warm, cold, rtol=0, atol=1e-12)
+    # and the carried rows really kept their old severity
+    np.testing.assert_allclose(warm[~affected], fuzzy_triage.compute_severity_batch(vitals, compiled)[~affected],
+                               rtol=0, atol=1e-12)
+
+
+def test_rule_change_carries_nothing_over(tmp_path, compiled, vitals):
+    cache = StageCache(str(tmp_path))
+    cache.severity(vitals, compiled)
+    changed = copy.deepcopy(compiled)
+    changed.output_mfs = changed.output_mfs[[0, 2, 1]]  # swap medium and high outputs
+    values = cache.severity(vitals, changed)
+    assert cache.last_stats["carried"] == 0 and cache.last_stats["misses"] == len(vitals)
+    np.testing.assert_allclose(values, fuzzy_triage.compute_severity_batch(vitals, changed), rtol=0, atol=1e-12)
+
+
+def test_results_round_trip_and_clear(tmp_path):
+    cache = StageCache(str(tmp_path))
+    assert cache.get_result("allocate", "abc") is None
+    cache.set_result("allocate", "abc", {"allocations": [{"Patient": "P1", "Distance_Cost": np.float64(2.0)}]})
+    assert StageCache(str(tmp_path)).get_result("allocate", "abc") == {"allocations": [{"Patient": "P1",
+                                                                                         "Distance_Cost": 2.0}]}
+    cache.clear()
+    assert cache.get_result("allocate", "abc") is None and not os.path.exists(tmp_path)
+
+
+def test_allocation_results_are_keyed_by_their_inputs(tmp_path):
+    patients = pd.DataFrame({"patient_id": [f"P{i}" for i in range(12)],
+                             "fuzzy_severity": np.linspace(0.1, 0.9, 12)})
+    cache = StageCache(str(tmp_path))
+
+    def run(frame, **kwargs):
+        return pipeline.allocation_stage(frame, pipeline.PipelineConfig(cache=cache, **kwargs))
+
+    first = run(patients)
+    assert not first.cached
+    second = run(patients)
+    assert second.cached and second.allocations == first.allocations
+
+    bumped = patients.assign(fuzzy_severity=patients["fuzzy_severity"].where(patients.index != 3, 0.95))
+    assert not run(bumped).cached
+    assert not run(patients, alloc_mode="optimal").cached
+    assert not run(patients, grid_size=4).cached
+    # a result stored without the mode comparison is recomputed when one is asked for
+    compared = run(patients, compare_modes=True)
+    assert not compared.cached and compared.mode_report is not None
+    assert run(patients, compare_modes=True).cached
+    assert run(patients).cached
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from modules import fuzzy_triage
+from modules.triage_stream import VITALS, PatientWindows, TriageStream
+
+
+def _by_heart_rate(inputs):
+    """Severity = heart_rate / 200, so a reading's band is easy to pick."""
+    return np.asarray(inputs["heart_rate"]) / 200
+
+
+class Recorder:
+    """Score callable that keeps the (carried-forward) vitals it was given."""
+
+    def __init__(self):
+        self.inputs = []
+
+    def __call__(self, inputs):
+        self.inputs.append(np.column_stack([inputs[c] for c in VITALS]))
+        return _by_heart_rate(inputs)
+
+
+def _vitals(*rows):
+    return np.array([[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64)
+
+
+def _stream(**kwargs):
+    stream = TriageStream(system=object(), max_wait=0, **kwargs)
+    stream._score = _by_heart_rate
+    return stream
+
+
+def _line(pid, ts, **vitals):
+    return json.dumps(dict(vitals, patient_id=pid, ts=ts))
+
+
+def test_carry_forward_within_and_across_batches():
+    windows = PatientWindows(window=4)
+    score = Recorder()
+    windows.update(["A", "A", "B"],
+                   _vitals([120, 90, 101.0, 24], [None, 88, None, None], [None, None, None, None]),
+                   np.arange(3.0), score)
+    first = score.inputs[-1]
+    # A's second reading keeps the first one's heart rate, temperature and rate
+    np.testing.assert_array_equal(first[1], [120, 88, 101.0, 24])
+    # B never reported anything: defaults
+    np.testing.assert_array_equal(first[2], [fuzzy_triage.VITAL_DEFAULTS[c] for c in VITALS])
+
+    windows.update(["A"], _vitals([None, None, 99.5, None]), np.array([3.0]), score)
+    np.testing.assert_array_equal(score.inputs[-1][0], [120, 88, 99.5, 24])
+
+
+def test_readings_are_grouped_per_patient_in_arrival_order():
+    windows = PatientWindows(window=8)
+    score = Recorder()
+    ids = ["B", "A", "B", "A", "B"]
+    _, severity, band, previous = windows.update(
+        ids, _vitals([40, 95, 98, 18], [60, 95, 98, 18], [100, 95, 98, 18], [140, 95, 98, 18], [None, 90, 98, 18]),
+        np.arange(5.0), score)
+    np.testing.assert_allclose(severity, [0.2, 0.3, 0.5, 0.7, 0.5])
+    # previous band is the band of the same patient's previous reading (-1 before the first)
+    assert previous.tolist() == [-1, -1, 0, 0, 1]
+    assert band.tolist() == [0, 0, 1, 2, 1]
+
+
+def test_ring_buffer_keeps_the_last_window_readings():
+    windows = PatientWindows(window=4)
+    for hr in (20, 40, 60, 80, 100, 120):
+        slots, *_ = windows.update(["A"], _vitals([hr, 95, 98, 18]), np.array([float(hr)]), _by_heart_rate)
+    mean, held = windows.window_stats(slots)
+    assert held.tolist() == [4]
+    assert mean[0] == pytest.approx(np.mean([60, 80, 100, 120]) / 200, abs=1e-6)
+
+
+def test_discharge_frees_the_slot_and_forgets_the_patient():
+    windows = PatientWindows(window=4, capacity=2)
+    windows.update(["A", "B"], _vitals([140, 95, 98, 18], [40, 95, 98, 18]), np.arange(2.0), _by_heart_rate)
+    slot_a = windows.slots["A"]
+    assert windows.discharge("A") and not windows.discharge("A")
+    score = Recorder()
+    slots, _, _, previous = windows.update(["C"], _vitals([None, None, None, None]), np.array([2.0]), score)
+    assert slots[0] == slot_a and previous[0] == -1
+    # nothing carried over from A
+    np.testing.assert_array_equal(score.inputs[-1][0], [fuzzy_triage.VITAL_DEFAULTS[c] for c in VITALS])
+
+
+def test_band_change_events():
+    stream = _stream()
+    assert stream.process([_line("A", 1.0, heart_rate=40, spo2=97)]) == []  # first reading: no change
+    assert stream.process([_line("A", 2.0, heart_rate=60)]) == []           # still low
+    events = stream.process([_line("A", 3.0, heart_rate=100), _line("B", 3.0, heart_rate=150),
+                             _line("A", 4.0, heart_rate=150)])
+    assert [(e["patient_id"], e["previous_band"], e["band"], e["ts"]) for e in events] == [
+        ("A", "low", "medium", 3.0), ("A", "medium", "high", 4.0)]
+    assert events[-1]["window_readings"] == 4
+    assert events[-1]["window_mean"] == round(np.mean([40, 60, 100, 150]) / 200, 4)
+    assert stream.stats["band_changes"] == 2 and stream.stats["events"] == 5
+
+
+def test_emit_initial_and_malformed_lines():
+    stream = _stream(emit_initial=True)
+    events = stream.process([_line("A", 1.0, heart_rate=150), "not json", '{"heart_rate": 80}', ""])
+    assert [(e["patient_id"], e["previous_band"], e["band"]) for e in events] == [("A", None, "high")]
+    assert stream.stats["bad_events"] == 2
+
+
+def test_unhashable_patient_id_is_skipped_not_fatal():
+    stream = _stream()
+    full = dict(heart_rate=150, spo2=95, temperature=98.6, respiratory_rate=18)
+    lines = [_line("A", 1.0, **full), json.dumps(dict(full, patient_id=["x"], ts=2.0)),
+             json.dumps(dict(full, patient_id={"id": 1}, ts=2.0)), _line(7, 3.0, **full)]
+    assert stream.parse(lines)[0] == ["A", 7]
+    assert stream.process(lines) == [] and stream.stats["events"] == 2
+    assert stream.stats["bad_events"] == 4  # two per call
+
+
+def test_run_scores_everything_queued_with_bounded_batches():
+    changes = []
+    stream = _stream(max_batch=3, max_pending=4, on_change=changes.extend)
+    lines = [_line("A", float(t), heart_rate=hr) for t, hr in enumerate([40, 100, 40, 150, 150, 60, 60])]
+
+    async def main():
+        consumer = asyncio.create_task(stream.run())
+        for i in range(0, len(lines), 2):
+            await stream.put(lines[i:i + 2])
+        stream.close()
+        return await consumer
+
+    stats = asyncio.run(main())
+    assert stats["events"] == len(lines) and stats["batches"] >= 3
+    assert [(e["previous_band"], e["band"]) for e in changes] == [
+        ("low", "medium"), ("medium", "low"), ("low", "high"), ("high", "low")]